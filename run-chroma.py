@@ -1,4 +1,7 @@
 import os
+import sys
+import json
+import argparse
 import chromadb
 from chromadb.config import Settings
 from chromadb.server.fastapi import FastAPI
@@ -9,11 +12,52 @@ import logging
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 os.environ["OTEL_SDK_DISABLED"] = "True"
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from chroma_snapshot import SnapshotError, restore_snapshot
+import chroma_replicas
+import chroma_maintenance
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def run_server():
-    path = os.path.join(os.getcwd(), "chromadb_data")
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run the persistent ChromaDB server')
+    parser.add_argument('--path', type=str, default=os.path.join(os.getcwd(), "chromadb_data"), help='Persist directory')
+    parser.add_argument('--host', type=str, default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--restore', type=str, metavar='SNAPSHOT',
+                        help='Restore the store from a chroma_snapshot.py archive before starting')
+    parser.add_argument('--force', action='store_true', help='With --restore, move an existing store aside instead of refusing')
+    parser.add_argument('--replicas', type=int, default=0,
+                        help='Serve reads from N replica processes behind a load balancer on --port (0 = single server)')
+    parser.add_argument('--replicas-dir', type=str, default=str(chroma_replicas.DEFAULT_REPLICAS_DIR),
+                        help='Where replica copies of the store are kept')
+    parser.add_argument('--refresh-interval', type=float, default=10.0,
+                        help='Minimum seconds between replica refreshes after the writer commits')
+    parser.add_argument('--maintenance-every', type=float, default=0, metavar='HOURS',
+                        help='Vacuum and rebuild fragmented collections in the background every N hours (0 = never)')
+    parser.add_argument('--ingest-url', type=str, default=os.environ.get('CHROMA_INGEST_URL'),
+                        help='Ingest gateway to pause for a collection while maintenance rebuilds it')
+    return parser.parse_args()
+
+def restore(args):
+    logger.info(f"Restoring {args.path} from {args.restore}")
+    try:
+        manifest = restore_snapshot(args.restore, args.path, force=args.force)
+    except SnapshotError as e:
+        logger.error(f"Restore failed: {e}")
+        sys.exit(1)
+    logger.info(f"Restored snapshot taken {manifest['created_at']}: {json.dumps(manifest['collections'])}")
+    if manifest.get("previous_store"):
+        logger.info(f"Previous store kept at {manifest['previous_store']}")
+
+def schedule_maintenance(args, port):
+    logger.info(f"Scheduling maintenance of {args.path} every {args.maintenance_every}h")
+    chroma_maintenance.start_schedule(args.path, f"http://127.0.0.1:{port}", args.maintenance_every,
+                                      ingest_url=args.ingest_url)
+
+def run_server(args):
+    path = args.path
     if not os.path.exists(path):
         os.makedirs(path)
         
@@ -29,12 +73,27 @@ def run_server():
     try:
         server = FastAPI(settings)
         app = server.app()
-        logger.info("Server app created. Starting uvicorn on port 8000...")
-        uvicorn.run(app, host="127.0.0.1", port=8000, log_level="info")
+        logger.info(f"Server app created. Starting uvicorn on port {args.port}...")
+        uvicorn.run(app, host=args.host, port=args.port, log_level="info")
     except Exception as e:
         logger.error(f"Failed to start server: {e}")
         import traceback
         traceback.print_exc()
 
 if __name__ == "__main__":
-    run_server()
+    args = parse_args()
+    if args.restore:
+        restore(args)
+    if args.replicas > 0:
+        if not os.path.exists(os.path.join(args.path, "chroma.sqlite3")):
+            logger.error(f"No store at {args.path}; start once without --replicas to create it")
+            sys.exit(1)
+        logger.info(f"Starting 1 writer and {args.replicas} read replicas for {args.path}")
+        # Maintenance talks to the writer directly; replicas pick up the result on their next refresh
+        on_started = (lambda replica_set: schedule_maintenance(args, replica_set.writer.port)) if args.maintenance_every else None
+        chroma_replicas.serve(args.path, args.host, args.port, args.replicas, replicas_dir=args.replicas_dir,
+                              refresh_interval=args.refresh_interval, on_started=on_started)
+    else:
+        if args.maintenance_every:
+            schedule_maintenance(args, args.port)
+        run_server(args)
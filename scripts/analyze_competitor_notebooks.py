@@ -1,10 +1,16 @@
 import sys
 import os
-import json
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+import records
+from records import CompetitorReport, Notebooks
+from report_state import ReportState, analyze_notebooks, analyzer_version
+from instrumentation import Instrumentation
+
+COMPETITORS = ['Floatbot', 'Swiss Re', 'Cognigy', 'Kore.AI', 'Verloop']
+
 class CompetitorAnalyzer:
     """Analyze competitor notebooks for market insights and AI opportunities"""
     
@@ -27,8 +33,7 @@ class CompetitorAnalyzer:
                 print("No notebook data found. Run extract_notebook_data.py first.")
                 return False
             
-            with open(all_file, 'r', encoding='utf-8') as f:
-                all_notebooks = json.load(f)
+            all_notebooks = records.load(all_file, Notebooks)
             
             # Filter for relevant competitor notebooks (excluding IA - notebooks)
             competitor_keywords = [
@@ -53,21 +58,26 @@ class CompetitorAnalyzer:
             print(f"Error loading competitor notebooks: {str(e)}")
             return False
     
+    def _ai_technology_entries(self, notebook: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """AI technology insights contributed by one notebook"""
+        title = notebook['title']
+        sources = notebook.get('sources', [])
+        
+        # AI-related notebooks
+        ai_keywords = ['AI', 'GenAI', 'Generative', 'Agent', 'Chatbot', 'Voice', 'Conversational']
+        if any(keyword.lower() in title.lower() for keyword in ai_keywords):
+            return [{
+                "notebook": title,
+                "source_count": len(sources),
+                "technology_hints": [s['title'] for s in sources[:5]],  # First 5 sources
+                "category": self._categorize_ai_tech(title)
+            }]
+        return []
+    
     def analyze_ai_technologies(self):
         """Extract AI technology insights from notebooks"""
         for notebook in self.competitor_notebooks:
-            title = notebook['title']
-            sources = notebook.get('sources', [])
-            
-            # AI-related notebooks
-            ai_keywords = ['AI', 'GenAI', 'Generative', 'Agent', 'Chatbot', 'Voice', 'Conversational']
-            if any(keyword.lower() in title.lower() for keyword in ai_keywords):
-                self.insights['ai_technologies'].append({
-                    "notebook": title,
-                    "source_count": len(sources),
-                    "technology_hints": [s['title'] for s in sources[:5]],  # First 5 sources
-                    "category": self._categorize_ai_tech(title)
-                })
+            self.insights['ai_technologies'].extend(self._ai_technology_entries(notebook))
     
     def _categorize_ai_tech(self, title: str) -> str:
         """Categorize AI technology type"""
@@ -83,55 +93,84 @@ class CompetitorAnalyzer:
         else:
             return "General AI"
     
-    def analyze_competitors(self):
-        """Identify and analyze specific competitors"""
-        competitors = {
-            'Floatbot': [],
-            'Swiss Re': [],
-            'Cognigy': [],
-            'Kore.AI': [],
-            'Verloop': []
-        }
+    def _competitor_entries(self, notebook: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """Competitor mentions contributed by one notebook"""
+        competitors = {name: [] for name in COMPETITORS}
+        title = notebook['title']
+        sources = notebook.get('sources', [])
         
-        for notebook in self.competitor_notebooks:
-            title = notebook['title']
-            sources = notebook.get('sources', [])
-            
-            for competitor in competitors.keys():
-                if competitor.lower() in title.lower():
+        for competitor in competitors.keys():
+            if competitor.lower() in title.lower():
+                competitors[competitor].append({
+                    "notebook": title,
+                    "sources": len(sources)
+                })
+                break
+                
+            # Also check sources
+            for source in sources:
+                if competitor.lower() in source['title'].lower():
                     competitors[competitor].append({
                         "notebook": title,
-                        "sources": len(sources)
+                        "source": source['title']
                     })
                     break
-                    
-                # Also check sources
-                for source in sources:
-                    if competitor.lower() in source['title'].lower():
-                        competitors[competitor].append({
-                            "notebook": title,
-                            "source": source['title']
-                        })
-                        break
+        
+        return {k: v for k, v in competitors.items() if v}
+    
+    def analyze_competitors(self):
+        """Identify and analyze specific competitors"""
+        self._merge_competitors([self._competitor_entries(notebook) for notebook in self.competitor_notebooks])
+    
+    def _merge_competitors(self, entries: List[Dict[str, List[Dict[str, Any]]]]):
+        """Combine per-notebook competitor mentions, keeping the COMPETITORS order"""
+        competitors = {name: [] for name in COMPETITORS}
+        for entry in entries:
+            for name, mentions in entry.items():
+                competitors[name].extend(mentions)
         
         # Filter out empty competitors
         self.insights['competitors'] = {k: v for k, v in competitors.items() if v}
     
+    def _best_practice_entries(self, notebook: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Best practices contributed by one notebook"""
+        title = notebook['title']
+        sources = notebook.get('sources', [])
+        
+        # Look for case studies, success stories, frameworks
+        best_practice_keywords = ['case study', 'framework', 'strategy', 'roadmap', 'best practice']
+        
+        if any(keyword in title.lower() for keyword in best_practice_keywords):
+            return [{
+                "notebook": title,
+                "source_count": len(sources),
+                "type": self._categorize_best_practice(title)
+            }]
+        return []
+    
     def extract_best_practices(self):
         """Extract best practices and successful approaches"""
         for notebook in self.competitor_notebooks:
-            title = notebook['title']
-            sources = notebook.get('sources', [])
-            
-            # Look for case studies, success stories, frameworks
-            best_practice_keywords = ['case study', 'framework', 'strategy', 'roadmap', 'best practice']
-            
-            if any(keyword in title.lower() for keyword in best_practice_keywords):
-                self.insights['best_practices'].append({
-                    "notebook": title,
-                    "source_count": len(sources),
-                    "type": self._categorize_best_practice(title)
-                })
+            self.insights['best_practices'].extend(self._best_practice_entries(notebook))
+    
+    def analyze_notebook(self, notebook: Dict[str, Any]) -> Dict[str, Any]:
+        """Run every analysis on one notebook; returns its contribution to the report"""
+        return {
+            "ai_technologies": self._ai_technology_entries(notebook),
+            "best_practices": self._best_practice_entries(notebook),
+            "competitors": self._competitor_entries(notebook)
+        }
+    
+    def analyze_all(self, state: Optional[ReportState] = None, workers: int = 1):
+        """Run all analyses, reusing previous contributions for unchanged notebooks when a state is given"""
+        if state is not None:
+            contributions = state.apply(self.competitor_notebooks, self.analyze_notebook, workers)
+        else:
+            contributions = analyze_notebooks(self.competitor_notebooks, self.analyze_notebook, workers)
+        
+        self.insights['ai_technologies'] = [e for c in contributions for e in c['ai_technologies']]
+        self.insights['best_practices'] = [e for c in contributions for e in c['best_practices']]
+        self._merge_competitors([c['competitors'] for c in contributions])
     
     def _categorize_best_practice(self, title: str) -> str:
         """Categorize best practice type"""
@@ -145,7 +184,7 @@ class CompetitorAnalyzer:
         else:
             return "Strategy"
     
-    def generate_report(self) -> Dict[str, Any]:
+    def generate_report(self) -> CompetitorReport:
         """Generate comprehensive competitor analysis report"""
         return {
             "analysis_date": datetime.now().isoformat(),
@@ -159,42 +198,74 @@ class CompetitorAnalyzer:
             "competitor_notebooks": [nb['title'] for nb in self.competitor_notebooks]
         }
     
-    def save_report(self, filename: str = "competitor_analysis_report.json"):
+    def save_report(self, filename: str = "competitor_analysis_report.json", report: Optional[Dict[str, Any]] = None):
         """Save analysis report"""
-        report = self.generate_report()
+        report = report or self.generate_report()
         filepath = self.data_dir / filename
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        records.dump(filepath, report)
         
         print(f"Competitor analysis report saved to {filepath}")
         return filepath
 
 def main():
-    analyzer = CompetitorAnalyzer()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Analyze competitor and market notebooks')
+    parser.add_argument('--data-dir', type=str, default='reports/notebook_data', help='Directory with extracted notebook data')
+    parser.add_argument('--full', action='store_true', help='Ignore previous report state and re-analyze every notebook')
+    parser.add_argument('--workers', type=int, default=1, help='Analyze notebooks in this many processes')
+    Instrumentation.add_arguments(parser)
     
-    if not analyzer.load_competitor_notebooks():
+    args = parser.parse_args()
+    
+    instrumentation = Instrumentation.from_args(args, script="analyze_competitor_notebooks")
+    try:
+        run(args, instrumentation)
+    finally:
+        instrumentation.finish()
+
+def run(args, instrumentation: Instrumentation):
+    analyzer = CompetitorAnalyzer(data_dir=args.data_dir)
+    
+    with instrumentation.stage("load"):
+        loaded = analyzer.load_competitor_notebooks()
+    if not loaded:
         sys.exit(1)
     
     print(f"\nAnalyzing {len(analyzer.competitor_notebooks)} competitor/market notebooks...")
     
-    # Run analyses
-    analyzer.analyze_ai_technologies()
-    analyzer.analyze_competitors()
-    analyzer.extract_best_practices()
+    # Run analyses, reusing the previous run's results for unchanged notebooks
+    state = ReportState(analyzer.data_dir / "competitor_analysis_report.json", version=analyzer_version(CompetitorAnalyzer))
+    with instrumentation.stage("load_state"):
+        if not args.full and state.load():
+            print(f"Loaded previous report state ({len(state.previous)} notebooks)")
+    with instrumentation.stage("analyze"):
+        analyzer.analyze_all(state, workers=args.workers)
+    instrumentation.increment("notebooks_reanalyzed", len(state.changes['added']) + len(state.changes['modified']))
     
-    # Generate and save report
-    report_path = analyzer.save_report()
+    # Generate and save report (only rewritten when something changed)
+    with instrumentation.stage("generate_report"):
+        report = analyzer.generate_report()
+    report_path = state.report_path
+    with instrumentation.stage("save"):
+        written = state.has_changes or args.full or not report_path.exists()
+        if written:
+            analyzer.save_report(report=report)
+            state.save(report['analysis_date'])
+        else:
+            print("No notebook changes since the previous run; report left as is")
+            state.save(state.previous_generated_at)
     
     # Print summary
-    report = analyzer.generate_report()
     print("\n=== Competitor Analysis Summary ===")
     print(f"Total Notebooks Analyzed: {report['total_competitor_notebooks']}")
     print(f"AI Technologies Found: {report['insights']['ai_technologies_count']}")
     print(f"Competitors Identified: {report['insights']['competitors_identified']}")
     print(f"Best Practices Documented: {report['insights']['best_practices_count']}")
     print(f"\nCompetitors: {', '.join(report['detailed_insights'].get('competitors', {}).keys())}")
-    print(f"\nFull report saved to: {report_path}")
+    if written:
+        print(f"\nFull report saved to: {report_path}")
 
 if __name__ == "__main__":
     main()
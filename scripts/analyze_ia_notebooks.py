@@ -1,16 +1,30 @@
 import sys
 import os
-import json
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from collections import defaultdict
 import re
 from datetime import datetime
 
+import records
+from records import IAReport, Notebooks
+from report_state import ReportState, analyze_notebooks, analyzer_version
+from instrumentation import Instrumentation
+from regulation_intervals import DEFAULT_INTERVALS_FILE, IntervalIndex, build_intervals, parse_date
+
 # Add the notebooklm-mcp src directory to path
 mcp_path = os.path.join(os.getcwd(), 'notebooklm-mcp', 'src')
 sys.path.append(mcp_path)
 
+# Title keywords for each insight category, checked in this order
+CATEGORY_KEYWORDS = {
+    'regulations': ['regulation', 'law', 'rule', 'policy'],
+    'compliance_requirements': ['compliance', 'requirement', 'mandatory'],
+    'historical_changes': ['change', 'amendment', 'update', 'revision'],
+    'key_deadlines': ['deadline', 'due', 'timeline'],
+    'metrics_and_kpis': ['metric', 'kpi', 'performance', 'indicator']
+}
+
 class InsuranceAuthorityAnalyzer:
     """Analyze Insurance Authority (IA -) notebooks for regulatory insights"""
     
@@ -32,16 +46,14 @@ class InsuranceAuthorityAnalyzer:
             ia_file = self.data_dir / "filtered_IA_notebooks.json"
             
             if ia_file.exists():
-                with open(ia_file, 'r', encoding='utf-8') as f:
-                    self.ia_notebooks = json.load(f)
+                self.ia_notebooks = records.load(ia_file, Notebooks)
                 print(f"Loaded {len(self.ia_notebooks)} IA notebooks from {ia_file}")
                 return True
             else:
                 # Fallback: filter from all notebooks
                 all_file = self.data_dir / "all_notebooks.json"
                 if all_file.exists():
-                    with open(all_file, 'r', encoding='utf-8') as f:
-                        all_notebooks = json.load(f)
+                    all_notebooks = records.load(all_file, Notebooks)
                     
                     self.ia_notebooks = [nb for nb in all_notebooks if nb['title'].startswith('IA -')]
                     print(f"Filtered {len(self.ia_notebooks)} IA notebooks from all notebooks")
@@ -60,8 +72,7 @@ class InsuranceAuthorityAnalyzer:
             detailed_file = self.data_dir / "detailed_IA_notebooks.json"
             
             if detailed_file.exists():
-                with open(detailed_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                return records.load(detailed_file, Notebooks)
             else:
                 print("No detailed IA notebook data found.")
                 return []
@@ -87,62 +98,53 @@ class InsuranceAuthorityAnalyzer:
         
         return dates
     
-    def analyze_regulatory_content(self):
-        """Analyze regulatory content from IA notebooks"""
-        detailed_data = self.load_detailed_data()
+    def analyze_notebook(self, notebook: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+        """Analyze one notebook; returns its contribution to each insight category"""
+        contribution: Dict[str, List[Dict[str, Any]]] = {category: [] for category in self.regulatory_insights}
+        title = notebook.get('title', '')
         
-        for notebook in detailed_data:
-            title = notebook.get('title', '')
-            
-            # Categorize by title keywords
-            if any(keyword in title.lower() for keyword in ['regulation', 'law', 'rule', 'policy']):
-                self.regulatory_insights['regulations'].append({
-                    "title": title,
-                    "notebook_id": notebook.get('notebook_id'),
-                    "source_count": len(notebook.get('sources', []))
-                })
-            
-            if any(keyword in title.lower() for keyword in ['compliance', 'requirement', 'mandatory']):
-                self.regulatory_insights['compliance_requirements'].append({
-                    "title": title,
-                    "notebook_id": notebook.get('notebook_id'),
-                    "source_count": len(notebook.get('sources', []))
-                })
-            
-            if any(keyword in title.lower() for keyword in ['change', 'amendment', 'update', 'revision']):
-                self.regulatory_insights['historical_changes'].append({
-                    "title": title,
-                    "notebook_id": notebook.get('notebook_id'),
-                    "source_count": len(notebook.get('sources', []))
-                })
-            
-            if any(keyword in title.lower() for keyword in ['deadline', 'due', 'timeline']):
-                self.regulatory_insights['key_deadlines'].append({
-                    "title": title,
-                    "notebook_id": notebook.get('notebook_id'),
-                    "source_count": len(notebook.get('sources', []))
-                })
-            
-            if any(keyword in title.lower() for keyword in ['metric', 'kpi', 'performance', 'indicator']):
-                self.regulatory_insights['metrics_and_kpis'].append({
+        # Categorize by title keywords
+        for category, keywords in CATEGORY_KEYWORDS.items():
+            if any(keyword in title.lower() for keyword in keywords):
+                contribution[category].append({
                     "title": title,
                     "notebook_id": notebook.get('notebook_id'),
                     "source_count": len(notebook.get('sources', []))
                 })
+        
+        # Extract query results if available
+        if 'query_result' in notebook and notebook['query_result'].get('response'):
+            response = notebook['query_result']['response']
             
-            # Extract query results if available
-            if 'query_result' in notebook and notebook['query_result'].get('response'):
-                response = notebook['query_result']['response']
-                
-                # Extract dates from response
-                dates = self.extract_date_patterns(str(response))
-                if dates:
-                    for date in dates:
-                        self.regulatory_insights['historical_changes'].append({
-                            "date": date,
-                            "context": title,
-                            "notebook_id": notebook.get('notebook_id')
-                        })
+            # Extract dates from response
+            dates = self.extract_date_patterns(str(response))
+            if dates:
+                for date in dates:
+                    contribution['historical_changes'].append({
+                        "date": date,
+                        "context": title,
+                        "notebook_id": notebook.get('notebook_id')
+                    })
+        
+        return contribution
+    
+    def merge_contributions(self, contributions: List[Dict[str, List[Dict[str, Any]]]]):
+        """Rebuild regulatory insights from per-notebook contributions, in notebook order"""
+        for category in self.regulatory_insights:
+            self.regulatory_insights[category] = [
+                item for contribution in contributions for item in contribution.get(category, [])
+            ]
+    
+    def analyze_regulatory_content(self, state: Optional[ReportState] = None, workers: int = 1):
+        """Analyze regulatory content from IA notebooks (across `workers` processes when > 1)"""
+        detailed_data = self.load_detailed_data()
+        
+        if state is not None:
+            contributions = state.apply(detailed_data, self.analyze_notebook, workers)
+        else:
+            contributions = analyze_notebooks(detailed_data, self.analyze_notebook, workers)
+        
+        self.merge_contributions(contributions)
     
     def generate_timeline(self) -> List[Dict[str, Any]]:
         """Generate timeline of regulatory changes"""
@@ -152,12 +154,16 @@ class InsuranceAuthorityAnalyzer:
             if 'date' in change:
                 timeline.append(change)
         
-        # Sort by date (simplified - would need proper date parsing)
-        timeline.sort(key=lambda x: x.get('date', ''), reverse=True)
+        # Newest first; dates that do not parse go last
+        timeline.sort(key=lambda x: parse_date(x.get('date', '')) or datetime.min.date(), reverse=True)
         
         return timeline
     
-    def generate_summary_report(self) -> Dict[str, Any]:
+    def build_interval_index(self) -> IntervalIndex:
+        """Index of regulation versions by the dates they were in force"""
+        return IntervalIndex(build_intervals(self.regulatory_insights['historical_changes']))
+    
+    def generate_summary_report(self) -> IAReport:
         """Generate comprehensive summary report"""
         return {
             "analysis_date": datetime.now().isoformat(),
@@ -173,35 +179,75 @@ class InsuranceAuthorityAnalyzer:
             "timeline": self.generate_timeline()
         }
     
-    def save_report(self, filename: str = "ia_analysis_report.json"):
+    def save_report(self, filename: str = "ia_analysis_report.json", report: Optional[Dict[str, Any]] = None):
         """Save analysis report"""
-        report = self.generate_summary_report()
+        report = report or self.generate_summary_report()
         filepath = self.data_dir / filename
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        records.dump(filepath, report)
         
         print(f"Analysis report saved to {filepath}")
+        
+        intervals_path = self.build_interval_index().save(self.data_dir / DEFAULT_INTERVALS_FILE)
+        print(f"Regulation interval index saved to {intervals_path}")
         return filepath
 
 def main():
-    analyzer = InsuranceAuthorityAnalyzer()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Analyze Insurance Authority notebooks')
+    parser.add_argument('--data-dir', type=str, default='reports/notebook_data', help='Directory with extracted notebook data')
+    parser.add_argument('--full', action='store_true', help='Ignore previous report state and re-analyze every notebook')
+    parser.add_argument('--workers', type=int, default=1, help='Analyze notebooks in this many processes')
+    Instrumentation.add_arguments(parser)
+    
+    args = parser.parse_args()
+    
+    instrumentation = Instrumentation.from_args(args, script="analyze_ia_notebooks")
+    try:
+        run(args, instrumentation)
+    finally:
+        instrumentation.finish()
+
+def run(args, instrumentation: Instrumentation):
+    analyzer = InsuranceAuthorityAnalyzer(data_dir=args.data_dir)
     
     # Load IA notebooks
-    if not analyzer.load_ia_notebooks():
+    with instrumentation.stage("load"):
+        loaded = analyzer.load_ia_notebooks()
+    if not loaded:
         print("Failed to load IA notebooks. Exiting.")
         sys.exit(1)
     
     print(f"\nAnalyzing {len(analyzer.ia_notebooks)} Insurance Authority notebooks...")
     
-    # Analyze content
-    analyzer.analyze_regulatory_content()
+    # Analyze content, reusing the previous run's results for unchanged notebooks
+    state = ReportState(analyzer.data_dir / "ia_analysis_report.json", version=analyzer_version(InsuranceAuthorityAnalyzer))
+    # The notebook total comes from the filtered list, which the per-notebook state does not cover
+    state.inputs = {"total_ia_notebooks": len(analyzer.ia_notebooks)}
+    with instrumentation.stage("load_state"):
+        if not args.full and state.load():
+            print(f"Loaded previous report state ({len(state.previous)} notebooks)")
+    with instrumentation.stage("analyze"):
+        analyzer.analyze_regulatory_content(state, workers=args.workers)
+    instrumentation.increment("notebooks_reanalyzed", len(state.changes['added']) + len(state.changes['modified']))
     
-    # Generate and save report
-    report_path = analyzer.save_report()
+    # Generate and save report (only rewritten when something changed)
+    with instrumentation.stage("generate_report"):
+        report = analyzer.generate_summary_report()
+    report_path = state.report_path
+    with instrumentation.stage("save"):
+        written = state.has_changes or args.full or not report_path.exists()
+        if written:
+            analyzer.save_report(report=report)
+            state.save(report['analysis_date'])
+        else:
+            print("No notebook changes since the previous run; report left as is")
+            state.save(state.previous_generated_at)
+            if not IntervalIndex.readable(analyzer.data_dir / DEFAULT_INTERVALS_FILE):
+                analyzer.build_interval_index().save(analyzer.data_dir / DEFAULT_INTERVALS_FILE)
     
     # Print summary
-    report = analyzer.generate_summary_report()
     print("\n=== Insurance Authority Analysis Summary ===")
     print(f"Total IA Notebooks: {report['total_ia_notebooks']}")
     print(f"Regulations: {report['regulatory_insights']['regulations_count']}")
@@ -209,7 +255,8 @@ def main():
     print(f"Historical Changes: {report['regulatory_insights']['historical_changes_count']}")
     print(f"Key Deadlines: {report['regulatory_insights']['key_deadlines_count']}")
     print(f"Metrics & KPIs: {report['regulatory_insights']['metrics_kpis_count']}")
-    print(f"\nFull report saved to: {report_path}")
+    if written:
+        print(f"\nFull report saved to: {report_path}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,105 @@
+"""
+SQLite answer cache shared by the bridge and the warm-up job
+Answers are keyed by notebook and normalized question (see single_flight.query_key)
+and served while younger than the cache TTL.
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from single_flight import query_key
+
+DEFAULT_CACHE_PATH = Path("reports/cache/answers.sqlite3")
+DEFAULT_TTL_S = 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    notebook_id TEXT NOT NULL,
+    question_key TEXT NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    sources TEXT NOT NULL DEFAULT '[]',
+    origin TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (notebook_id, question_key)
+)
+"""
+
+
+class AnswerCache:
+    """Thread-safe answer store with a freshness TTL"""
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_TTL_S):
+        self.path = Path(path) if path else DEFAULT_CACHE_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(SCHEMA)
+        self.conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, notebook_id: str, question: str) -> Optional[Dict[str, Any]]:
+        """A fresh cached answer, or None"""
+        _, key = query_key(notebook_id, question)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT answer, sources, origin, created_at FROM answers WHERE notebook_id = ? AND question_key = ?",
+                (notebook_id, key)
+            ).fetchone()
+            age = time.time() - row[3] if row else None
+            if row is None or age > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return {"answer": row[0], "sources": json.loads(row[1]), "origin": row[2], "age_s": round(age, 3)}
+
+    def put(self, notebook_id: str, question: str, answer: str, sources: Optional[List[Any]] = None,
+            origin: str = "bridge", created_at: Optional[float] = None):
+        _, key = query_key(notebook_id, question)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (notebook_id, key, question, answer, json.dumps(sources or [], ensure_ascii=False), origin,
+                 created_at if created_at is not None else time.time())
+            )
+            self.conn.commit()
+
+    def ages(self, pairs: List[tuple]) -> List[Optional[float]]:
+        """Age in seconds of each (notebook_id, question) entry, None where missing"""
+        now = time.time()
+        ages = []
+        with self.lock:
+            for notebook_id, question in pairs:
+                _, key = query_key(notebook_id, question)
+                row = self.conn.execute(
+                    "SELECT created_at FROM answers WHERE notebook_id = ? AND question_key = ?", (notebook_id, key)
+                ).fetchone()
+                ages.append(now - row[0] if row else None)
+        return ages
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            entries, expired = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(created_at < ?), 0) FROM answers", (time.time() - self.ttl,)
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "path": str(self.path),
+                "ttl_s": self.ttl,
+                "entries": entries,
+                "expired": expired,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None
+            }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
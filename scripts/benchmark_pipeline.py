@@ -0,0 +1,365 @@
+"""
+End-to-end latency benchmark for the Python notebook pipeline
+Synthesizes notebook datasets of increasing size and runs extraction, analysis,
+insights and indexing against them, recording wall time, peak RSS and
+allocations per stage. Each stage runs in a fresh process so RSS is per stage.
+The vector_search stage queries synthetic embeddings exactly (exact_search.py)
+and through the int8 copy and, with chromadb installed, an HNSW collection. It
+reports the recall of each against the exact results.
+
+    python scripts/benchmark_pipeline.py --sizes 50 500 5000 50000
+    python scripts/benchmark_pipeline.py --save-baseline
+    python scripts/benchmark_pipeline.py --baseline reports/benchmarks/pipeline_baseline.json
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import asyncio
+import random
+import tempfile
+import contextlib
+import multiprocessing
+import tracemalloc
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# Stage imports go through the offline NotebookLM shim
+sys.path.insert(0, str(SCRIPTS_DIR))
+sys.path.insert(0, str(SCRIPTS_DIR / "fakes"))
+
+from fake_notebooklm import FakeBackend, FakeConfig, FakeNotebookLMClient
+
+DEFAULT_SIZES = [50, 500, 5000, 50000]
+STAGES = ['extraction', 'ia_analysis', 'competitor_analysis', 'insights', 'indexing', 'vector_search']
+DEFAULT_OUTPUT_DIR = Path("reports/benchmarks")
+DEFAULT_BASELINE = DEFAULT_OUTPUT_DIR / "pipeline_baseline.json"
+# vector_search: embeddings per notebook (capped), their dimension, queries and neighbours compared
+VECTORS_PER_NOTEBOOK = 10
+MAX_VECTORS = 20000
+VECTOR_DIM = 256
+VECTOR_QUERIES = 200
+RECALL_K = 10
+# Allowed recall drop vs baseline before failing
+RECALL_TOLERANCE = 0.02
+
+
+def synthesize_dataset(size: int, data_dir: Path, seed: int = 42):
+    """Write all_notebooks, filtered and detailed IA dumps for a synthetic corpus"""
+    backend = FakeBackend(FakeConfig(notebooks=size, seed=seed))
+    notebooks = [nb.to_dict() for nb in backend.notebooks]
+    rng = random.Random(seed)
+
+    ia_notebooks = [nb for nb in notebooks if nb['title'].startswith('IA -')]
+    detailed = []
+    for nb in ia_notebooks:
+        detailed.append({
+            "notebook_id": nb['notebook_id'],
+            "title": nb['title'],
+            "sources": [{"title": s['title'], "source_id": s['id'], "type": s['type']} for s in nb['sources']],
+            "extracted_at": "2025-01-01 00:00:00",
+            "query_result": {
+                "notebook_id": nb['notebook_id'],
+                "query": "What regulatory changes were introduced?",
+                "response": backend.answer(nb['notebook_id'], "What regulatory changes were introduced?", rng),
+                "queried_at": "2025-01-01 00:00:00"
+            }
+        })
+
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for filename, data in [("all_notebooks.json", notebooks),
+                           ("filtered_IA_notebooks.json", ia_notebooks),
+                           ("detailed_IA_notebooks.json", detailed)]:
+        with open(data_dir / filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    return {"notebooks": len(notebooks), "ia_notebooks": len(ia_notebooks),
+            "sources": sum(nb['source_count'] for nb in notebooks)}
+
+
+def synthesize_vectors(size: int, seed: int = 42):
+    """Clustered embeddings with notebook ids, plus queries drawn from the same clusters"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    count = min(size * VECTORS_PER_NOTEBOOK, MAX_VECTORS)
+    # Clusters overlap enough that HNSW at default settings misses some true neighbours
+    centers = rng.normal(scale=0.25, size=(max(count // 100, 8), VECTOR_DIM))
+    vectors = (centers[rng.integers(0, len(centers), count)] + rng.normal(scale=0.5, size=(count, VECTOR_DIM))).astype(np.float32)
+    queries = (centers[rng.integers(0, len(centers), VECTOR_QUERIES)] + rng.normal(scale=0.5, size=(VECTOR_QUERIES, VECTOR_DIM))).astype(np.float32)
+    ids = [f"vec_{i}" for i in range(count)]
+    metadatas = [{"notebook_id": f"nb_{i % max(size, 1)}"} for i in range(count)]
+    return ids, vectors, metadatas, queries
+
+
+def _hnsw_collection(ids: List[str], vectors, metadatas: List[Dict[str, Any]]):
+    """An in-memory ChromaDB collection over the vectors, or None without chromadb"""
+    try:
+        import chromadb
+        from chromadb.config import Settings
+    except ImportError:
+        return None
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    collection = client.create_collection(f"bench_{len(ids)}", metadata={'hnsw:space': 'cosine'})
+    for start in range(0, len(ids), 5000):
+        collection.add(ids=ids[start:start + 5000], embeddings=vectors[start:start + 5000],
+                       metadatas=metadatas[start:start + 5000])
+    return collection
+
+
+def _stage_runner(stage: str, data_dir: Path, size: int):
+    """Prepare a stage and return a zero-argument callable that runs it"""
+    if stage == 'extraction':
+        from extract_notebook_data import NotebookExtractor
+        client = FakeNotebookLMClient(backend=FakeBackend(FakeConfig(notebooks=size)))
+        extractor = NotebookExtractor(output_dir=str(data_dir / "extraction"))
+        extractor.client = client
+
+        def run():
+            notebooks = extractor.list_all_notebooks()
+            targets = extractor.filter_notebooks(notebooks, 'IA -')
+            detailed = [extractor.extract_notebook_sources(nb['notebook_id']) for nb in targets]
+            extractor.save_data(detailed, "detailed_IA_notebooks.json")
+        return run
+
+    if stage == 'ia_analysis':
+        from analyze_ia_notebooks import InsuranceAuthorityAnalyzer
+
+        def run():
+            analyzer = InsuranceAuthorityAnalyzer(data_dir=str(data_dir))
+            analyzer.load_ia_notebooks()
+            analyzer.analyze_regulatory_content()
+            analyzer.save_report()
+        return run
+
+    if stage == 'competitor_analysis':
+        from analyze_competitor_notebooks import CompetitorAnalyzer
+
+        def run():
+            analyzer = CompetitorAnalyzer(data_dir=str(data_dir))
+            analyzer.load_competitor_notebooks()
+            analyzer.analyze_all()
+            analyzer.save_report()
+        return run
+
+    if stage == 'insights':
+        from insurance_ai_insights import InsuranceAIInsightsGenerator
+
+        def run():
+            generator = InsuranceAIInsightsGenerator(data_dir=str(data_dir))
+            generator.load_analysis_data()
+            generator.save_report()
+        return run
+
+    if stage == 'indexing':
+        from index_ia_regulations import extract_regulatory_content
+        client = FakeNotebookLMClient(backend=FakeBackend(FakeConfig(notebooks=size)))
+        ia_ids = [nb.id for nb in client.backend.notebooks if nb.title.startswith('IA -')]
+
+        def run():
+            async def extract_all():
+                documents = []
+                for notebook_id in ia_ids:
+                    documents.extend(await extract_regulatory_content(notebook_id, client))
+                return documents
+            documents = asyncio.run(extract_all())
+            with open(data_dir / "ia_regulations_content.json", 'w', encoding='utf-8') as f:
+                json.dump(documents, f, ensure_ascii=False)
+        return run
+
+    if stage == 'vector_search':
+        from exact_search import ExactIndex, recall_at_k
+        from quantized_store import QuantizedCollection, rescore
+        ids, vectors, metadatas, queries = synthesize_vectors(size)
+        # Index builds are setup; the stage times the queries
+        oracle = ExactIndex(ids, vectors, metadatas)
+        quantized = QuantizedCollection.build("bench", ids, vectors, metadatas)
+        hnsw = _hnsw_collection(ids, vectors, metadatas)
+        positions = {doc_id: i for i, doc_id in enumerate(ids)}
+
+        def run():
+            start = time.perf_counter()
+            truth = oracle.query(queries, RECALL_K, include=())['ids']
+            metrics = {"vectors": len(ids), "queries": len(queries),
+                       "exact_batch_ms": round((time.perf_counter() - start) * 1000, 3)}
+
+            found = []
+            for query in queries:
+                candidates = quantized.candidates(query, RECALL_K * 4)
+                rows = oracle.matrix[[positions[c] for c in candidates]]
+                found.append([doc_id for doc_id, _ in rescore(query, candidates, rows, RECALL_K)])
+            metrics["int8_rescored_recall"] = round(recall_at_k(truth, found), 4)
+
+            if hnsw is not None:
+                results = hnsw.query(query_embeddings=queries, n_results=RECALL_K, include=[])
+                metrics["hnsw_recall"] = round(recall_at_k(truth, results['ids']), 4)
+            return metrics
+        return run
+
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def _peak_rss_kb() -> int:
+    """Peak resident set size of this process in KiB"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == 'darwin' else peak
+    except ImportError:
+        return 0
+
+
+def _run_stage(stage: str, data_dir: str, size: int, trace: bool, queue):
+    """Child-process entry point: run one stage and report its measurements"""
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run = _stage_runner(stage, Path(data_dir), size)
+            rss_before = _peak_rss_kb()
+
+            if trace:
+                tracemalloc.start()
+            start = time.perf_counter()
+            metrics = run()
+            wall = time.perf_counter() - start
+
+            result = {"wall_time_s": round(wall, 6), "rss_before_kb": rss_before, "peak_rss_kb": _peak_rss_kb(),
+                      **(metrics or {})}
+            if trace:
+                current, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                result["alloc_peak_bytes"] = peak
+                result["alloc_retained_bytes"] = current
+                result["alloc_retained_blocks"] = sum(stat.count for stat in snapshot.statistics('filename'))
+        queue.put({"status": "success", **result})
+    except Exception as e:
+        queue.put({"status": "error", "error": f"{type(e).__name__}: {str(e)}"})
+
+
+def measure_stage(stage: str, data_dir: Path, size: int, allocations: bool = True) -> Dict[str, Any]:
+    """Run a stage in a fresh process (untraced for timing, then traced for allocations)"""
+    ctx = multiprocessing.get_context('spawn')
+
+    def run_child(trace: bool) -> Dict[str, Any]:
+        queue = ctx.Queue()
+        process = ctx.Process(target=_run_stage, args=(stage, str(data_dir), size, trace, queue))
+        process.start()
+        while True:
+            try:
+                result = queue.get(timeout=1)
+                break
+            except Exception:
+                if not process.is_alive():
+                    result = {"status": "error", "error": f"Stage process exited with code {process.exitcode}"}
+                    break
+        process.join()
+        return result
+
+    result = run_child(trace=False)
+    if allocations and result['status'] == 'success':
+        traced = run_child(trace=True)
+        for key in ('alloc_peak_bytes', 'alloc_retained_bytes', 'alloc_retained_blocks'):
+            if key in traced:
+                result[key] = traced[key]
+        result['traced_wall_time_s'] = traced.get('wall_time_s')
+    return result
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Dict[str, Any]]:
+    """Wall-time and RSS regressions beyond the tolerance, per size and stage"""
+    regressions = []
+    for size, stages in results['runs'].items():
+        for stage, current in stages['stages'].items():
+            previous = baseline.get('runs', {}).get(size, {}).get('stages', {}).get(stage)
+            if not previous or current.get('status') != 'success' or previous.get('status') != 'success':
+                continue
+            for metric in ('wall_time_s', 'peak_rss_kb', 'alloc_peak_bytes'):
+                if not previous.get(metric) or metric not in current:
+                    continue
+                ratio = current[metric] / previous[metric]
+                current.setdefault('vs_baseline', {})[metric] = round(ratio, 3)
+                # Sub-10ms stages are dominated by noise
+                if metric == 'wall_time_s' and previous[metric] < 0.01:
+                    continue
+                if ratio > 1 + tolerance:
+                    regressions.append({"size": size, "stage": stage, "metric": metric,
+                                        "baseline": previous[metric], "current": current[metric], "ratio": round(ratio, 3)})
+            for metric in (m for m in current if m.endswith('_recall')):
+                if metric in previous and current[metric] < previous[metric] - RECALL_TOLERANCE:
+                    regressions.append({"size": size, "stage": stage, "metric": metric,
+                                        "baseline": previous[metric], "current": current[metric]})
+    return regressions
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the notebook data pipeline at increasing corpus sizes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Notebook counts to synthesize')
+    parser.add_argument('--stages', type=str, nargs='+', default=STAGES, choices=STAGES, help='Stages to run')
+    parser.add_argument('--output', type=str, help='Results file (default: reports/benchmarks/pipeline_<timestamp>.json)')
+    parser.add_argument('--baseline', type=str, help=f'Baseline to compare against (default: {DEFAULT_BASELINE} if present)')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown vs baseline before failing (0.25 = 25%%)')
+    parser.add_argument('--skip-allocations', action='store_true', help='Skip the traced allocation pass')
+    parser.add_argument('--seed', type=int, default=42)
+
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {
+        "benchmark": "pipeline",
+        "run_at": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "cpu_count": os.cpu_count(),
+        "runs": {}
+    }
+
+    with tempfile.TemporaryDirectory(prefix="pipeline_bench_") as tmp:
+        for size in args.sizes:
+            data_dir = Path(tmp) / str(size)
+            dataset = synthesize_dataset(size, data_dir, seed=args.seed)
+            print(json.dumps({"status": "info", "message": f"Synthesized {size} notebooks", **dataset}))
+
+            run = {"dataset": dataset, "stages": {}}
+            for stage in args.stages:
+                measurement = measure_stage(stage, data_dir, size, allocations=not args.skip_allocations)
+                run["stages"][stage] = measurement
+                print(json.dumps({"status": measurement['status'], "size": size, "stage": stage,
+                                  **{k: v for k, v in measurement.items() if k != 'status'}}))
+            results["runs"][str(size)] = run
+
+    baseline_path = Path(args.baseline) if args.baseline else DEFAULT_BASELINE
+    regressions: List[Dict[str, Any]] = []
+    if baseline_path.exists() and not args.save_baseline:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        results["baseline"] = {"path": str(baseline_path), "run_at": baseline.get('run_at'),
+                               "tolerance": args.tolerance, "regressions": regressions}
+
+    output = Path(args.output) if args.output else DEFAULT_OUTPUT_DIR / f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    print(json.dumps({
+        "status": "regression" if regressions else "complete",
+        "message": f"Benchmark results saved to {output}",
+        "regressions": len(regressions)
+    }))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Client-compatible proxy that sends notebook queries through a running bridge server
+Lets batch scripts share the bridge's scheduler (and its upstream quota) with the
+chat route instead of calling NotebookLM directly. Calls other than queries go
+to the wrapped direct client.
+"""
+
+import json
+import urllib.request
+import urllib.error
+from typing import Any, Dict, Optional
+
+
+class BridgeError(Exception):
+    """The bridge answered with an error payload"""
+
+
+class BridgeClient:
+    """Send query/query_notebook to the bridge on a given priority lane"""
+
+    def __init__(self, base_url: str, priority: str = "batch", client: Any = None, timeout: float = 300.0):
+        self.base_url = base_url.rstrip('/')
+        self.priority = priority
+        self.client = client
+        self.timeout = timeout
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        request = urllib.request.Request(
+            f"{self.base_url}{path}",
+            data=json.dumps(payload).encode('utf-8'),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                result = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            result = json.loads(e.read() or b'{}')
+        if result.get("status") != "success":
+            raise BridgeError(result.get("error") or f"Bridge returned status {result.get('status')}")
+        return result
+
+    def query(self, notebook_id: str, query_text: str, **kwargs) -> Dict[str, Any]:
+        # The bridge drops the call once we would have stopped waiting anyway
+        result = self._post("/query", {"notebook_id": notebook_id, "query": query_text, "priority": self.priority,
+                                       "deadline_ms": self.timeout * 1000})
+        return {"answer": result.get("answer", ""), "conversation_id": result.get("conversation_id")}
+
+    def query_notebook(self, notebook_id: str, query: str) -> str:
+        return self.query(notebook_id, query)["answer"]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_') or self.client is None:
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+
+def bridge_client(client: Any, bridge_url: Optional[str], priority: str = "batch") -> Any:
+    """Route the client's queries through the bridge when a bridge URL is configured"""
+    if not bridge_url:
+        return client
+    return BridgeClient(bridge_url, priority=priority, client=client)
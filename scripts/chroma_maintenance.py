@@ -0,0 +1,453 @@
+"""
+Compaction and maintenance for the persistent ChromaDB store
+Runs against a live server. chroma.sqlite3 is vacuumed the way `chroma vacuum`
+does it: the exclusive lock is held only for the VACUUM itself, and the run is
+recorded in maintenance_log. Segment directories of dropped collections are
+removed. HNSW segments only mark deleted vectors, so after enough
+deleteDocument/updateDocument churn, searches still walk dead graph nodes. A collection whose segment holds at least --min-deleted-ratio dead
+vectors is rebuilt. Its records are copied through the server into a fresh
+collection, which then takes over the name. If the collection is written to
+during the copy, the copy is redone. Writes that reach the old collection after
+the swap, through handles cached by id, are carried over before it is dropped.
+If the swap cannot finish, the original gets its name back. With --ingest-url,
+the ingest gateway's flushes to the collection are paused for the whole
+rebuild. Store size and query latency are reported before and after.
+
+    python scripts/chroma_maintenance.py --dry-run
+    python scripts/chroma_maintenance.py --min-deleted-ratio 0.2 --ingest-url http://127.0.0.1:8001
+    python run-chroma.py --maintenance-every 24
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import struct
+import sqlite3
+import threading
+import urllib.request
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from typing import List, Dict, Any, Iterator, Optional
+
+from chroma_snapshot import DEFAULT_PERSIST_DIR, SQLITE_FILE
+from instrumentation import LatencyHistogram
+
+DEFAULT_CHROMA_URL = "http://localhost:8000"
+REBUILD_SUFFIX = "__rebuild"
+COPY_BATCH = 1000
+REBUILD_ATTEMPTS = 3
+LATENCY_SAMPLES = 20
+FENCE_TIMEOUT_S = 900.0
+# chroma-hnswlib header.bin: int32 version, then size_t offsetLevel0, max_elements, cur_element_count, ...
+HEADER_ELEMENT_COUNT = struct.Struct('<Q')
+HEADER_ELEMENT_COUNT_OFFSET = 20
+SEGMENT_DIR = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$')
+
+
+class MaintenanceError(Exception):
+    """A maintenance step could not be completed safely"""
+
+
+def dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob('*') if p.is_file())
+
+
+def hnsw_elements(segment_dir: Path) -> Optional[int]:
+    """Vectors ever inserted into a persisted HNSW segment, deleted ones included"""
+    header = Path(segment_dir) / "header.bin"
+    if not header.exists():
+        return None  # Not persisted yet (below hnsw:sync_threshold)
+    data = header.read_bytes()
+    if len(data) < HEADER_ELEMENT_COUNT_OFFSET + HEADER_ELEMENT_COUNT.size:
+        return None
+    return HEADER_ELEMENT_COUNT.unpack_from(data, HEADER_ELEMENT_COUNT_OFFSET)[0]
+
+
+def inspect_store(persist_dir: Path) -> Dict[str, Any]:
+    """Sizes, free SQLite pages, dead HNSW vectors per collection and segment directories of dropped collections"""
+    persist_dir = Path(persist_dir)
+    sqlite_path = persist_dir / SQLITE_FILE
+    if not sqlite_path.exists():
+        raise MaintenanceError(f"No {SQLITE_FILE} in {persist_dir}")
+
+    # Listed before reading segments: a segment row is committed before its directory is created
+    segment_dirs = [p for p in persist_dir.iterdir() if p.is_dir() and SEGMENT_DIR.match(p.name)]
+    conn = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    try:
+        segment_ids = {row[0] for row in conn.execute("SELECT id FROM segments")}
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        rows = conn.execute("""
+            SELECT c.id, c.name, v.id,
+                   (SELECT COUNT(*) FROM embeddings e WHERE e.segment_id = m.id)
+            FROM collections c
+            LEFT JOIN segments v ON v.collection = c.id AND v.scope = 'VECTOR'
+            LEFT JOIN segments m ON m.collection = c.id AND m.scope = 'METADATA'
+            ORDER BY c.name
+        """).fetchall()
+        queue_rows = conn.execute("SELECT COUNT(*) FROM embeddings_queue").fetchone()[0]
+    finally:
+        conn.close()
+
+    collections = {}
+    for collection_id, name, segment_id, live in rows:
+        segment_dir = persist_dir / segment_id if segment_id else None
+        elements = hnsw_elements(segment_dir) if segment_dir else None
+        deleted = max(elements - live, 0) if elements is not None else None
+        collections[name] = {
+            "id": collection_id,
+            "live": live,
+            "hnsw_elements": elements,
+            "deleted": deleted,
+            "deleted_ratio": round(deleted / elements, 4) if elements else None,
+            "segment_bytes": dir_bytes(segment_dir) if segment_dir and segment_dir.exists() else 0
+        }
+
+    return {
+        "store_bytes": dir_bytes(persist_dir),
+        "sqlite_bytes": sqlite_path.stat().st_size,
+        "sqlite_free_bytes": free_pages * page_size,
+        "queue_rows": queue_rows,
+        "collections": collections,
+        "orphan_segments": {p.name: dir_bytes(p) for p in segment_dirs if p.name not in segment_ids}
+    }
+
+
+def remove_orphan_segments(persist_dir: Path, orphans: Dict[str, int]) -> int:
+    """Delete segment directories left behind by dropped collections; returns bytes freed"""
+    freed = 0
+    for name, size in orphans.items():
+        shutil.rmtree(Path(persist_dir) / name, ignore_errors=True)
+        freed += size
+    return freed
+
+
+def vacuum_sqlite(sqlite_path: Path, timeout: float = 30.0) -> float:
+    """VACUUM a live chroma.sqlite3, waiting up to `timeout` seconds for the lock; returns seconds taken"""
+    start = time.perf_counter()
+    conn = sqlite3.connect(str(sqlite_path), timeout=timeout, isolation_level=None)
+    try:
+        conn.execute(f"PRAGMA busy_timeout = {int(timeout * 1000)}")
+        conn.execute("VACUUM")
+        conn.execute("INSERT INTO maintenance_log (operation, timestamp) VALUES ('vacuum', CURRENT_TIMESTAMP)")
+    except sqlite3.OperationalError as e:
+        raise MaintenanceError(f"VACUUM of {sqlite_path} failed: {str(e)}")
+    finally:
+        conn.close()
+    return time.perf_counter() - start
+
+
+def queue_watermark(sqlite_path: Path, collection_id: str) -> int:
+    """Highest write sequence number recorded for a collection"""
+    conn = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True, timeout=30)
+    try:
+        row = conn.execute("SELECT MAX(seq_id) FROM embeddings_queue WHERE topic LIKE ?",
+                           (f"%/{collection_id}",)).fetchone()
+        return row[0] or 0
+    finally:
+        conn.close()
+
+
+def changed_ids(sqlite_path: Path, collection_id: str, since: int) -> Optional[List[str]]:
+    """Ids written in a collection after write sequence `since`, or None if the queue was purged past it"""
+    conn = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True, timeout=30)
+    try:
+        first = conn.execute("SELECT MIN(seq_id) FROM embeddings_queue").fetchone()[0]
+        if first is None or first > since + 1:
+            return None
+        rows = conn.execute("SELECT DISTINCT id FROM embeddings_queue WHERE topic LIKE ? AND seq_id > ?",
+                            (f"%/{collection_id}", since))
+        return [row[0] for row in rows]
+    finally:
+        conn.close()
+
+
+def live_count(sqlite_path: Path, collection_id: str) -> int:
+    """Records in a collection according to the store itself (a replica may lag behind)"""
+    conn = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True, timeout=30)
+    try:
+        return conn.execute("""
+            SELECT COUNT(*) FROM embeddings e JOIN segments m ON e.segment_id = m.id
+            WHERE m.collection = ? AND m.scope = 'METADATA'
+        """, (collection_id,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def query_latency(collection, samples: int = LATENCY_SAMPLES, k: int = 10) -> Dict[str, Any]:
+    """Query with stored embeddings as probes"""
+    probes = collection.get(limit=samples, include=['embeddings'])['embeddings']
+    histogram = LatencyHistogram()
+    for probe in probes if probes is not None else []:
+        start = time.perf_counter()
+        collection.query(query_embeddings=[probe], n_results=k, include=['distances'])
+        histogram.observe(time.perf_counter() - start)
+    stats = histogram.to_dict()
+    return {key: stats[key] for key in ("count", "mean_ms", "p50_ms", "p95_ms", "max_ms")}
+
+
+def copy_collection(source, target, batch: int = COPY_BATCH) -> int:
+    copied = 0
+    while True:
+        page = source.get(limit=batch, offset=copied, include=['embeddings', 'documents', 'metadatas'])
+        if not page['ids']:
+            return copied
+        target.add(ids=page['ids'], embeddings=page['embeddings'],
+                   documents=page['documents'], metadatas=page['metadatas'])
+        copied += len(page['ids'])
+
+
+def all_ids(collection) -> List[str]:
+    return collection.get(include=[])['ids']
+
+
+def sync_records(source, target, ids: List[str], batch: int = COPY_BATCH) -> int:
+    """Make `target` match `source` for these ids: upsert the ones source has, delete the rest"""
+    for start in range(0, len(ids), batch):
+        wanted = ids[start:start + batch]
+        page = source.get(ids=wanted, include=['embeddings', 'documents', 'metadatas'])
+        if page['ids']:
+            target.upsert(ids=page['ids'], embeddings=page['embeddings'],
+                          documents=page['documents'], metadatas=page['metadatas'])
+        present = set(page['ids'])
+        gone = [i for i in wanted if i not in present]
+        if gone:
+            target.delete(ids=gone)
+    return len(ids)
+
+
+def carry_over(sqlite_path: Path, source, target, since: int) -> int:
+    """Apply the writes `source` received after write sequence `since` to `target`"""
+    ids = changed_ids(sqlite_path, str(source.id), since)
+    if ids is None:
+        # The queue no longer reaches back to `since`; compare every record instead
+        ids = sorted(set(all_ids(source)) | set(all_ids(target)))
+    return sync_records(source, target, ids)
+
+
+def restore_name(client, sqlite_path: Path, original, name: str, since: Optional[int] = None):
+    """Give the original collection its name back after a failed swap, keeping the writes made under the name"""
+    # The name is held either by a collection a writer created between the two renames (all of its
+    # records are new, since=None) or by the rebuilt copy (only its writes after `since` are new)
+    for _ in range(REBUILD_ATTEMPTS):
+        try:
+            holder = client.get_collection(name)
+        except Exception:
+            holder = None
+        if holder is not None and holder.id != original.id:
+            if holder.count():
+                if since is None:
+                    sync_records(holder, original, all_ids(holder))
+                else:
+                    carry_over(sqlite_path, holder, original, since)
+            client.delete_collection(name)
+        try:
+            original.modify(name=name)
+            return
+        except Exception:
+            continue  # Taken again between the delete and the rename
+    raise MaintenanceError(f"Could not restore {name}; the original collection is still named {original.name}")
+
+
+def rebuild_collection(client, sqlite_path: Path, name: str, collection_id: str, live: int,
+                       attempts: int = REBUILD_ATTEMPTS) -> Dict[str, Any]:
+    """Copy a collection into a fresh HNSW segment and swap it in under the same name"""
+    source = client.get_collection(name)
+    staging_name = f"{name}{REBUILD_SUFFIX}"
+    start = time.perf_counter()
+
+    for attempt in range(1, attempts + 1):
+        try:
+            client.delete_collection(staging_name)
+        except Exception:
+            pass
+        watermark = queue_watermark(sqlite_path, collection_id)
+        target = client.create_collection(staging_name, metadata=source.metadata,
+                                          configuration=source.configuration)
+        copied = copy_collection(source, target)
+        # A write during the copy would be missing from the new segment
+        if queue_watermark(sqlite_path, collection_id) == watermark and target.count() == live_count(sqlite_path, collection_id):
+            break
+        time.sleep(0.5 * attempt)
+    else:
+        client.delete_collection(staging_name)
+        raise MaintenanceError(f"{name} kept changing during {attempts} rebuild attempts")
+
+    retired_name = f"{name}__retired-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    source.modify(name=retired_name)
+    try:
+        target.modify(name=name)
+    except Exception as e:
+        # Usually a writer looked the name up between the two renames and created an empty collection
+        restore_name(client, sqlite_path, source, name)
+        try:
+            client.delete_collection(staging_name)
+        except Exception:
+            pass
+        raise MaintenanceError(f"Swapping in the rebuilt {name} failed, original restored: {str(e)}")
+
+    # Handles cached before the swap still write to the original by id; carry those writes over
+    swapped_at = queue_watermark(sqlite_path, str(target.id))
+    carried = 0
+    for _ in range(attempts):
+        current = queue_watermark(sqlite_path, collection_id)
+        if current == watermark:
+            break
+        carried += carry_over(sqlite_path, source, target, watermark)
+        watermark = current
+    else:
+        restore_name(client, sqlite_path, source, name, since=swapped_at)
+        raise MaintenanceError(f"{name} kept being written through old handles after the swap, original restored")
+    # A write between the last check and the drop would still be lost; fence_writes closes that gap for the gateway
+    client.delete_collection(retired_name)
+    return {"copied": copied, "carried_over": carried, "attempts": attempt,
+            "seconds": round(time.perf_counter() - start, 3), "previous_live": live}
+
+
+def _gateway_post(ingest_url: str, path: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    request = urllib.request.Request(ingest_url.rstrip('/') + path, data=json.dumps(body).encode('utf-8'),
+                                     headers={"Content-Type": "application/json"}, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return json.loads(response.read() or b'{}')
+    except (OSError, ValueError) as e:
+        raise MaintenanceError(f"Ingest gateway {ingest_url}{path} failed: {str(e)}")
+
+
+@contextmanager
+def fence_writes(ingest_url: Optional[str], collections: List[str], seconds: float = FENCE_TIMEOUT_S) -> Iterator[None]:
+    """Pause the ingest gateway's flushes to these collections (it keeps accepting writes) for the block"""
+    if not ingest_url:
+        yield
+        return
+    _gateway_post(ingest_url, '/pause', {"collections": collections, "seconds": seconds})
+    try:
+        yield
+    finally:
+        try:
+            _gateway_post(ingest_url, '/resume', {"collections": collections})
+        except MaintenanceError:
+            pass  # The pause expires on its own after `seconds`
+
+
+def connect(url: str):
+    try:
+        import chromadb
+    except ImportError:
+        raise MaintenanceError("chromadb is not installed. Run: pip install chromadb")
+    parsed = urlparse(url)
+    return chromadb.HttpClient(host=parsed.hostname or 'localhost', port=parsed.port or 8000)
+
+
+def run_maintenance(persist_dir: Path = DEFAULT_PERSIST_DIR, url: str = DEFAULT_CHROMA_URL, vacuum: bool = True,
+                    rebuild: bool = True, min_deleted_ratio: float = 0.2, min_deleted: int = 100,
+                    collections: Optional[List[str]] = None, dry_run: bool = False,
+                    samples: int = LATENCY_SAMPLES, ingest_url: Optional[str] = None) -> Dict[str, Any]:
+    """Vacuum and rebuild through a running server; returns a before/after report"""
+    persist_dir = Path(persist_dir)
+    before = inspect_store(persist_dir)
+    names = [n for n in before["collections"] if (collections is None or n in collections)
+             and REBUILD_SUFFIX not in n and "__retired-" not in n]
+    fragmented = [
+        n for n in names
+        if (before["collections"][n]["deleted"] or 0) >= min_deleted
+        and (before["collections"][n]["deleted_ratio"] or 0) >= min_deleted_ratio
+    ]
+    report: Dict[str, Any] = {"started_at": datetime.now().isoformat(), "dry_run": dry_run,
+                              "before": before, "fragmented": fragmented}
+    if dry_run:
+        return report
+
+    client = connect(url)
+    latency_before = {n: query_latency(client.get_collection(n), samples) for n in names}
+
+    rebuilt, failed = {}, {}
+    if rebuild:
+        for name in fragmented:
+            info = before["collections"][name]
+            try:
+                with fence_writes(ingest_url, [name]):
+                    rebuilt[name] = rebuild_collection(client, persist_dir / SQLITE_FILE, name, info["id"], info["live"])
+            except Exception as e:
+                failed[name] = str(e)
+    # Includes the segments of collections replaced above
+    orphans = inspect_store(persist_dir)["orphan_segments"]
+    report["orphan_bytes_removed"] = remove_orphan_segments(persist_dir, orphans)
+    if vacuum:
+        # After the rebuilds, so pages freed by dropping the old collections are reclaimed too
+        report["vacuum_seconds"] = round(vacuum_sqlite(persist_dir / SQLITE_FILE), 3)
+
+    report["rebuilt"] = rebuilt
+    report["failed"] = failed
+    report["after"] = inspect_store(persist_dir)
+    report["latency"] = {
+        n: {"before": latency_before[n], "after": query_latency(client.get_collection(n), samples)} for n in names
+    }
+    report["reclaimed_bytes"] = before["store_bytes"] - report["after"]["store_bytes"]
+    return report
+
+
+def start_schedule(persist_dir: Path, url: str, every_hours: float, **kwargs) -> threading.Thread:
+    """Run maintenance every `every_hours` in a daemon thread, printing each report as JSON"""
+
+    def loop():
+        while True:
+            time.sleep(every_hours * 3600)
+            try:
+                report = run_maintenance(persist_dir, url, **kwargs)
+                print(json.dumps({"status": "success", "message": "Scheduled ChromaDB maintenance finished",
+                                  "rebuilt": list(report["rebuilt"]), "failed": report["failed"],
+                                  "reclaimed_bytes": report["reclaimed_bytes"]}))
+            except Exception as e:
+                print(json.dumps({"status": "error", "error": f"Scheduled ChromaDB maintenance failed: {str(e)}"}))
+            sys.stdout.flush()
+
+    thread = threading.Thread(target=loop, name="chroma-maintenance", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Vacuum chroma.sqlite3 and rebuild fragmented HNSW segments while the server runs')
+    parser.add_argument('--path', type=str, default=str(DEFAULT_PERSIST_DIR), help='ChromaDB persist directory')
+    parser.add_argument('--chroma-url', type=str, default=DEFAULT_CHROMA_URL,
+                        help='The server using --path (with run-chroma.py --replicas, the writer port from /replicas/stats)')
+    parser.add_argument('--ingest-url', type=str, default=os.environ.get('CHROMA_INGEST_URL'),
+                        help='Ingest gateway whose flushes to a collection are paused while it is rebuilt')
+    parser.add_argument('--collections', type=str, nargs='+', help='Only these collections (default: all)')
+    parser.add_argument('--min-deleted-ratio', type=float, default=0.2,
+                        help='Rebuild a collection once this fraction of its HNSW vectors are deleted')
+    parser.add_argument('--min-deleted', type=int, default=100, help='...and at least this many')
+    parser.add_argument('--no-vacuum', action='store_true', help='Skip VACUUM of chroma.sqlite3')
+    parser.add_argument('--no-rebuild', action='store_true', help='Skip HNSW rebuilds')
+    parser.add_argument('--samples', type=int, default=LATENCY_SAMPLES, help='Probe queries per collection for latency')
+    parser.add_argument('--dry-run', action='store_true', help='Only report sizes and dead vectors')
+    parser.add_argument('--output', type=str, help='Also write the full report to this JSON file')
+    args = parser.parse_args()
+
+    try:
+        report = run_maintenance(Path(args.path), args.chroma_url, vacuum=not args.no_vacuum,
+                                 rebuild=not args.no_rebuild, min_deleted_ratio=args.min_deleted_ratio,
+                                 min_deleted=args.min_deleted, collections=args.collections,
+                                 dry_run=args.dry_run, samples=args.samples, ingest_url=args.ingest_url)
+    except MaintenanceError as e:
+        print(json.dumps({"status": "error", "error": str(e)}))
+        raise SystemExit(1)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps({"status": "error" if report.get("failed") else "success", **report}, indent=2))
+    if report.get("failed"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
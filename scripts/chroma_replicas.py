@@ -0,0 +1,313 @@
+"""
+Read replicas of the persistent ChromaDB store behind a local load balancer
+run-chroma.py --replicas N starts one writer process on the real store and N
+query processes, each on a consistent copy of the store
+(chroma_snapshot.consistent_copy). It then serves the public port itself. Reads
+(GET, and POST .../query, .../get, .../count) go to the replica with the fewest
+requests in flight. Every other request goes to the writer. When the writer's
+chroma.sqlite3 changes, replicas are replaced one at a time with fresh copies,
+so read capacity never drops by more than one process. A read that fails on a
+replica (e.g. a collection created after its copy) is retried on the writer.
+"""
+
+import sys
+import json
+import time
+import shutil
+import socket
+import threading
+import subprocess
+import http.client
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Optional, Tuple
+
+from chroma_snapshot import SQLITE_FILE, consistent_copy
+
+DEFAULT_REPLICAS_DIR = Path("chromadb_replicas")
+LAUNCHER = Path(__file__).resolve().parent.parent / "run-chroma.py"
+HEARTBEAT_PATHS = ('/api/v2/heartbeat', '/api/v1/heartbeat')
+READ_SUFFIXES = ('/query', '/get', '/count')
+HOP_BY_HOP = {'connection', 'keep-alive', 'transfer-encoding', 'te', 'trailer', 'upgrade',
+              'proxy-authorization', 'proxy-authenticate', 'host', 'content-length'}
+STARTUP_TIMEOUT_S = 120.0
+WATCH_INTERVAL_S = 1.0
+
+
+def free_port(host: str = '127.0.0.1') -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((host, 0))
+        return s.getsockname()[1]
+
+
+def is_read(method: str, path: str) -> bool:
+    return method == 'GET' or (method == 'POST' and path.split('?')[0].rstrip('/').endswith(READ_SUFFIXES))
+
+
+def store_signature(persist_dir: Path) -> Tuple[int, ...]:
+    """Changes whenever the writer commits to chroma.sqlite3"""
+    signature = []
+    for name in (SQLITE_FILE, f"{SQLITE_FILE}-wal"):
+        path = persist_dir / name
+        if path.exists():
+            stat = path.stat()
+            signature.extend((stat.st_size, stat.st_mtime_ns))
+    return tuple(signature)
+
+
+class Backend:
+    """One ChromaDB server process started through run-chroma.py"""
+
+    def __init__(self, role: str, path: Path, port: int, host: str = '127.0.0.1'):
+        self.role = role
+        self.path = Path(path)
+        self.port = port
+        self.host = host
+        self.process: Optional[subprocess.Popen] = None
+        self.in_flight = 0
+        self.served = 0
+        self.started_at = 0.0
+
+    def start(self, timeout: float = STARTUP_TIMEOUT_S) -> "Backend":
+        self.process = subprocess.Popen(
+            [sys.executable, str(LAUNCHER), '--path', str(self.path), '--host', self.host, '--port', str(self.port)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"ChromaDB {self.role} on port {self.port} exited with {self.process.returncode}")
+            if self.healthy():
+                self.started_at = time.time()
+                return self
+            time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"ChromaDB {self.role} on port {self.port} did not become healthy in {timeout:.0f}s")
+
+    def healthy(self) -> bool:
+        for path in HEARTBEAT_PATHS:
+            try:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=2)
+                conn.request('GET', path)
+                if conn.getresponse().status == 200:
+                    return True
+            except OSError:
+                return False
+            finally:
+                conn.close()
+        return False
+
+    def stop(self):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"role": self.role, "port": self.port, "path": str(self.path),
+                "in_flight": self.in_flight, "served": self.served, "started_at": self.started_at}
+
+
+class ReplicaSet:
+    """A writer plus read replicas refreshed from the writer's store"""
+
+    def __init__(self, persist_dir: Path, count: int, replicas_dir: Path = DEFAULT_REPLICAS_DIR,
+                 refresh_interval: float = 10.0, host: str = '127.0.0.1'):
+        self.persist_dir = Path(persist_dir)
+        self.replicas_dir = Path(replicas_dir)
+        self.count = count
+        self.refresh_interval = refresh_interval
+        self.host = host
+        self.lock = threading.Lock()
+        self.writer: Optional[Backend] = None
+        self.replicas: List[Backend] = []
+        self.generation = 0
+        self.copied_signature: Tuple[int, ...] = ()
+        self.last_refresh = 0.0
+        self.refreshes = 0
+        self.fallbacks = 0
+        self.running = False
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self.writer = Backend("writer", self.persist_dir, free_port(self.host), self.host).start()
+        # Stale copies from a previous run are never reused
+        shutil.rmtree(self.replicas_dir, ignore_errors=True)
+        self.copied_signature = store_signature(self.persist_dir)
+        for _ in range(self.count):
+            self.replicas.append(self._spawn_replica())
+        self.last_refresh = time.monotonic()
+        self.running = True
+        self.thread = threading.Thread(target=self._watch, name="replica-refresh", daemon=True)
+        self.thread.start()
+
+    def _spawn_replica(self) -> Backend:
+        self.generation += 1
+        path = self.replicas_dir / f"replica-{self.generation}"
+        consistent_copy(self.persist_dir, path)
+        return Backend("replica", path, free_port(self.host), self.host).start()
+
+    def _watch(self):
+        while self.running:
+            time.sleep(WATCH_INTERVAL_S)
+            signature = store_signature(self.persist_dir)
+            if signature != self.copied_signature and time.monotonic() - self.last_refresh >= self.refresh_interval:
+                try:
+                    self.refresh(signature)
+                except Exception as e:
+                    print(json.dumps({"status": "error", "error": f"Replica refresh failed: {str(e)}"}))
+                    sys.stdout.flush()
+
+    def refresh(self, signature: Tuple[int, ...]):
+        """Replace each replica in turn with one started from a fresh copy"""
+        start = time.perf_counter()
+        for i in range(len(self.replicas)):
+            fresh = self._spawn_replica()
+            with self.lock:
+                old, self.replicas[i] = self.replicas[i], fresh
+            # Let requests already sent to the old replica finish
+            deadline = time.monotonic() + 30
+            while old.in_flight and time.monotonic() < deadline:
+                time.sleep(0.05)
+            old.stop()
+            shutil.rmtree(old.path, ignore_errors=True)
+        self.copied_signature = signature
+        self.last_refresh = time.monotonic()
+        self.refreshes += 1
+        print(json.dumps({"status": "info", "message": f"Refreshed {len(self.replicas)} replicas",
+                          "seconds": round(time.perf_counter() - start, 3)}))
+        sys.stdout.flush()
+
+    def acquire(self, read: bool) -> Backend:
+        with self.lock:
+            backend = min(self.replicas, key=lambda b: b.in_flight) if read and self.replicas else self.writer
+            backend.in_flight += 1
+            return backend
+
+    def release(self, backend: Backend):
+        with self.lock:
+            backend.in_flight -= 1
+            backend.served += 1
+
+    def stop(self):
+        self.running = False
+        for backend in self.replicas + [self.writer]:
+            if backend is not None:
+                backend.stop()
+        shutil.rmtree(self.replicas_dir, ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "writer": self.writer.to_dict() if self.writer else None,
+                "replicas": [r.to_dict() for r in self.replicas],
+                "refreshes": self.refreshes,
+                "fallbacks_to_writer": self.fallbacks,
+                "stale": store_signature(self.persist_dir) != self.copied_signature
+            }
+
+
+class BalancerHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def make_handler(replica_set: ReplicaSet):
+    """Reverse proxy handler that splits reads and writes across the replica set"""
+    local = threading.local()
+
+    def connection(backend: Backend) -> http.client.HTTPConnection:
+        # One keep-alive connection per backend per handler thread
+        pool = local.__dict__.setdefault('pool', {})
+        key = (backend.port, id(backend))
+        if key not in pool:
+            pool[key] = http.client.HTTPConnection(backend.host, backend.port, timeout=300)
+        return pool[key]
+
+    def forward(backend: Backend, method: str, path: str, body: bytes, headers: Dict[str, str]):
+        for attempt in range(2):
+            conn = connection(backend)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                return response.status, response.getheaders(), response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                local.pool.pop((backend.port, id(backend)), None)
+                if attempt:
+                    raise
+
+    class BalancerHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _proxy(self):
+            if self.path == '/replicas/stats':
+                body = json.dumps(replica_set.stats()).encode('utf-8')
+                self._respond(200, [("Content-Type", "application/json")], body)
+                return
+
+            length = int(self.headers.get('Content-Length') or 0)
+            body = self.rfile.read(length) if length else None
+            headers = {k: v for k, v in self.headers.items() if k.lower() not in HOP_BY_HOP}
+            read = is_read(self.command, self.path)
+
+            backend = replica_set.acquire(read)
+            try:
+                status, response_headers, payload = forward(backend, self.command, self.path, body, headers)
+            except (http.client.HTTPException, OSError):
+                status, response_headers, payload = 502, [], b''
+            finally:
+                replica_set.release(backend)
+
+            if read and backend.role == "replica" and (status == 404 or status >= 500):
+                with replica_set.lock:
+                    replica_set.fallbacks += 1
+                writer = replica_set.acquire(read=False)
+                try:
+                    status, response_headers, payload = forward(writer, self.command, self.path, body, headers)
+                except (http.client.HTTPException, OSError):
+                    status, response_headers, payload = 502, [], b''
+                finally:
+                    replica_set.release(writer)
+
+            self._respond(status, [(k, v) for k, v in response_headers if k.lower() not in HOP_BY_HOP], payload)
+
+        def _respond(self, status: int, headers: List[Tuple[str, str]], body: bytes):
+            self.send_response(status)
+            for key, value in headers:
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _proxy
+
+    return BalancerHandler
+
+
+def serve(persist_dir: Path, host: str, port: int, replicas: int, replicas_dir: Path = DEFAULT_REPLICAS_DIR,
+          refresh_interval: float = 10.0, on_started=None):
+    """Run the writer, the replicas and the balancer until interrupted"""
+    replica_set = ReplicaSet(persist_dir, replicas, replicas_dir=replicas_dir, refresh_interval=refresh_interval)
+    server = None
+    try:
+        replica_set.start()
+        server = BalancerHTTPServer((host, port), make_handler(replica_set))
+        print(json.dumps({"status": "info", "message": f"ChromaDB balancer on http://{host}:{port}",
+                          "writer_port": replica_set.writer.port, "replica_ports": [r.port for r in replica_set.replicas]}))
+        sys.stdout.flush()
+        if on_started:
+            on_started(replica_set)
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.server_close()
+        replica_set.stop()
@@ -0,0 +1,286 @@
+"""
+Point-in-time snapshots of the persistent ChromaDB store
+Copies the HNSW segment directories, then takes a SQLite online backup of
+chroma.sqlite3 while the server keeps running. ChromaDB replays the embeddings
+queue in SQLite into each segment from the segment's recorded sequence id. A
+backup taken after the segment copy therefore brings the copied segments up to
+date. If a segment file changes during the copy, the copy is retried, so a
+snapshot never holds half-written segments. Snapshots are gzip tarballs with a
+snapshot.json manifest of file checksums. Restoring one needs no re-embedding.
+
+    python scripts/chroma_snapshot.py --keep 7
+    python scripts/chroma_snapshot.py --list
+    python run-chroma.py --restore chromadb_snapshots/chroma-20250101-020000.tar.gz
+"""
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import tarfile
+import hashlib
+from pathlib import Path
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+DEFAULT_PERSIST_DIR = Path("chromadb_data")
+DEFAULT_SNAPSHOT_DIR = Path("chromadb_snapshots")
+SQLITE_FILE = "chroma.sqlite3"
+MANIFEST_FILE = "snapshot.json"
+SNAPSHOT_ATTEMPTS = 5
+COPY_BUFFER = 1024 * 1024
+
+
+class SnapshotError(Exception):
+    """A snapshot could not be taken, verified or restored"""
+
+
+def _store_files(persist_dir: Path) -> Dict[str, Tuple[int, int]]:
+    """Size and mtime of every file except the SQLite database and its journals"""
+    files = {}
+    for path in sorted(persist_dir.rglob('*')):
+        if path.is_file() and not path.name.startswith(SQLITE_FILE):
+            stat = path.stat()
+            files[path.relative_to(persist_dir).as_posix()] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def _copy_hashed(source: Path, target: Path) -> Dict[str, Any]:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        while chunk := src.read(COPY_BUFFER):
+            digest.update(chunk)
+            dst.write(chunk)
+            size += len(chunk)
+    return {"size": size, "sha256": digest.hexdigest()}
+
+
+def _hash_file(path: Path) -> Dict[str, Any]:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(COPY_BUFFER):
+            digest.update(chunk)
+    return {"size": path.stat().st_size, "sha256": digest.hexdigest()}
+
+
+def backup_sqlite(source: Path, target: Path):
+    """Consistent copy of a live SQLite database via the online backup API"""
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    dst = sqlite3.connect(str(target))
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def collection_counts(sqlite_path: Path) -> Dict[str, int]:
+    """Embeddings per collection in a (copied) chroma.sqlite3"""
+    conn = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("""
+            SELECT c.name, COUNT(e.id) FROM collections c
+            LEFT JOIN segments s ON s.collection = c.id AND s.scope = 'METADATA'
+            LEFT JOIN embeddings e ON e.segment_id = s.id
+            GROUP BY c.name
+        """).fetchall()
+        return {name: count for name, count in rows}
+    except sqlite3.Error:
+        return {}
+    finally:
+        conn.close()
+
+
+def consistent_copy(persist_dir: Path, dest_dir: Path, attempts: int = SNAPSHOT_ATTEMPTS) -> Dict[str, Any]:
+    """Copy a live store into dest_dir and write its manifest; retries while segments are being persisted"""
+    persist_dir, dest_dir = Path(persist_dir), Path(dest_dir)
+    if not (persist_dir / SQLITE_FILE).exists():
+        raise SnapshotError(f"No {SQLITE_FILE} in {persist_dir}")
+
+    for attempt in range(1, attempts + 1):
+        if dest_dir.exists():
+            shutil.rmtree(dest_dir)
+        dest_dir.mkdir(parents=True)
+
+        before = _store_files(persist_dir)
+        try:
+            files = {rel: _copy_hashed(persist_dir / rel, dest_dir / rel) for rel in before}
+        except FileNotFoundError:
+            continue  # A segment was dropped mid-copy
+        # After the segments, so the queue in the backup covers everything they are missing
+        backup_sqlite(persist_dir / SQLITE_FILE, dest_dir / SQLITE_FILE)
+        if _store_files(persist_dir) != before:
+            time.sleep(0.2 * attempt)
+            continue
+
+        files[SQLITE_FILE] = _hash_file(dest_dir / SQLITE_FILE)
+        manifest = {
+            "created_at": datetime.now().isoformat(),
+            "source": str(persist_dir.resolve()),
+            "attempts": attempt,
+            "collections": collection_counts(dest_dir / SQLITE_FILE),
+            "files": files
+        }
+        with open(dest_dir / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        return manifest
+
+    shutil.rmtree(dest_dir, ignore_errors=True)
+    raise SnapshotError(f"Segments in {persist_dir} kept changing during {attempts} copy attempts")
+
+
+def create_snapshot(persist_dir: Path = DEFAULT_PERSIST_DIR, snapshot_dir: Path = DEFAULT_SNAPSHOT_DIR,
+                    level: int = 6) -> Tuple[Path, Dict[str, Any]]:
+    """Write chroma-<timestamp>.tar.gz into snapshot_dir"""
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    staging = snapshot_dir / f".staging-{stamp}"
+    archive = snapshot_dir / f"chroma-{stamp}.tar.gz"
+    partial = archive.with_name(archive.name + '.partial')
+
+    try:
+        manifest = consistent_copy(persist_dir, staging)
+        with tarfile.open(partial, 'w:gz', compresslevel=level) as tar:
+            tar.add(staging / MANIFEST_FILE, arcname=MANIFEST_FILE)
+            for rel in manifest["files"]:
+                tar.add(staging / rel, arcname=rel)
+        os.replace(partial, archive)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+        if partial.exists():
+            partial.unlink()
+    return archive, manifest
+
+
+def read_manifest(archive: Path) -> Dict[str, Any]:
+    with tarfile.open(archive, 'r:gz') as tar:
+        member = tar.extractfile(MANIFEST_FILE)
+        if member is None:
+            raise SnapshotError(f"{archive} has no {MANIFEST_FILE}")
+        return json.load(member)
+
+
+def list_snapshots(snapshot_dir: Path = DEFAULT_SNAPSHOT_DIR) -> List[Path]:
+    """Snapshot archives, oldest first"""
+    return sorted(Path(snapshot_dir).glob('chroma-*.tar.gz'))
+
+
+def prune_snapshots(snapshot_dir: Path, keep: int) -> List[Path]:
+    """Delete all but the newest `keep` snapshots"""
+    removed = list_snapshots(snapshot_dir)[:-keep] if keep > 0 else []
+    for path in removed:
+        path.unlink()
+    return removed
+
+
+def extract_snapshot(archive: Path, target_dir: Path) -> Dict[str, Any]:
+    """Unpack and verify every file against the manifest"""
+    archive, target_dir = Path(archive), Path(target_dir)
+    manifest = read_manifest(archive)
+    target_dir.mkdir(parents=True)
+    root = target_dir.resolve()
+
+    with tarfile.open(archive, 'r:gz') as tar:
+        for member in tar:
+            if not member.isfile():
+                continue
+            destination = (target_dir / member.name).resolve()
+            if root not in destination.parents:
+                raise SnapshotError(f"Refusing to extract {member.name} outside {target_dir}")
+            digest = hashlib.sha256()
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            with tar.extractfile(member) as src, open(destination, 'wb') as dst:
+                while chunk := src.read(COPY_BUFFER):
+                    digest.update(chunk)
+                    dst.write(chunk)
+            expected = manifest["files"].get(member.name)
+            if member.name != MANIFEST_FILE and (expected is None or expected["sha256"] != digest.hexdigest()):
+                raise SnapshotError(f"Checksum mismatch for {member.name} in {archive}")
+
+    missing = [rel for rel in manifest["files"] if not (target_dir / rel).exists()]
+    if missing:
+        raise SnapshotError(f"{archive} is missing {', '.join(missing)}")
+    (target_dir / MANIFEST_FILE).unlink()
+    return manifest
+
+
+def restore_snapshot(archive: Path, persist_dir: Path = DEFAULT_PERSIST_DIR, force: bool = False) -> Dict[str, Any]:
+    """Replace persist_dir with a verified snapshot; an existing store is kept as <dir>.bak-<timestamp>"""
+    persist_dir = Path(persist_dir)
+    if persist_dir.exists() and any(persist_dir.iterdir()) and not force:
+        raise SnapshotError(f"{persist_dir} is not empty; pass --force to move it aside")
+
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    # Unpack next to the store so the final swap is a rename on the same filesystem
+    staging = persist_dir.with_name(f"{persist_dir.name}.restore-{stamp}")
+    try:
+        manifest = extract_snapshot(archive, staging)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    if persist_dir.exists():
+        if any(persist_dir.iterdir()):
+            manifest["previous_store"] = str(persist_dir.with_name(f"{persist_dir.name}.bak-{stamp}"))
+            persist_dir.rename(manifest["previous_store"])
+        else:
+            persist_dir.rmdir()
+    staging.rename(persist_dir)
+    return manifest
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Snapshot the persistent ChromaDB store while the server runs')
+    parser.add_argument('--path', type=str, default=str(DEFAULT_PERSIST_DIR), help='ChromaDB persist directory')
+    parser.add_argument('--out-dir', type=str, default=str(DEFAULT_SNAPSHOT_DIR), help='Where snapshots are written')
+    parser.add_argument('--level', type=int, default=6, help='gzip compression level (1 = fastest)')
+    parser.add_argument('--keep', type=int, default=0, help='Delete all but the newest N snapshots afterwards (0 = keep all)')
+    parser.add_argument('--list', action='store_true', help='List snapshots and their collections instead of taking one')
+    parser.add_argument('--verify', type=str, metavar='ARCHIVE', help='Check a snapshot\'s checksums without restoring it')
+    args = parser.parse_args()
+
+    if args.list:
+        for archive in list_snapshots(args.out_dir):
+            manifest = read_manifest(archive)
+            print(json.dumps({"snapshot": str(archive), "created_at": manifest["created_at"],
+                              "bytes": archive.stat().st_size, "collections": manifest["collections"]}))
+        return
+
+    try:
+        if args.verify:
+            staging = Path(args.out_dir) / f".verify-{os.getpid()}"
+            try:
+                manifest = extract_snapshot(args.verify, staging)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+            print(json.dumps({"status": "success", "message": f"{args.verify} verified", "files": len(manifest["files"])}))
+            return
+
+        start = time.perf_counter()
+        archive, manifest = create_snapshot(Path(args.path), Path(args.out_dir), level=args.level)
+        removed = prune_snapshots(Path(args.out_dir), args.keep)
+    except SnapshotError as e:
+        print(json.dumps({"status": "error", "error": str(e)}))
+        raise SystemExit(1)
+
+    print(json.dumps({
+        "status": "success",
+        "message": f"Snapshot saved to {archive}",
+        "snapshot": str(archive),
+        "seconds": round(time.perf_counter() - start, 3),
+        "store_bytes": sum(f["size"] for f in manifest["files"].values()),
+        "snapshot_bytes": archive.stat().st_size,
+        "collections": manifest["collections"],
+        "attempts": manifest["attempts"],
+        "pruned": [str(p) for p in removed]
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Per-request deadlines and cancellation for bridge queries
+A RequestContext carries an absolute deadline and a cancel flag; waiting on
+an upstream future through it gives up as soon as either fires.
+"""
+
+import time
+import threading
+from concurrent.futures import Future
+from typing import Any, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before its answer arrived"""
+
+
+class RequestCancelled(Exception):
+    """The caller cancelled the request"""
+
+
+class RequestContext:
+    """Deadline and cancel signal for one request"""
+
+    def __init__(self, deadline_ms: Optional[float] = None, request_id: Optional[str] = None):
+        self.request_id = request_id
+        self.deadline = time.monotonic() + deadline_ms / 1000 if deadline_ms else None
+        self.cancelled = False
+        self._wake = threading.Event()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, or None without one"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self):
+        self.cancelled = True
+        self._wake.set()
+
+    def check(self):
+        """Raise if the request was cancelled or its deadline has passed"""
+        if self.cancelled:
+            raise RequestCancelled(f"Request {self.request_id} was cancelled")
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise DeadlineExceeded("Deadline exceeded before NotebookLM answered")
+
+    def result(self, future: Future) -> Any:
+        """Wait for a future's result, abandoning it on deadline or cancellation"""
+        # Woken only by completion or cancel, so each wakeup either returns or raises
+        future.add_done_callback(lambda _: self._wake.set())
+        while not future.done():
+            self.check()
+            self._wake.wait(self.remaining())
+        return future.result()
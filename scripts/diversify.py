@@ -0,0 +1,88 @@
+"""
+Maximal marginal relevance (MMR) re-ranking of retrieved regulation chunks
+Retrieval over the IA corpus often returns the same clause more than once, from
+overlapping notebooks or from neighbouring chunks of one document, and each
+copy takes up LLM context. The local RAG path therefore over-fetches
+candidates and picks the final top-k greedily. Each pick maximizes
+lambda * relevance - (1 - lambda) * (similarity to the closest chunk already
+picked). Candidates nearly identical to a picked chunk (cosine >=
+duplicate_threshold) are dropped, as are chunks from a source that already has
+max_per_source picks. Pairwise similarities come from one matrix product, and
+each greedy step is a vector update, so a few hundred candidates take about a
+millisecond.
+
+Requires numpy.
+"""
+
+from typing import List, Dict, Any, Optional, Sequence
+
+from quantized_store import normalize
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_LAMBDA = 0.7
+DEFAULT_FETCH_FACTOR = 4
+DEFAULT_MAX_PER_SOURCE = 2
+DEFAULT_DUPLICATE_THRESHOLD = 0.95
+# Metadata identifying the document a chunk came from, most specific first
+SOURCE_KEYS = ('source_id', 'id', 'file', 'title')
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("MMR diversification needs numpy: pip install numpy")
+
+
+def source_key(metadata: Optional[Dict[str, Any]]) -> Optional[str]:
+    for key in SOURCE_KEYS:
+        value = (metadata or {}).get(key)
+        if value:
+            return str(value)
+    return None
+
+
+def mmr(query, embeddings, k: int, lambda_: float = DEFAULT_LAMBDA, sources: Optional[Sequence[Optional[str]]] = None,
+        max_per_source: Optional[int] = DEFAULT_MAX_PER_SOURCE,
+        duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD) -> List[int]:
+    """Positions of up to k candidates in pick order"""
+    require_numpy()
+    vectors = normalize(embeddings)
+    if vectors.ndim != 2 or len(vectors) == 0 or k <= 0:
+        return []
+    relevance = vectors @ normalize(query)
+    similarity = vectors @ vectors.T
+    closest = np.zeros(len(vectors), dtype=np.float32)
+    available = np.ones(len(vectors), dtype=bool)
+
+    codes = counts = None
+    if sources is not None and max_per_source:
+        # Chunks without a source each count as their own
+        lookup: Dict[str, int] = {}
+        codes = np.array([lookup.setdefault(s, len(lookup)) if s is not None else -1 - i for i, s in enumerate(sources)])
+        counts: Dict[int, int] = {}
+
+    picked: List[int] = []
+    while len(picked) < k and available.any():
+        scores = lambda_ * relevance - (1 - lambda_) * closest if picked else relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        closest = np.maximum(closest, similarity[best]) if len(picked) > 1 else similarity[best].copy()
+        available[best] = False
+        available &= closest < duplicate_threshold
+        if codes is not None:
+            code = int(codes[best])
+            counts[code] = counts.get(code, 0) + 1
+            if counts[code] >= max_per_source:
+                available &= codes != code
+    return picked
+
+
+def diversify(query, embeddings, metadatas: Sequence[Optional[Dict[str, Any]]], k: int,
+              lambda_: float = DEFAULT_LAMBDA, max_per_source: Optional[int] = DEFAULT_MAX_PER_SOURCE,
+              duplicate_threshold: float = DEFAULT_DUPLICATE_THRESHOLD) -> List[int]:
+    """MMR with each candidate's source taken from its metadata"""
+    return mmr(query, embeddings, k, lambda_, [source_key(m) for m in metadatas], max_per_source, duplicate_threshold)
@@ -0,0 +1,235 @@
+"""
+Exact (brute-force) vector search over a collection held in memory
+For collections of a few thousand vectors, scanning a contiguous float32 matrix
+with one matrix product per batch of queries is cheaper than walking an HNSW
+graph, and it always returns the true top-k. This makes it the ground truth for
+measuring HNSW and quantized recall (quantize_collections.py --report, the
+vector_search stage of benchmark_pipeline.py). Metadata filters take Chroma's
+where syntax ($eq, $ne, $in, $nin, $gt, $gte, $lt, $lte, $and, $or) and are
+evaluated as boolean masks over per-field code arrays. query() returns results
+in the same shape as Collection.query, so callers can use either.
+
+Requires numpy.
+"""
+
+import math
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+from quantized_store import normalize, require_numpy
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SPACES = ('cosine', 'ip', 'l2')
+# rag_router searches collections up to this size exactly instead of through HNSW
+DEFAULT_EXACT_THRESHOLD = 10000
+FETCH_PAGE = 5000
+# Queries scored per matrix product, so the score block stays around QUERY_BLOCK * n floats
+QUERY_BLOCK = 256
+MISSING = -1
+
+
+def fetch_all(collection, page: int = FETCH_PAGE, include: Sequence[str] = ('embeddings', 'metadatas')) -> Dict[str, list]:
+    """Every record of a Chroma collection, paged"""
+    records: Dict[str, list] = {"ids": [], **{field: [] for field in include}}
+    offset = 0
+    while True:
+        batch = collection.get(include=list(include), limit=page, offset=offset)
+        if not batch['ids']:
+            return records
+        records["ids"].extend(batch['ids'])
+        for field in include:
+            values = batch.get(field)
+            records[field].extend(values if values is not None else [None] * len(batch['ids']))
+        offset += len(batch['ids'])
+
+
+def collection_space(collection) -> str:
+    """Distance function a Chroma collection was created with (Chroma's default is l2)"""
+    try:
+        space = (collection.configuration or {}).get('hnsw', {}).get('space')
+        if space:
+            return space
+    except Exception:
+        pass
+    return (collection.metadata or {}).get('hnsw:space', 'l2')
+
+
+def _key(value: Any) -> Tuple[bool, Any]:
+    # True == 1 in Python, but not in a Chroma where clause
+    return (isinstance(value, bool), value)
+
+
+class ExactIndex:
+    """Embeddings of one collection as a contiguous float32 matrix, with ids, metadatas and documents"""
+
+    def __init__(self, ids: Sequence[str], embeddings, metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+                 documents: Optional[Sequence[Optional[str]]] = None, space: str = 'cosine'):
+        require_numpy()
+        if space not in SPACES:
+            raise ValueError(f"Unknown space: {space} (expected one of {', '.join(SPACES)})")
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError(f"Expected {len(ids)} embeddings as rows, got shape {vectors.shape}")
+
+        self.ids = list(ids)
+        self.space = space
+        self.matrix = np.ascontiguousarray(normalize(vectors) if space == 'cosine' else vectors)
+        self.sq_norms = np.einsum('ij,ij->i', self.matrix, self.matrix) if space == 'l2' else None
+        self.metadatas = [m or {} for m in metadatas] if metadatas is not None else [{} for _ in self.ids]
+        self.documents = list(documents) if documents is not None else None
+        self._codes: Dict[str, Tuple[Any, Dict[Tuple[bool, Any], int]]] = {}
+        self._numbers: Dict[str, Any] = {}
+
+    @classmethod
+    def from_collection(cls, collection, documents: bool = True, page: int = FETCH_PAGE) -> "ExactIndex":
+        include = ('embeddings', 'metadatas', 'documents') if documents else ('embeddings', 'metadatas')
+        records = fetch_all(collection, page, include)
+        embeddings = records['embeddings'] if records['ids'] else np.empty((0, 0), dtype=np.float32)
+        return cls(records['ids'], embeddings, records['metadatas'], records.get('documents'),
+                   space=collection_space(collection))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.matrix.nbytes)
+
+    # Metadata masks
+
+    def _column_codes(self, field: str):
+        """Integer code per row for the field's value (MISSING where absent), and the value -> code table"""
+        if field not in self._codes:
+            lookup: Dict[Tuple[bool, Any], int] = {}
+            codes = np.fromiter(
+                (MISSING if field not in m else lookup.setdefault(_key(m[field]), len(lookup)) for m in self.metadatas),
+                dtype=np.int32, count=len(self.metadatas)
+            )
+            self._codes[field] = (codes, lookup)
+        return self._codes[field]
+
+    def _column_numbers(self, field: str):
+        if field not in self._numbers:
+            self._numbers[field] = np.fromiter(
+                (float(m[field]) if isinstance(m.get(field), (int, float)) and not isinstance(m.get(field), bool)
+                 else math.nan for m in self.metadatas),
+                dtype=np.float64, count=len(self.metadatas)
+            )
+        return self._numbers[field]
+
+    def _field_mask(self, field: str, condition: Any):
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        result = np.ones(len(self), dtype=bool)
+        for op, value in condition.items():
+            if op in ('$eq', '$ne', '$in', '$nin'):
+                codes, lookup = self._column_codes(field)
+                values = value if op in ('$in', '$nin') else [value]
+                wanted = [lookup[_key(v)] for v in values if _key(v) in lookup]
+                hit = np.isin(codes, wanted) if wanted else np.zeros(len(self), dtype=bool)
+                # As in Chroma, records without the field match $ne and $nin
+                result &= hit if op in ('$eq', '$in') else ~hit
+            elif op in ('$gt', '$gte', '$lt', '$lte'):
+                numbers = self._column_numbers(field)
+                with np.errstate(invalid='ignore'):
+                    result &= {'$gt': np.greater, '$gte': np.greater_equal,
+                               '$lt': np.less, '$lte': np.less_equal}[op](numbers, float(value))
+            else:
+                raise ValueError(f"Unsupported where operator {op} on {field}")
+        return result
+
+    def mask(self, where: Optional[Dict[str, Any]]):
+        """Boolean row mask for a Chroma where clause"""
+        result = np.ones(len(self), dtype=bool)
+        for key, condition in (where or {}).items():
+            if key == '$and':
+                for clause in condition:
+                    result &= self.mask(clause)
+            elif key == '$or':
+                result &= np.logical_or.reduce([self.mask(clause) for clause in condition])
+            else:
+                result &= self._field_mask(key, condition)
+        return result
+
+    # Search
+
+    def _prepare(self, queries):
+        queries = np.asarray(queries, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        if queries.shape[1] != self.matrix.shape[1]:
+            raise ValueError(f"Query dimension {queries.shape[1]} does not match collection dimension {self.matrix.shape[1]}")
+        return normalize(queries) if self.space == 'cosine' else queries
+
+    def top_k(self, queries, k: int, mask=None) -> Tuple[List[Any], List[Any]]:
+        """Row positions and distances of the k nearest rows per query, nearest first"""
+        queries = self._prepare(queries)
+        rows = np.flatnonzero(mask) if mask is not None else None
+        # Gather the filtered rows when that is cheaper than scoring and discarding the rest
+        if rows is not None and len(rows) < len(self) // 2:
+            matrix = self.matrix[rows]
+            sq_norms = self.sq_norms[rows] if self.sq_norms is not None else None
+            exclude = None
+        else:
+            matrix, sq_norms = self.matrix, self.sq_norms
+            exclude = ~mask if mask is not None else None
+            rows = None
+
+        limit = min(k, len(matrix) if exclude is None else int((~exclude).sum()))
+        positions, distances = [], []
+        for start in range(0, len(queries), QUERY_BLOCK):
+            block = queries[start:start + QUERY_BLOCK]
+            scores = block @ matrix.T
+            if self.space == 'l2':
+                # Ranking by 2 q.x - |x|^2 is ranking by -|q - x|^2
+                scores = 2 * scores - sq_norms
+            if exclude is not None:
+                scores[:, exclude] = -np.inf
+            if limit <= 0:
+                positions.extend(np.empty(0, dtype=np.int64) for _ in block)
+                distances.extend(np.empty(0, dtype=np.float32) for _ in block)
+                continue
+            if limit < scores.shape[1]:
+                top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), (len(block), scores.shape[1]))
+            best = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-best, axis=1, kind='stable')
+            top, best = np.take_along_axis(top, order, axis=1), np.take_along_axis(best, order, axis=1)
+            if self.space == 'l2':
+                best = np.maximum(np.einsum('ij,ij->i', block, block)[:, None] - best, 0)
+            else:
+                best = 1 - best
+            for i in range(len(block)):
+                positions.append(rows[top[i]] if rows is not None else top[i])
+                distances.append(best[i])
+        return positions, distances
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Sequence[str] = ('documents', 'metadatas', 'distances')) -> Dict[str, Any]:
+        """Same arguments and result shape as chromadb's Collection.query"""
+        mask = self.mask(where) if where else None
+        positions, distances = self.top_k(query_embeddings, n_results, mask)
+        results: Dict[str, Any] = {"ids": [[self.ids[p] for p in rows] for rows in positions]}
+        if 'distances' in include:
+            results["distances"] = [d.tolist() for d in distances]
+        if 'metadatas' in include:
+            results["metadatas"] = [[self.metadatas[p] for p in rows] for rows in positions]
+        if 'documents' in include:
+            results["documents"] = [[self.documents[p] if self.documents else None for p in rows] for rows in positions]
+        if 'embeddings' in include:
+            results["embeddings"] = [self.matrix[rows] for rows in positions]
+        return results
+
+
+def recall_at_k(truth: Sequence[Sequence[str]], found: Sequence[Sequence[str]], k: Optional[int] = None) -> float:
+    """Fraction of the exact top-k ids that an approximate search also returned in its top-k"""
+    hits = total = 0
+    for expected, actual in zip(truth, found):
+        expected = list(expected)[:k] if k else list(expected)
+        hits += len(set(expected) & set(list(actual)[:len(expected)]))
+        total += len(expected)
+    return hits / total if total else 1.0
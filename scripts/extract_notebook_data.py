@@ -1,8 +1,10 @@
 import sys
 import os
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import time
 
 # Add the notebooklm-mcp src directory to path
@@ -16,19 +18,36 @@ except ImportError as e:
     print(json.dumps({"status": "error", "error": f"Failed to import NotebookLM modules: {str(e)}"}))
     sys.exit(1)
 
+from instrumentation import Instrumentation
+from session_pool import SessionPool, build_client
+from bridge_client import bridge_client
+from resilient_client import ResilientClient
+from rate_limiter import RateLimiter
+from single_flight import normalize_query
+import records
+from records import notebook_record, read_field
+
 class NotebookExtractor:
     """Extract and process notebooks from NotebookLM"""
     
-    def __init__(self, output_dir: str = "reports/notebook_data"):
+    def __init__(self, output_dir: str = "reports/notebook_data", instrumentation: Optional[Instrumentation] = None,
+                 sessions_dir: Optional[str] = None, bridge_url: Optional[str] = None, resilience: Optional[Any] = None,
+                 pretty: bool = True):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.client: Optional[NotebookLMClient] = None
+        self.instrumentation = instrumentation or Instrumentation("extract_notebook_data")
+        self.sessions_dir = sessions_dir
+        self.bridge_url = bridge_url
+        self.resilience = resilience
+        self.resilient: Optional[ResilientClient] = None
+        self.pretty = pretty
         
     def authenticate(self) -> bool:
-        """Authenticate with NotebookLM"""
+        """Authenticate with NotebookLM (one client per provisioned session)"""
         try:
-            cached = load_cached_tokens()
-            if not cached:
+            client = build_client(NotebookLMClient, load_cached_tokens, sessions_dir=self.sessions_dir)
+            if not client:
                 print(json.dumps({
                     "status": "error", 
                     "error": "No cached tokens found. Please authenticate first.",
@@ -36,12 +55,11 @@ class NotebookExtractor:
                 }))
                 return False
             
-            self.client = NotebookLMClient(
-                cookies=cached.cookies,
-                csrf_token=cached.csrf_token,
-                session_id=cached.session_id,
-            )
-            print(json.dumps({"status": "info", "message": "Authentication successful", "authenticated": True}))
+            sessions = len(client) if isinstance(client, SessionPool) else 1
+            self.resilient = ResilientClient.from_args(client, self.resilience)
+            # Queries go through the bridge's batch lane so they yield to interactive chat
+            self.client = self.instrumentation.wrap_client(bridge_client(self.resilient, self.bridge_url, priority="batch"))
+            print(json.dumps({"status": "info", "message": "Authentication successful", "authenticated": True, "sessions": sessions}))
             return True
             
         except Exception as e:
@@ -58,24 +76,7 @@ class NotebookExtractor:
             print(json.dumps({"status": "info", "message": "Fetching notebooks..."}))
             notebooks = self.client.list_notebooks()
             
-            # Convert to dictionaries
-            notebook_list = []
-            for nb in notebooks:
-                if hasattr(nb, '__dict__'):
-                    nb_dict = {
-                        "title": getattr(nb, 'title', 'Untitled'),
-                        "notebook_id": getattr(nb, 'notebook_id', None),
-                        "sources": getattr(nb, 'sources', []),
-                        "source_count": len(getattr(nb, 'sources', []))
-                    }
-                else:
-                    nb_dict = {
-                        "title": nb.get("title", "Untitled"),
-                        "notebook_id": nb.get("notebook_id"),
-                        "sources": nb.get("sources", []),
-                        "source_count": len(nb.get("sources", []))
-                    }
-                notebook_list.append(nb_dict)
+            notebook_list = [notebook_record(nb) for nb in notebooks]
             
             print(json.dumps({
                 "status": "success",
@@ -115,19 +116,17 @@ class NotebookExtractor:
             
             result = {
                 "notebook_id": notebook_id,
-                "title": getattr(notebook_data, 'title', 'Unknown') if hasattr(notebook_data, 'title') else notebook_data.get('title', 'Unknown'),
+                "title": read_field(notebook_data, 'title', 'Unknown'),
                 "sources": [],
                 "extracted_at": time.strftime("%Y-%m-%d %H:%M:%S")
             }
             
             # Extract sources
-            sources = getattr(notebook_data, 'sources', []) if hasattr(notebook_data, 'sources') else notebook_data.get('sources', [])
-            
-            for source in sources:
+            for source in read_field(notebook_data, 'sources') or []:
                 source_info = {
-                    "title": getattr(source, 'title', 'Unknown') if hasattr(source, 'title') else source.get('title', 'Unknown'),
-                    "source_id": getattr(source, 'source_id', None) if hasattr(source, 'source_id') else source.get('source_id'),
-                    "type": getattr(source, 'type', 'unknown') if hasattr(source, 'type') else source.get('type', 'unknown'),
+                    "title": read_field(source, 'title', 'Unknown'),
+                    "source_id": read_field(source, 'source_id'),
+                    "type": read_field(source, 'type', 'unknown'),
                 }
                 result["sources"].append(source_info)
             
@@ -158,11 +157,61 @@ class NotebookExtractor:
             print(json.dumps({"status": "error", "error": f"Failed to query notebook {notebook_id}: {str(e)}"}))
             return {}
     
+    def query_matrix(self, notebooks: List[Dict[str, Any]], questions: List[Dict[str, str]], checkpoint: Path,
+                     workers: int = 4, limiter: Optional[RateLimiter] = None) -> Dict[str, Any]:
+        """Ask every question of every notebook; answered cells are appended to `checkpoint` and skipped on resume"""
+        done = load_checkpoint(checkpoint)
+        cells = [(nb['notebook_id'], q) for nb in notebooks for q in questions
+                 if (nb['notebook_id'], normalize_query(q['question'])) not in done]
+        print(json.dumps({
+            "status": "info",
+            "message": f"Matrix of {len(notebooks)} notebooks x {len(questions)} questions",
+            "resumed": len(notebooks) * len(questions) - len(cells),
+            "pending": len(cells)
+        }))
+
+        lock = threading.Lock()
+
+        def ask(cell: Tuple[str, Dict[str, str]]) -> bool:
+            notebook_id, question = cell
+            if limiter is not None:
+                limiter.acquire()
+            result = self.query_notebook(notebook_id, question['question'])
+            if not result:
+                return False
+            record = {"notebook_id": notebook_id, "question": question['question'],
+                      "response": result['response'], "queried_at": result['queried_at']}
+            with lock:
+                done[(notebook_id, normalize_query(question['question']))] = record
+                with open(checkpoint, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            return True
+
+        executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            failed = sum(1 for future in as_completed([executor.submit(ask, cell) for cell in cells]) if not future.result())
+        except KeyboardInterrupt:
+            # Let in-flight queries finish so their answers reach the checkpoint
+            executor.shutdown(cancel_futures=True)
+            print(json.dumps({"status": "error", "error": f"Interrupted; {len(done)} answers kept in {checkpoint}, re-run to resume"}))
+            sys.exit(130)
+        executor.shutdown()
+
+        return {
+            "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "questions": questions,
+            "notebooks": [{"notebook_id": nb['notebook_id'], "title": nb['title']} for nb in notebooks],
+            # answers[i][j] is notebook i's response to question j (null when the query failed)
+            "answers": [
+                [done.get((nb['notebook_id'], normalize_query(q['question'])), {}).get('response') for q in questions]
+                for nb in notebooks
+            ],
+            "failed": failed
+        }
+
     def save_data(self, data: Any, filename: str):
-        """Save data to JSON file"""
-        filepath = self.output_dir / filename
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        """Save data to JSON file (indented unless the extractor was created with pretty=False)"""
+        filepath = records.dump(self.output_dir / filename, data, pretty=self.pretty)
         
         print(json.dumps({
             "status": "success",
@@ -170,6 +219,35 @@ class NotebookExtractor:
             "filepath": str(filepath)
         }))
 
+def load_questions(path: str) -> List[Dict[str, str]]:
+    """Questions from a JSON list (strings or {"id", "question"}) or a text file with one per line"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.json'):
+            items = json.load(f)
+        else:
+            items = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+    questions = []
+    for i, item in enumerate(items, 1):
+        if isinstance(item, str):
+            item = {"question": item}
+        questions.append({"id": item.get('id') or f"q{i}", "question": item['question']})
+    return questions
+
+def load_checkpoint(path: Path) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Answered (notebook_id, normalized question) cells from a matrix checkpoint"""
+    done = {}
+    if not path.exists():
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Partial line from an interrupted write
+            done[(record['notebook_id'], normalize_query(record['question']))] = record
+    return done
+
 def main():
     import argparse
     
@@ -178,41 +256,80 @@ def main():
     parser.add_argument('--all', action='store_true', help='Extract all notebooks')
     parser.add_argument('--output-dir', type=str, default='reports/notebook_data', help='Output directory for extracted data')
     parser.add_argument('--query', type=str, help='Query all filtered notebooks with this question')
+    parser.add_argument('--questions', type=str,
+                        help='Matrix mode: ask every question in this file (one per line, or a JSON list) of every filtered notebook')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent queries in matrix mode')
+    parser.add_argument('--rps', type=float, default=2.0, help='Maximum queries per second in matrix mode (0 = unlimited)')
+    parser.add_argument('--fresh', action='store_true', help='Discard the matrix checkpoint instead of resuming from it')
+    parser.add_argument('--sessions-dir', type=str, help='Directory of cached credential sets to pool (default: $NOTEBOOKLM_SESSIONS_DIR)')
+    parser.add_argument('--compact', action='store_true',
+                        help='Write compact JSON (faster to write and parse for large datasets) instead of indented')
+    parser.add_argument('--bridge-url', type=str, default=os.environ.get('NOTEBOOKLM_BRIDGE_URL'),
+                        help='Send --query questions through a running bridge server on its batch lane (default: $NOTEBOOKLM_BRIDGE_URL)')
+    ResilientClient.add_arguments(parser)
+    Instrumentation.add_arguments(parser)
     
     args = parser.parse_args()
+    if args.questions and args.query:
+        parser.error('--query and --questions are mutually exclusive')
     
-    extractor = NotebookExtractor(output_dir=args.output_dir)
+    instrumentation = Instrumentation.from_args(args, script="extract_notebook_data")
+    try:
+        run(args, instrumentation)
+    finally:
+        instrumentation.finish()
+
+def run(args, instrumentation: Instrumentation):
+    extractor = NotebookExtractor(output_dir=args.output_dir, instrumentation=instrumentation, sessions_dir=args.sessions_dir,
+                                  bridge_url=args.bridge_url, resilience=args, pretty=not args.compact)
     
     # Authenticate
-    if not extractor.authenticate():
-        sys.exit(1)
+    with instrumentation.stage("authenticate"):
+        if not extractor.authenticate():
+            sys.exit(1)
     
     # List all notebooks
-    all_notebooks = extractor.list_all_notebooks()
+    with instrumentation.stage("list_notebooks"):
+        all_notebooks = extractor.list_all_notebooks()
     if not all_notebooks:
         sys.exit(1)
     
     # Save all notebooks list
-    extractor.save_data(all_notebooks, "all_notebooks.json")
+    with instrumentation.stage("save"):
+        extractor.save_data(all_notebooks, "all_notebooks.json")
     
     # Filter if needed
     target_notebooks = extractor.filter_notebooks(all_notebooks, args.filter)
     
     if args.filter:
-        extractor.save_data(target_notebooks, f"filtered_{args.filter.replace(' ', '_').replace('-', '')}_notebooks.json")
+        with instrumentation.stage("save"):
+            extractor.save_data(target_notebooks, f"filtered_{args.filter.replace(' ', '_').replace('-', '')}_notebooks.json")
     
+    if args.questions:
+        run_matrix(args, extractor, target_notebooks, instrumentation)
+        print(json.dumps({
+            "status": "complete",
+            "message": "Matrix query complete",
+            "total_notebooks": len(all_notebooks),
+            "queried_notebooks": len(target_notebooks),
+            "resilience": extractor.resilient.stats()
+        }))
+        return
+
     # Extract detailed information from each target notebook
     detailed_data = []
     for notebook in target_notebooks:
         notebook_id = notebook['notebook_id']
-        details = extractor.extract_notebook_sources(notebook_id)
+        with instrumentation.stage("extract_notebook"):
+            details = extractor.extract_notebook_sources(notebook_id)
         
         if details:
             detailed_data.append(details)
             
             # Query if requested
             if args.query:
-                query_result = extractor.query_notebook(notebook_id, args.query)
+                with instrumentation.stage("query_notebook"):
+                    query_result = extractor.query_notebook(notebook_id, args.query)
                 details['query_result'] = query_result
         
         time.sleep(0.5)  # Rate limiting
@@ -220,14 +337,30 @@ def main():
     # Save detailed data
     if detailed_data:
         filename = f"detailed_{args.filter.replace(' ', '_').replace('-', '') if args.filter else 'all'}_notebooks.json"
-        extractor.save_data(detailed_data, filename)
+        with instrumentation.stage("save"):
+            extractor.save_data(detailed_data, filename)
     
     print(json.dumps({
         "status": "complete",
         "message": "Data extraction complete",
         "total_notebooks": len(all_notebooks),
-        "extracted_notebooks": len(detailed_data)
+        "extracted_notebooks": len(detailed_data),
+        "resilience": extractor.resilient.stats()
     }))
 
+def run_matrix(args, extractor: NotebookExtractor, notebooks: List[Dict[str, Any]], instrumentation: Instrumentation):
+    """Answer the question file against every notebook and save the notebook x question table"""
+    name = args.filter.replace(' ', '_').replace('-', '') if args.filter else 'all'
+    checkpoint = extractor.output_dir / f".matrix_{name}.state.jsonl"
+    if args.fresh and checkpoint.exists():
+        checkpoint.unlink()
+
+    questions = load_questions(args.questions)
+    limiter = RateLimiter(args.rps, burst=args.workers)
+    with instrumentation.stage("query_matrix"):
+        table = extractor.query_matrix(notebooks, questions, checkpoint, workers=args.workers, limiter=limiter)
+    with instrumentation.stage("save"):
+        extractor.save_data(table, f"matrix_{name}_notebooks.json")
+
 if __name__ == "__main__":
     main()
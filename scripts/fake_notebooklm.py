@@ -0,0 +1,502 @@
+"""
+Offline stand-in for the NotebookLM API
+Serves a synthetic corpus shaped like reports/notebook_data/all_notebooks.json with
+configurable latency, error rate and throttling, either in-process or over HTTP.
+
+Run the server:
+    python scripts/fake_notebooklm.py --port 8765 --notebooks 500 --latency lognormal:0.4:0.6 --error-rate 0.02 --rps 5
+
+Point the existing scripts at it (the shim package shadows notebooklm_mcp):
+    NOTEBOOKLM_FAKE_URL=http://127.0.0.1:8765 PYTHONPATH=scripts/fakes python scripts/extract_notebook_data.py --filter "IA -"
+
+Without NOTEBOOKLM_FAKE_URL the shim runs the fake in-process, configured by the
+NOTEBOOKLM_FAKE_* environment variables (see FakeConfig.from_env).
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import hashlib
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field, asdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional
+
+DEFAULT_TEMPLATE = Path(__file__).parent.parent / "reports" / "notebook_data" / "all_notebooks.json"
+
+# Streamed answers start after this share of the sampled query latency
+FIRST_CHUNK_FRACTION = 0.2
+STREAM_CHUNKS = 8
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+
+
+class FakeUpstreamError(Exception):
+    """Injected upstream failure"""
+
+
+class FakeRateLimitError(FakeUpstreamError):
+    """Injected throttling (HTTP 429 / RESOURCE_EXHAUSTED)"""
+
+
+class FakeSource(dict):
+    """Source record; a dict (JSON-serializable, like the dumps) that also allows attribute access"""
+
+    def __init__(self, id: str, title: str, type: str = "pdf", created_at: Optional[str] = None):
+        super().__init__(id=id, source_id=id, title=title, type=type, created_at=created_at)
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self)
+
+
+@dataclass
+class FakeNotebook:
+    id: str
+    title: str
+    sources: List[FakeSource] = field(default_factory=list)
+
+    @property
+    def notebook_id(self) -> str:
+        return self.id
+
+    @property
+    def source_count(self) -> int:
+        return len(self.sources)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "notebook_id": self.id,
+            "title": self.title,
+            "sources": [s.to_dict() for s in self.sources],
+            "source_count": len(self.sources)
+        }
+
+
+@dataclass
+class FakeConfig:
+    """Knobs for the fake upstream; latency is "<dist>:<a>:<b>" in seconds"""
+    notebooks: int = 0                 # 0 keeps the template size
+    template: str = str(DEFAULT_TEMPLATE)
+    seed: int = 42
+    latency: str = "fixed:0"           # fixed:s | uniform:lo:hi | normal:mean:sd | lognormal:median:sigma
+    query_latency: Optional[str] = None  # overrides latency for query/query_notebook
+    error_rate: float = 0.0
+    rps: float = 0.0                   # 0 disables throttling
+    burst: int = 1
+    throttle_scope: str = "global"     # global | session (one bucket per session_id)
+    answer_words: int = 120
+
+    @classmethod
+    def from_env(cls) -> "FakeConfig":
+        """Build a config from NOTEBOOKLM_FAKE_* environment variables"""
+        config = cls()
+        for name, value in asdict(config).items():
+            env = os.environ.get(f"NOTEBOOKLM_FAKE_{name.upper()}")
+            if env is None:
+                continue
+            kind = type(value) if value is not None else str
+            setattr(config, name, kind(env))
+        return config
+
+
+class LatencyModel:
+    """Deterministic latency samples for a distribution spec"""
+
+    def __init__(self, spec: str):
+        parts = spec.split(':')
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        if self.kind not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params + [0.0, 0.0]
+        if self.kind == 'fixed':
+            return p[0]
+        if self.kind == 'uniform':
+            return rng.uniform(p[0], p[1])
+        if self.kind == 'normal':
+            return max(0.0, rng.gauss(p[0], p[1]))
+        return p[0] * math.exp(rng.gauss(0.0, p[1])) if p[0] > 0 else 0.0
+
+
+class TokenBucket:
+    """Thread-safe token bucket; take() returns False when throttled"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+def generate_corpus(config: FakeConfig) -> List[FakeNotebook]:
+    """Synthesize notebooks with the title mix and source counts of the template dump"""
+    rng = random.Random(config.seed)
+
+    template: List[Dict[str, Any]] = []
+    if config.template and Path(config.template).exists():
+        with open(config.template, 'r', encoding='utf-8') as f:
+            template = json.load(f)
+    if not template:
+        template = [{"title": "IA - Rules & Regulations", "sources": [{"title": "Regulation.pdf"}] * 10}]
+
+    source_titles = [s.get('title', 'Untitled') for nb in template for s in nb.get('sources', [])] or ['Untitled.pdf']
+    size = config.notebooks or len(template)
+
+    notebooks = []
+    for i in range(size):
+        base = template[i % len(template)]
+        generation = i // len(template)
+        title = base.get('title', 'Untitled') if generation == 0 else f"{base.get('title', 'Untitled')} ({generation + 1})"
+        count = len(base.get('sources', [])) if generation == 0 else max(1, int(rng.gauss(len(base.get('sources', [])) or 1, 4)))
+
+        sources = []
+        for j in range(count):
+            if generation == 0 and j < len(base.get('sources', [])):
+                source_title = base['sources'][j].get('title', 'Untitled')
+            else:
+                source_title = rng.choice(source_titles)
+            sources.append(FakeSource(
+                id=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                title=source_title,
+                created_at=f"{rng.randint(2008, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            ))
+
+        notebooks.append(FakeNotebook(id=str(uuid.UUID(int=rng.getrandbits(128), version=4)), title=title, sources=sources))
+
+    return notebooks
+
+
+class FakeBackend:
+    """In-process fake upstream shared by the client and the HTTP server"""
+
+    def __init__(self, config: Optional[FakeConfig] = None):
+        self.config = config or FakeConfig()
+        self.notebooks = generate_corpus(self.config)
+        self.by_id = {nb.id: nb for nb in self.notebooks}
+        self.latency = LatencyModel(self.config.latency)
+        self.query_latency = LatencyModel(self.config.query_latency or self.config.latency)
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+        self.call_counts: Dict[str, int] = {}
+        self.stats_counters = {"calls": 0, "errors": 0, "throttled": 0, "in_flight": 0, "peak_in_flight": 0}
+        self.calls_by_method: Dict[str, int] = {}
+
+    def _rng(self, method: str, *key: Any) -> random.Random:
+        """Per-call RNG derived from the call's identity, independent of thread interleaving"""
+        ident = f"{method}:{':'.join(str(k) for k in key)}"
+        with self.lock:
+            n = self.call_counts.get(ident, 0)
+            self.call_counts[ident] = n + 1
+        digest = hashlib.sha256(f"{self.config.seed}:{ident}:{n}".encode('utf-8')).digest()
+        return random.Random(int.from_bytes(digest[:8], 'big'))
+
+    def _bucket(self, session_id: Optional[str]) -> TokenBucket:
+        scope = (session_id or 'default') if self.config.throttle_scope == 'session' else 'global'
+        with self.lock:
+            if scope not in self.buckets:
+                self.buckets[scope] = TokenBucket(self.config.rps, self.config.burst)
+            return self.buckets[scope]
+
+    def _call(self, method: str, latency: LatencyModel, *key: Any, session_id: Optional[str] = None,
+              scale: float = 1.0) -> random.Random:
+        """Apply throttling, latency and error injection for one call"""
+        rng = self._rng(method, *key)
+        with self.lock:
+            self.stats_counters["calls"] += 1
+            self.calls_by_method[method] = self.calls_by_method.get(method, 0) + 1
+
+        if not self._bucket(session_id).take():
+            with self.lock:
+                self.stats_counters["throttled"] += 1
+            raise FakeRateLimitError("RESOURCE_EXHAUSTED: rate limit exceeded")
+
+        with self.lock:
+            self.stats_counters["in_flight"] += 1
+            self.stats_counters["peak_in_flight"] = max(self.stats_counters["peak_in_flight"], self.stats_counters["in_flight"])
+        try:
+            time.sleep(latency.sample(rng) * scale)
+        finally:
+            with self.lock:
+                self.stats_counters["in_flight"] -= 1
+
+        if self.config.error_rate and rng.random() < self.config.error_rate:
+            with self.lock:
+                self.stats_counters["errors"] += 1
+            raise FakeUpstreamError(f"Injected upstream error in {method}")
+        return rng
+
+    def _notebook(self, notebook_id: str) -> FakeNotebook:
+        notebook = self.by_id.get(notebook_id)
+        if notebook is None:
+            raise FakeUpstreamError(f"Notebook not found: {notebook_id}")
+        return notebook
+
+    def list_notebooks(self, session_id: Optional[str] = None) -> List[FakeNotebook]:
+        self._call('list_notebooks', self.latency, session_id=session_id)
+        return list(self.notebooks)
+
+    def get_notebook(self, notebook_id: str, session_id: Optional[str] = None) -> FakeNotebook:
+        self._call('get_notebook', self.latency, notebook_id, session_id=session_id)
+        return self._notebook(notebook_id)
+
+    def answer(self, notebook_id: str, query_text: str, rng: random.Random) -> str:
+        """Deterministic pseudo-answer citing notebook sources and dates"""
+        notebook = self._notebook(notebook_id)
+        cited = [s.title for s in notebook.sources[:3]]
+        words = []
+        vocabulary = ['insurance', 'policyholder', 'regulation', 'claims', 'authority', 'coverage',
+                      'compliance', 'settlement', 'requirement', 'article', 'company', 'shall']
+        for _ in range(self.config.answer_words):
+            words.append(rng.choice(vocabulary))
+        date = f"{rng.randint(1, 28)} {MONTHS[rng.randrange(12)]} {rng.randint(2008, 2025)}"
+        return (f"According to {', '.join(cited) or notebook.title}, effective {date}: "
+                f"{' '.join(words)}. (Answer to: {query_text})")
+
+    def query(self, notebook_id: str, query_text: str, conversation_id: Optional[str] = None,
+              session_id: Optional[str] = None) -> Dict[str, Any]:
+        rng = self._call('query', self.query_latency, notebook_id, query_text, session_id=session_id)
+        return {
+            "answer": self.answer(notebook_id, query_text, rng),
+            "conversation_id": conversation_id or str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        }
+
+    def query_notebook(self, notebook_id: str, query_text: str, session_id: Optional[str] = None) -> str:
+        rng = self._call('query_notebook', self.query_latency, notebook_id, query_text, session_id=session_id)
+        return self.answer(notebook_id, query_text, rng)
+
+    def query_stream(self, notebook_id: str, query_text: str, session_id: Optional[str] = None) -> Iterator[str]:
+        """The answer in chunks, the first after FIRST_CHUNK_FRACTION of the query latency"""
+        rng = self._call('query_stream', self.query_latency, notebook_id, query_text, session_id=session_id,
+                         scale=FIRST_CHUNK_FRACTION)
+        words = self.answer(notebook_id, query_text, rng).split(' ')
+        pause = self.query_latency.sample(rng) * (1 - FIRST_CHUNK_FRACTION) / STREAM_CHUNKS
+        size = max(1, math.ceil(len(words) / STREAM_CHUNKS))
+        for i in range(0, len(words), size):
+            if i:
+                time.sleep(pause)
+            yield ' '.join(words[i:i + size]) + (' ' if i + size < len(words) else '')
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {**self.stats_counters, "by_method": dict(self.calls_by_method), "notebooks": len(self.notebooks)}
+
+
+class FakeNotebookLMClient:
+    """Drop-in for notebooklm_mcp.api_client.NotebookLMClient backed by a FakeBackend or a fake server URL"""
+
+    _shared_backend: Optional[FakeBackend] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, cookies: Any = None, csrf_token: Optional[str] = None, session_id: Optional[str] = None,
+                 backend: Optional[FakeBackend] = None, base_url: Optional[str] = None):
+        self.cookies = cookies
+        self.csrf_token = csrf_token
+        self.session_id = session_id
+        self.base_url = base_url or os.environ.get('NOTEBOOKLM_FAKE_URL')
+        self.backend = backend
+        if self.backend is None and not self.base_url:
+            with FakeNotebookLMClient._shared_lock:
+                if FakeNotebookLMClient._shared_backend is None:
+                    FakeNotebookLMClient._shared_backend = FakeBackend(FakeConfig.from_env())
+            self.backend = FakeNotebookLMClient._shared_backend
+
+    def _request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Any:
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(self.base_url.rstrip('/') + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json",
+                                                  "X-Session-Id": self.session_id or ""})
+        try:
+            with urllib.request.urlopen(request, timeout=300) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            message = e.read().decode('utf-8', errors='replace')
+            if e.code == 429:
+                raise FakeRateLimitError(message)
+            raise FakeUpstreamError(message)
+
+    @staticmethod
+    def _notebook_from_dict(data: Dict[str, Any]) -> FakeNotebook:
+        return FakeNotebook(
+            id=data['notebook_id'],
+            title=data['title'],
+            sources=[FakeSource(id=s['id'], title=s['title'], type=s.get('type', 'pdf'), created_at=s.get('created_at'))
+                     for s in data.get('sources', [])]
+        )
+
+    def list_notebooks(self) -> List[FakeNotebook]:
+        if self.backend:
+            return self.backend.list_notebooks(session_id=self.session_id)
+        return [self._notebook_from_dict(nb) for nb in self._request('GET', '/notebooks')]
+
+    def get_notebook(self, notebook_id: str) -> FakeNotebook:
+        if self.backend:
+            return self.backend.get_notebook(notebook_id, session_id=self.session_id)
+        return self._notebook_from_dict(self._request('GET', f"/notebooks/{urllib.parse.quote(notebook_id)}"))
+
+    def query(self, notebook_id: str, query_text: str, conversation_id: Optional[str] = None) -> Dict[str, Any]:
+        if self.backend:
+            return self.backend.query(notebook_id, query_text, conversation_id, session_id=self.session_id)
+        return self._request('POST', f"/notebooks/{urllib.parse.quote(notebook_id)}/query",
+                             {"query": query_text, "conversation_id": conversation_id})
+
+    def query_notebook(self, notebook_id: str, query_text: str) -> str:
+        if self.backend:
+            return self.backend.query_notebook(notebook_id, query_text, session_id=self.session_id)
+        return self._request('POST', f"/notebooks/{urllib.parse.quote(notebook_id)}/query_notebook",
+                             {"query": query_text})['answer']
+
+    def query_stream(self, notebook_id: str, query_text: str) -> Iterator[str]:
+        if self.backend:
+            return self.backend.query_stream(notebook_id, query_text, session_id=self.session_id)
+        # The HTTP fake answers in one piece
+        return iter([self.query(notebook_id, query_text)['answer']])
+
+
+class FakeTokens:
+    """Cached-token record; supports attribute and item access like the scripts expect"""
+
+    def __init__(self, session_id: str = "fake-session"):
+        self.cookies = {"SID": "fake"}
+        self.csrf_token = "fake-csrf"
+        self.session_id = session_id
+
+    def __getitem__(self, key: str) -> Any:
+        return getattr(self, key)
+
+
+def make_handler(backend: FakeBackend):
+    """HTTP handler bound to one backend"""
+
+    class FakeNotebookLMHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload: Any):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _dispatch(self, handler):
+            try:
+                self._send(200, handler())
+            except FakeRateLimitError as e:
+                self._send(429, {"error": str(e)})
+            except FakeUpstreamError as e:
+                self._send(503, {"error": str(e)})
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+
+        def do_GET(self):
+            parts = [urllib.parse.unquote(p) for p in self.path.strip('/').split('/')]
+            session_id = self.headers.get('X-Session-Id') or None
+            if parts == ['notebooks']:
+                self._dispatch(lambda: [nb.to_dict() for nb in backend.list_notebooks(session_id=session_id)])
+            elif len(parts) == 2 and parts[0] == 'notebooks':
+                self._dispatch(lambda: backend.get_notebook(parts[1], session_id=session_id).to_dict())
+            elif parts == ['stats']:
+                self._send(200, backend.stats())
+            else:
+                self._send(404, {"error": f"Unknown path: {self.path}"})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            parts = [urllib.parse.unquote(p) for p in self.path.strip('/').split('/')]
+            session_id = self.headers.get('X-Session-Id') or None
+            if len(parts) == 3 and parts[0] == 'notebooks' and parts[2] == 'query':
+                self._dispatch(lambda: backend.query(parts[1], body.get('query', ''), body.get('conversation_id'),
+                                                     session_id=session_id))
+            elif len(parts) == 3 and parts[0] == 'notebooks' and parts[2] == 'query_notebook':
+                self._dispatch(lambda: {"answer": backend.query_notebook(parts[1], body.get('query', ''),
+                                                                         session_id=session_id)})
+            else:
+                self._send(404, {"error": f"Unknown path: {self.path}"})
+
+    return FakeNotebookLMHandler
+
+
+def serve(config: FakeConfig, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    """Create (but do not start) a fake NotebookLM HTTP server"""
+    backend = FakeBackend(config)
+    server = ThreadingHTTPServer((host, port), make_handler(backend))
+    server.daemon_threads = True
+    server.backend = backend
+    return server
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Offline NotebookLM stand-in server')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--notebooks', type=int, default=0, help='Corpus size (default: template size)')
+    parser.add_argument('--template', type=str, default=str(DEFAULT_TEMPLATE), help='all_notebooks.json to take the corpus shape from')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency', type=str, default='fixed:0', help='fixed:s | uniform:lo:hi | normal:mean:sd | lognormal:median:sigma')
+    parser.add_argument('--query-latency', type=str, help='Latency spec for query calls (default: --latency)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of calls that fail')
+    parser.add_argument('--rps', type=float, default=0.0, help='Token-bucket rate limit in requests/second (0 disables)')
+    parser.add_argument('--burst', type=int, default=1, help='Token-bucket burst size')
+    parser.add_argument('--throttle-scope', choices=['global', 'session'], default='global',
+                        help='One rate limit for everyone, or one per session_id')
+
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        notebooks=args.notebooks, template=args.template, seed=args.seed, latency=args.latency,
+        query_latency=args.query_latency, error_rate=args.error_rate, rps=args.rps, burst=args.burst,
+        throttle_scope=args.throttle_scope
+    )
+    server = serve(config, args.host, args.port)
+    print(json.dumps({
+        "status": "info",
+        "message": f"Fake NotebookLM serving {len(server.backend.notebooks)} notebooks on http://{args.host}:{args.port}"
+    }))
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""
+Shim that shadows the real notebooklm_mcp package with the offline fake
+Put scripts/fakes on PYTHONPATH to use it (see scripts/fake_notebooklm.py)
+"""
+
+import sys
+from pathlib import Path
+
+# fake_notebooklm lives two directories up, in scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
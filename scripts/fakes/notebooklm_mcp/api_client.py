@@ -0,0 +1,3 @@
+from fake_notebooklm import FakeNotebookLMClient as NotebookLMClient
+
+__all__ = ["NotebookLMClient"]
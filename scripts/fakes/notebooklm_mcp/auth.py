@@ -0,0 +1,8 @@
+import os
+
+from fake_notebooklm import FakeTokens
+
+
+def load_cached_tokens():
+    """Fake cached tokens; NOTEBOOKLM_FAKE_SESSION_ID overrides the session id"""
+    return FakeTokens(session_id=os.environ.get('NOTEBOOKLM_FAKE_SESSION_ID', 'fake-session'))
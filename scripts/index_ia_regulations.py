@@ -5,19 +5,21 @@ Extracts content from NotebookLM IA notebooks and creates embeddings
 
 import sys
 import os
-import json
 from pathlib import Path
 import asyncio
+from typing import Any, Optional
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-# Import NotebookLM client
-from notebooklm_mcp.api_client import NotebookLMClient
-from notebooklm_mcp.auth import load_cached_tokens
+from instrumentation import Instrumentation
+from bridge_client import bridge_client
+from pdf_ingest import load_pdf_documents
+import records
+from records import Notebooks, read_field
 
 
-async def extract_regulatory_content(notebook_id: str, client: NotebookLMClient) -> list[dict]:
+async def extract_regulatory_content(notebook_id: str, client: Any) -> list[dict]:
     """Extract content from a regulatory notebook"""
     documents = []
     
@@ -43,7 +45,7 @@ async def extract_regulatory_content(notebook_id: str, client: NotebookLMClient)
                         'notebook_title': notebook.title,
                         'source_id': source.source_id,
                         'source_type': 'IA Regulation',
-                        'date_added': source.created_at if hasattr(source, 'created_at') else None,
+                        'date_added': read_field(source, 'created_at'),
                     }
                 })
                 
@@ -59,21 +61,32 @@ async def extract_regulatory_content(notebook_id: str, client: NotebookLMClient)
     return documents
 
 
-async def main():
+async def main(instrumentation: Optional[Instrumentation] = None, bridge_url: Optional[str] = None,
+               pdf_dir: Optional[str] = None, workers: Optional[int] = None):
     """Main indexing function"""
+    instrumentation = instrumentation or Instrumentation("index_ia_regulations")
     print("="* 60)
     print("IA Regulatory Document Indexing Script")
     print("="* 60)
     
     # Load NotebookLM authentication
     print("\n[1/4] Loading authentication...")
-    tokens = load_cached_tokens()
-    if not tokens:
-        print("❌ No cached tokens found. Please run: notebooklm-mcp-auth")
-        return
-    
-    client = NotebookLMClient(tokens['cookies'])
-    print("✓ Authenticated successfully")
+    if pdf_dir:
+        client = None
+        print(f"✓ Reading local PDFs from {pdf_dir}; NotebookLM is not queried")
+    else:
+        # Imported here so --pdf-dir works on machines without notebooklm-mcp
+        from notebooklm_mcp.api_client import NotebookLMClient
+        from notebooklm_mcp.auth import load_cached_tokens
+
+        tokens = load_cached_tokens()
+        if not tokens:
+            print("❌ No cached tokens found. Please run: notebooklm-mcp-auth")
+            return
+        
+        # Per-source queries go through the bridge's batch lane when one is running
+        client = instrumentation.wrap_client(bridge_client(NotebookLMClient(tokens['cookies']), bridge_url, priority="batch"))
+        print("✓ Authenticated successfully")
     
     # Load filtered IA notebooks
     print("\n[2/4] Loading IA notebooks...")
@@ -81,11 +94,14 @@ async def main():
     ia_file = data_dir / "filtered_IA__notebooks.json"
     
     if not ia_file.exists():
-        print(f"❌ IA notebooks file not found: {ia_file}")
-        return
-        
-    with open(ia_file, 'r', encoding='utf-8') as f:
-        ia_notebooks = json.load(f)
+        if not pdf_dir:
+            print(f"❌ IA notebooks file not found: {ia_file}")
+            return
+        # PDFs can still be indexed, just without their notebook ids
+        print(f"⚠ IA notebooks file not found: {ia_file}")
+        ia_notebooks = []
+    else:
+        ia_notebooks = records.load(ia_file, Notebooks)
     
     print(f"✓ Found {len(ia_notebooks)} IA notebooks")
     
@@ -93,14 +109,21 @@ async def main():
     print("\n[3/4] Extracting regulatory content...")
     all_documents = []
     
-    for notebook in ia_notebooks:
+    if pdf_dir:
+        with instrumentation.stage("parse_pdfs"):
+            all_documents, failures = load_pdf_documents(pdf_dir, ia_notebooks, workers=workers)
+        if failures:
+            print(f"  {len(failures)} PDFs could not be parsed")
+    
+    for notebook in ia_notebooks if not pdf_dir else []:
         notebook_id = notebook.get('notebook_id')
         if not notebook_id:
             print(f"⚠ Skipping notebook (no ID): {notebook.get('title', 'Unknown')}")
             continue
             
         print(f"\nProcessing: {notebook.get('title', 'Unknown')}")
-        docs = await extract_regulatory_content(notebook_id, client)
+        with instrumentation.stage("extract_notebook"):
+            docs = await extract_regulatory_content(notebook_id, client)
         all_documents.extend(docs)
         print(f"  Extracted {len(docs)} documents")
     
@@ -109,8 +132,8 @@ async def main():
     # Save extracted documents
     print("\n[4/4] Saving extracted content...")
     output_file = data_dir / "ia_regulations_content.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(all_documents, f, ensure_ascii=False, indent=2)
+    with instrumentation.stage("save"):
+        records.dump(output_file, all_documents)
     
     print(f"✓ Saved to: {output_file}")
     
@@ -128,4 +151,19 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Extract IA regulatory content from NotebookLM for indexing')
+    parser.add_argument('--pdf-dir', type=str,
+                        help='Parse the source PDFs in this directory instead of querying NotebookLM for each source')
+    parser.add_argument('--workers', type=int, help='Processes used to parse PDFs (default: CPU count)')
+    parser.add_argument('--bridge-url', type=str, default=os.environ.get('NOTEBOOKLM_BRIDGE_URL'),
+                        help='Send queries through a running bridge server on its batch lane (default: $NOTEBOOKLM_BRIDGE_URL)')
+    Instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    
+    instrumentation = Instrumentation.from_args(args, script="index_ia_regulations")
+    try:
+        asyncio.run(main(instrumentation, bridge_url=args.bridge_url, pdf_dir=args.pdf_dir, workers=args.workers))
+    finally:
+        instrumentation.finish()
@@ -0,0 +1,479 @@
+"""
+Write-coalescing ingest gateway in front of the ChromaDB server
+Accepts upserts and deletes over HTTP and appends each one to a local log
+(fsynced before the write is acknowledged). Writes are buffered per collection
+and flushed to ChromaDB as one batched delete plus one batched upsert once
+--max-batch records are pending or the oldest has waited --max-delay-ms. Within
+a buffer the last write to an id wins. Buffers that were not flushed before a
+crash or restart are replayed from the log. Flushes to a collection can be
+paused (chroma_maintenance.py does this while it swaps in a rebuilt
+collection). Writes are still accepted and logged while paused, and the pause
+lifts by itself after its timeout.
+
+    python scripts/ingest_gateway.py --port 8001 --chroma-url http://localhost:8000
+
+    POST /collections/<name>/upsert  {"ids": [...], "embeddings": [...], "documents": [...], "metadatas": [...]}
+    POST /collections/<name>/delete  {"ids": [...]}
+    POST /flush                      flush every buffer now
+    POST /pause                      {"collections": [...], "seconds": 900}
+    POST /resume                     {"collections": [...]}
+    GET  /stats
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from collections import deque
+from pathlib import Path
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Dict, Any, Callable, Deque, Optional, Tuple
+
+from instrumentation import LatencyHistogram
+
+DEFAULT_LOG_DIR = Path("chromadb_ingest")
+DEFAULT_CHROMA_URL = 'http://localhost:8000'
+LOG_FILE = "ingest.log"
+CHECKPOINT_FILE = "checkpoint.json"
+RETRY_BACKOFF_S = 2.0
+PAUSE_TIMEOUT_S = 900.0
+PAUSE_WAIT_S = 30.0
+FIELDS = ('embeddings', 'documents', 'metadatas')
+
+
+class ChromaSink:
+    """Batched writes to collections on a ChromaDB server"""
+
+    def __init__(self, url: str = DEFAULT_CHROMA_URL):
+        import chromadb
+
+        parsed = urlparse(url)
+        self.client = chromadb.HttpClient(host=parsed.hostname or 'localhost', port=parsed.port or 8000)
+        self.collections: Dict[str, Any] = {}
+        try:
+            self.max_batch = self.client.get_max_batch_size()
+        except Exception:
+            self.max_batch = 5000
+
+    def _collection(self, name: str):
+        if name not in self.collections:
+            # Same settings as vector-store.ts uses when it creates a collection
+            self.collections[name] = self.client.get_or_create_collection(
+                name, metadata={'hnsw:space': 'cosine', 'description': f"Vector collection for {name}"}
+            )
+        return self.collections[name]
+
+    def delete(self, collection: str, ids: List[str]):
+        try:
+            for start in range(0, len(ids), self.max_batch):
+                self._collection(collection).delete(ids=ids[start:start + self.max_batch])
+        except Exception:
+            # A rebuilt collection has a new id; the flush retry looks the name up again
+            self.collections.pop(collection, None)
+            raise
+
+    def upsert(self, collection: str, records: Dict[str, Dict[str, Any]]):
+        ids = list(records)
+        try:
+            for start in range(0, len(ids), self.max_batch):
+                batch = ids[start:start + self.max_batch]
+                kwargs = {"ids": batch}
+                for field in FIELDS:
+                    values = [records[i].get(field) for i in batch]
+                    if any(v is not None for v in values):
+                        kwargs[field] = values
+                self._collection(collection).upsert(**kwargs)
+        except Exception:
+            self.collections.pop(collection, None)
+            raise
+
+    def forget(self, collection: str):
+        """Look the collection up again on its next write"""
+        self.collections.pop(collection, None)
+
+
+class AppendLog:
+    """fsynced JSON-lines log of accepted writes, plus the highest flushed sequence per collection"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / LOG_FILE
+        self.checkpoint_path = self.directory / CHECKPOINT_FILE
+        self.lock = threading.Lock()
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def append(self, entry: Dict[str, Any], next_seq: Callable[[], int]) -> int:
+        """Number, write and fsync one entry; numbering under the log lock keeps the file in sequence order"""
+        with self.lock:
+            entry["seq"] = next_seq()
+            self.file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        return entry["seq"]
+
+    def replay(self) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """Logged entries not yet flushed, and the checkpoint"""
+        checkpoint = {}
+        if self.checkpoint_path.exists():
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        entries = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Torn final line from a crash; it was never acknowledged
+                if entry['seq'] > checkpoint.get(entry['collection'], 0):
+                    entries.append(entry)
+        return entries, checkpoint
+
+    def save_checkpoint(self, checkpoint: Dict[str, int]):
+        temp = self.checkpoint_path.with_suffix('.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.checkpoint_path)
+
+    def truncate(self, drained: Callable[[], bool]) -> bool:
+        """Start an empty log if every logged write has been flushed; no write can be logged during the check"""
+        with self.lock:
+            if not drained():
+                return False
+            self.file.close()
+            self.file = open(self.path, 'w', encoding='utf-8')
+            os.fsync(self.file.fileno())
+            return True
+
+    def size(self) -> int:
+        return self.path.stat().st_size if self.path.exists() else 0
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class CollectionBuffer:
+    """Pending writes of one collection, last write per id wins"""
+
+    def __init__(self):
+        self.ops: Dict[str, Optional[Dict[str, Any]]] = {}  # id -> record, or None for a delete
+        self.oldest: Optional[float] = None
+        self.max_seq = 0
+
+    def add(self, seq: int, op: str, ids: List[str], body: Dict[str, Any]):
+        for i, doc_id in enumerate(ids):
+            self.ops[doc_id] = None if op == 'delete' else {
+                field: body[field][i] for field in FIELDS if body.get(field) is not None
+            }
+        self.max_seq = max(self.max_seq, seq)
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+
+    def restore(self, taken: "CollectionBuffer"):
+        """Put back writes whose flush failed, under any newer writes to the same ids"""
+        self.ops = {**taken.ops, **self.ops}
+        self.max_seq = max(self.max_seq, taken.max_seq)
+        self.oldest = min(t for t in (self.oldest, taken.oldest) if t is not None)
+
+
+class IngestGateway:
+    """Buffers writes per collection and flushes them to a sink in large batches"""
+
+    def __init__(self, sink: Any, log: AppendLog, max_batch: int = 500, max_delay: float = 1.0):
+        self.sink = sink
+        self.log = log
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.buffers: Dict[str, CollectionBuffer] = {}
+        self.flushing: Dict[str, CollectionBuffer] = {}
+        self.retry_at: Dict[str, float] = {}
+        self.paused: Dict[str, float] = {}  # collection -> monotonic time the pause expires
+        # seq -> collection of writes appended to the log but not buffered yet
+        self.unbuffered: Dict[int, str] = {}
+        self.seq = 0
+        self.running = True
+        self.counts = {"writes": 0, "records": 0, "flushes": 0, "flushed_records": 0, "failures": 0, "replayed": 0}
+        self.flush_latency = LatencyHistogram()
+        self.flush_sizes: Deque[int] = deque(maxlen=1000)
+
+        entries, self.checkpoint = log.replay()
+        for entry in entries:
+            self.seq = max(self.seq, entry['seq'])
+            self.buffers.setdefault(entry['collection'], CollectionBuffer()).add(
+                entry['seq'], entry['op'], entry['ids'], entry)
+        self.seq = max([self.seq] + list(self.checkpoint.values()))
+        self.counts["replayed"] = len(entries)
+
+        self.thread = threading.Thread(target=self._run, name="ingest-flusher", daemon=True)
+        self.thread.start()
+
+    def _next_seq(self, collection: str) -> int:
+        with self.lock:
+            self.seq += 1
+            self.unbuffered[self.seq] = collection
+            return self.seq
+
+    def write(self, collection: str, op: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Log and buffer one request; returns once it is durable"""
+        ids = body.get('ids') or []
+        if not ids:
+            raise ValueError("ids is required")
+        for field in FIELDS:
+            if op == 'upsert' and body.get(field) is not None and len(body[field]) != len(ids):
+                raise ValueError(f"{field} must have one entry per id")
+
+        entry = {"collection": collection, "op": op, "ids": ids}
+        if op == 'upsert':
+            entry.update({field: body[field] for field in FIELDS if body.get(field) is not None})
+
+        try:
+            self.log.append(entry, lambda: self._next_seq(collection))
+        except Exception:
+            with self.lock:
+                self.unbuffered.pop(entry.get("seq"), None)
+            raise
+
+        with self.lock:
+            del self.unbuffered[entry["seq"]]
+            buffer = self.buffers.setdefault(collection, CollectionBuffer())
+            buffer.add(entry["seq"], op, ids, entry)
+            self.counts["writes"] += 1
+            self.counts["records"] += len(ids)
+            if len(buffer.ops) >= self.max_batch:
+                self.wakeup.notify()
+            pending = len(buffer.ops)
+        return {"status": "accepted", "seq": entry["seq"], "records": len(ids), "pending": pending}
+
+    def _is_paused(self, name: str, now: float) -> bool:
+        return now < self.paused.get(name, 0)
+
+    def _due(self, now: float, force: bool) -> List[str]:
+        return [name for name, buffer in self.buffers.items()
+                if buffer.ops and name not in self.flushing and now >= self.retry_at.get(name, 0)
+                and not self._is_paused(name, now)
+                and (force or len(buffer.ops) >= self.max_batch or now - buffer.oldest >= self.max_delay)]
+
+    def _run(self):
+        while self.running:
+            with self.lock:
+                self.wakeup.wait(timeout=min(0.1, self.max_delay))
+                due = self._due(time.monotonic(), force=False)
+            for name in due:
+                self.flush_collection(name)
+
+    def flush_collection(self, name: str) -> bool:
+        with self.lock:
+            buffer = self.buffers.get(name)
+            if buffer is None or not buffer.ops or name in self.flushing:
+                return True
+            if self._is_paused(name, time.monotonic()):
+                return False
+            self.flushing[name] = buffer
+            self.buffers[name] = CollectionBuffer()
+
+        deletes = [doc_id for doc_id, record in buffer.ops.items() if record is None]
+        upserts = {doc_id: record for doc_id, record in buffer.ops.items() if record is not None}
+        start = time.perf_counter()
+        try:
+            if deletes:
+                self.sink.delete(name, deletes)
+            if upserts:
+                self.sink.upsert(name, upserts)
+        except Exception as e:
+            with self.lock:
+                del self.flushing[name]
+                self.buffers[name].restore(buffer)
+                self.retry_at[name] = time.monotonic() + RETRY_BACKOFF_S
+                self.counts["failures"] += 1
+            print(json.dumps({"status": "error", "error": f"Flush of {name} failed, will retry: {str(e)}"}))
+            sys.stdout.flush()
+            return False
+
+        with self.lock:
+            del self.flushing[name]
+            self.retry_at.pop(name, None)
+            # A logged write still on its way into the buffer must stay above the checkpoint
+            pending = [seq for seq, collection in self.unbuffered.items() if collection == name]
+            flushed = min([buffer.max_seq] + [seq - 1 for seq in pending])
+            self.checkpoint[name] = max(self.checkpoint.get(name, 0), flushed)
+            self.counts["flushes"] += 1
+            self.counts["flushed_records"] += len(buffer.ops)
+            self.flush_latency.observe(time.perf_counter() - start)
+            self.flush_sizes.append(len(buffer.ops))
+            checkpoint = dict(self.checkpoint)
+        self.log.save_checkpoint(checkpoint)
+        self.log.truncate(self._drained)
+        return True
+
+    def _drained(self) -> bool:
+        with self.lock:
+            return not self.unbuffered and not self.flushing and not any(b.ops for b in self.buffers.values())
+
+    def pause(self, collections: List[str], seconds: float = PAUSE_TIMEOUT_S) -> bool:
+        """Hold flushes to these collections; False if a flush already under way did not finish in time"""
+        now = time.monotonic()
+        wait_until = now + min(seconds, PAUSE_WAIT_S)
+        with self.lock:
+            for name in collections:
+                self.paused[name] = now + seconds
+            while any(name in self.flushing for name in collections):
+                remaining = wait_until - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.wakeup.wait(timeout=min(0.05, remaining))
+        return True
+
+    def resume(self, collections: List[str]):
+        with self.lock:
+            for name in collections:
+                self.paused.pop(name, None)
+                # The collection may have been replaced under the same name while paused
+                if hasattr(self.sink, 'forget'):
+                    self.sink.forget(name)
+            self.wakeup.notify()
+
+    def flush_all(self) -> bool:
+        with self.lock:
+            names = [name for name, buffer in self.buffers.items() if buffer.ops]
+        return all([self.flush_collection(name) for name in names])
+
+    def stop(self):
+        self.running = False
+        with self.lock:
+            self.wakeup.notify()
+        self.thread.join()
+        self.flush_all()
+        self.log.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            sizes = list(self.flush_sizes)
+            return {
+                **self.counts,
+                "seq": self.seq,
+                "pending": {name: len(b.ops) for name, b in self.buffers.items() if b.ops},
+                "paused": sorted(name for name in self.paused if self._is_paused(name, time.monotonic())),
+                "mean_batch": round(sum(sizes) / len(sizes), 1) if sizes else None,
+                "flush_latency": self.flush_latency.to_dict(),
+                "log_bytes": self.log.size(),
+                "max_batch": self.max_batch,
+                "max_delay_ms": self.max_delay * 1000
+            }
+
+
+class GatewayHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def make_handler(gateway: IngestGateway):
+    """HTTP handler bound to one gateway"""
+
+    class GatewayHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload: Dict[str, Any]):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._send(200, gateway.stats())
+            elif self.path == '/health':
+                self._send(200, {"status": "success"})
+            else:
+                self._send(404, {"status": "error", "error": f"Unknown path: {self.path}"})
+
+        def do_POST(self):
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError as e:
+                self._send(400, {"status": "error", "error": f"Invalid JSON body: {str(e)}"})
+                return
+
+            if self.path == '/flush':
+                flushed = gateway.flush_all()
+                self._send(200 if flushed else 503, {"status": "success" if flushed else "error", **gateway.stats()})
+                return
+
+            if self.path in ('/pause', '/resume'):
+                names = body.get('collections')
+                if not isinstance(names, list) or not names:
+                    self._send(400, {"status": "error", "error": "collections is required"})
+                elif self.path == '/resume':
+                    gateway.resume(names)
+                    self._send(200, {"status": "success", "resumed": names})
+                elif gateway.pause(names, float(body.get('seconds') or PAUSE_TIMEOUT_S)):
+                    self._send(200, {"status": "success", "paused": names})
+                else:
+                    gateway.resume(names)
+                    self._send(503, {"status": "error", "error": "A flush to these collections did not finish in time"})
+                return
+
+            parts = self.path.strip('/').split('/')
+            if len(parts) != 3 or parts[0] != 'collections' or parts[2] not in ('upsert', 'delete'):
+                self._send(404, {"status": "error", "error": f"Unknown path: {self.path}"})
+                return
+
+            try:
+                self._send(202, gateway.write(parts[1], parts[2], body))
+            except ValueError as e:
+                self._send(400, {"status": "error", "error": str(e)})
+
+    return GatewayHandler
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Buffer ChromaDB writes and flush them in large batches')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--chroma-url', type=str, default=os.environ.get('CHROMADB_PATH') or DEFAULT_CHROMA_URL,
+                        help='ChromaDB server writes are flushed to')
+    parser.add_argument('--log-dir', type=str, default=str(DEFAULT_LOG_DIR), help='Directory for the append log')
+    parser.add_argument('--max-batch', type=int, default=500, help='Flush a collection once this many records are pending')
+    parser.add_argument('--max-delay-ms', type=float, default=1000, help='Flush a collection once its oldest write is this old')
+    args = parser.parse_args()
+
+    try:
+        sink = ChromaSink(args.chroma_url)
+    except ImportError:
+        print(json.dumps({"status": "error", "error": "chromadb is not installed: pip install chromadb"}))
+        sys.exit(1)
+
+    gateway = IngestGateway(sink, AppendLog(Path(args.log_dir)), max_batch=args.max_batch, max_delay=args.max_delay_ms / 1000)
+    if gateway.counts["replayed"]:
+        print(json.dumps({"status": "info", "message": f"Replaying {gateway.counts['replayed']} unflushed writes from {args.log_dir}"}))
+        gateway.flush_all()
+
+    server = GatewayHTTPServer((args.host, args.port), make_handler(gateway))
+    print(json.dumps({"status": "info", "message": f"Ingest gateway listening on http://{args.host}:{args.port}"}))
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        gateway.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Declarative insight rules for insurance_ai_insights.py
+Compiles a rules file (JSON, or YAML when PyYAML is installed) into an evaluator
+that matches every selector in a single pass over the notebook index
+"""
+
+import json
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, FrozenSet, Tuple
+
+DEFAULT_RULES_FILE = Path(__file__).parent / "insight_rules.json"
+
+SELECTOR_KEYS = {
+    "title_startswith",
+    "title_contains",
+    "title_contains_any",
+    "source_title_contains_any",
+    "min_source_count",
+    "ignore_case",
+}
+
+
+class RuleError(ValueError):
+    """Raised when a rules file is malformed"""
+
+
+def load_rules(path: Optional[str] = None) -> Dict[str, Any]:
+    """Load a rules file from JSON or YAML"""
+    rules_path = Path(path) if path else DEFAULT_RULES_FILE
+
+    with open(rules_path, 'r', encoding='utf-8') as f:
+        if rules_path.suffix in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise RuleError(f"PyYAML is required to load {rules_path}. Install it with: pip install pyyaml")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def _fingerprint(notebook: Dict[str, Any]) -> Tuple:
+    """Fields a selector can read; unchanged fingerprints reuse previous matches"""
+    sources = notebook.get('sources') or []
+    return (
+        notebook.get('title', ''),
+        tuple(s.get('title', '') for s in sources),
+        notebook.get('source_count', len(sources)),
+    )
+
+
+class RuleMatches:
+    """Result of evaluating every selector against a notebook list"""
+
+    def __init__(self, notebooks: List[Dict[str, Any]], matched: List[FrozenSet[int]], cache: Dict[Tuple, FrozenSet[int]],
+                 selector_names: List[str]):
+        self.notebooks = notebooks
+        self.matched = matched
+        self.cache = cache
+        self.selector_names = selector_names
+        self.first: Dict[str, Dict[str, Any]] = {}
+        self.counts: Dict[str, int] = {name: 0 for name in selector_names}
+
+        # Notebooks are visited in index order, so the first hit is the same notebook next() would return
+        for notebook, selector_ids in zip(notebooks, matched):
+            for selector_id in selector_ids:
+                name = selector_names[selector_id]
+                self.counts[name] += 1
+                if name not in self.first:
+                    self.first[name] = notebook
+
+    def first_match(self, selector: str) -> Optional[Dict[str, Any]]:
+        """First notebook (in index order) matching a selector"""
+        return self.first.get(selector)
+
+    def match_count(self, selector: str) -> int:
+        """Number of notebooks matching a selector"""
+        return self.counts.get(selector, 0)
+
+
+class RuleEvaluator:
+    """Compiled form of a rules file"""
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.rules = rules
+        self.selector_names: List[str] = list(rules.get('selectors', {}).keys())
+        self.selector_ids: Dict[str, int] = {name: i for i, name in enumerate(self.selector_names)}
+        self.predicates: List[Callable[[Dict[str, Any]], bool]] = [
+            self._compile_selector(name, rules['selectors'][name]) for name in self.selector_names
+        ]
+        self.recommendations: List[Dict[str, Any]] = rules.get('recommendations', [])
+        self._validate_recommendations()
+
+    def _compile_selector(self, name: str, spec: Dict[str, Any]) -> Callable[[Dict[str, Any]], bool]:
+        """Turn a selector spec into a predicate over one notebook"""
+        unknown = set(spec) - SELECTOR_KEYS
+        if unknown:
+            raise RuleError(f"Selector '{name}' has unknown conditions: {', '.join(sorted(unknown))}")
+
+        fold = (lambda s: s.lower()) if spec.get('ignore_case') else (lambda s: s)
+        prefix = fold(spec['title_startswith']) if 'title_startswith' in spec else None
+        contains_all = [fold(s) for s in spec.get('title_contains', [])]
+        contains_any = [fold(s) for s in spec.get('title_contains_any', [])]
+        source_any = [fold(s) for s in spec.get('source_title_contains_any', [])]
+        min_sources = spec.get('min_source_count')
+
+        def predicate(notebook: Dict[str, Any]) -> bool:
+            title = fold(notebook.get('title', ''))
+            if prefix is not None and not title.startswith(prefix):
+                return False
+            if contains_all and not all(s in title for s in contains_all):
+                return False
+            if contains_any and not any(s in title for s in contains_any):
+                return False
+            sources = notebook.get('sources') or []
+            if min_sources is not None and notebook.get('source_count', len(sources)) < min_sources:
+                return False
+            if source_any:
+                source_titles = [fold(s.get('title', '')) for s in sources]
+                if not any(needle in t for t in source_titles for needle in source_any):
+                    return False
+            return True
+
+        return predicate
+
+    def _validate_recommendations(self):
+        """Reject references to selectors that do not exist"""
+        for rec in self.recommendations:
+            referenced = [ds['selector'] for ds in rec.get('data_sources', [])] + rec.get('when', [])
+            for selector in referenced:
+                if selector not in self.selector_ids:
+                    raise RuleError(f"Recommendation '{rec.get('area')}' references unknown selector '{selector}'")
+
+    def evaluate(self, notebooks: List[Dict[str, Any]], previous: Optional[RuleMatches] = None) -> RuleMatches:
+        """Match all selectors in one pass, reusing results for notebooks unchanged since `previous`"""
+        cache = previous.cache if previous else {}
+        next_cache: Dict[Tuple, FrozenSet[int]] = {}
+        matched: List[FrozenSet[int]] = []
+
+        for notebook in notebooks:
+            fingerprint = _fingerprint(notebook)
+            selector_ids = next_cache.get(fingerprint)
+            if selector_ids is None:
+                selector_ids = cache.get(fingerprint)
+            if selector_ids is None:
+                selector_ids = frozenset(i for i, predicate in enumerate(self.predicates) if predicate(notebook))
+            next_cache[fingerprint] = selector_ids
+            matched.append(selector_ids)
+
+        return RuleMatches(notebooks, matched, next_cache, self.selector_names)
+
+    def render(self, matches: RuleMatches) -> List[Dict[str, Any]]:
+        """Build recommendation dicts from a set of matches"""
+        recommendations = []
+
+        for rule in self.recommendations:
+            if not all(matches.first_match(selector) for selector in rule.get('when', [])):
+                continue
+
+            rec = {
+                "area": rule['area'],
+                "priority": rule.get('priority', 'MEDIUM'),
+                "opportunities": rule.get('opportunities', []),
+            }
+
+            if 'data_sources' in rule:
+                data_sources = []
+                for ds in rule['data_sources']:
+                    notebook = matches.first_match(ds['selector'])
+                    if notebook:
+                        data_sources.extend(notebook['sources'][:ds.get('limit')])
+                rec["data_sources"] = data_sources
+
+            recommendations.append(rec)
+
+        return recommendations
@@ -0,0 +1,292 @@
+"""
+Shared profiling and timing hooks for the notebook scripts
+Adds --profile (cProfile, or pyinstrument when installed) and --timings
+(per-stage and per-remote-call latency histograms as JSON) to a script.
+
+    instr = Instrumentation.from_args(args)
+    client = instr.wrap_client(NotebookLMClient(...))
+    with instr.stage("extract"):
+        ...
+    instr.finish()
+"""
+
+import sys
+import json
+import time
+import bisect
+import threading
+import contextlib
+from collections.abc import Iterator as IteratorABC
+from typing import List, Dict, Any, Optional, Iterator
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000]
+MAX_SAMPLES = 10000
+SLOWEST_CALLS = 20
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with exact percentiles over the first MAX_SAMPLES samples"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.samples: List[float] = []
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 3) if value is not None else None
+
+        return {
+            "count": self.count,
+            "total_ms": ms(self.total),
+            "mean_ms": ms(self.total / self.count) if self.count else None,
+            "min_ms": ms(self.min),
+            "p50_ms": ms(self.percentile(0.50)),
+            "p95_ms": ms(self.percentile(0.95)),
+            "p99_ms": ms(self.percentile(0.99)),
+            "max_ms": ms(self.max),
+            "buckets": {f"le_{bound}ms": n for bound, n in zip(BUCKETS_MS + ['inf'], self.counts) if n}
+        }
+
+
+class _TimedStream:
+    """Iterator over a streamed response that records the call once it ends, fails or is dropped"""
+
+    def __init__(self, stream: Iterator[Any], instrumentation: "Instrumentation", method: str,
+                 notebook_id: Optional[str], start: float):
+        self._stream = stream
+        self._instrumentation = instrumentation
+        self._method = method
+        self._notebook_id = notebook_id
+        self._start = start
+        self._finished = False
+
+    def _finish(self, error: Optional[str]):
+        if not self._finished:
+            self._finished = True
+            self._instrumentation.record_call(self._method, time.perf_counter() - self._start, self._notebook_id, error)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Any:
+        try:
+            return next(self._stream)
+        except StopIteration:
+            self._finish(None)
+            raise
+        except Exception as e:
+            self._finish(type(e).__name__)
+            raise
+
+    def close(self):
+        close = getattr(self._stream, 'close', None)
+        if close is not None:
+            close()
+        self._finish(None)
+
+    def __del__(self):
+        if not self._finished:
+            self.close()
+
+
+class InstrumentedClient:
+    """Proxy that times every method call on a NotebookLMClient; streamed calls are timed until the stream ends"""
+
+    def __init__(self, client: Any, instrumentation: "Instrumentation"):
+        self._client = client
+        self._instrumentation = instrumentation
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        def timed(*args, **kwargs):
+            notebook_id = kwargs.get('notebook_id', args[0] if args and isinstance(args[0], str) else None)
+            start = time.perf_counter()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                self._instrumentation.record_call(name, time.perf_counter() - start, notebook_id, type(e).__name__)
+                raise
+            if isinstance(result, IteratorABC):
+                # A streamed call lasts until its last chunk, not until the generator is returned
+                return _TimedStream(result, self._instrumentation, name, notebook_id, start)
+            self._instrumentation.record_call(name, time.perf_counter() - start, notebook_id, None)
+            return result
+
+        return timed
+
+
+class Instrumentation:
+    """Stage timers, remote-call histograms and an optional profiler for one script run"""
+
+    def __init__(self, script: str, timings: Optional[str] = None, profile: Optional[str] = None,
+                 profiler: str = "cprofile"):
+        self.script = script
+        self.timings_path = timings
+        self.profile_path = profile
+        self.profiler_name = profiler
+        self.enabled = timings is not None
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.stages: Dict[str, LatencyHistogram] = {}
+        self.calls: Dict[str, LatencyHistogram] = {}
+        self.errors: Dict[str, int] = {}
+        self.per_notebook: Dict[str, float] = {}
+        self.slowest: List[Dict[str, Any]] = []
+        self.counters: Dict[str, int] = {}
+        self._profiler = None
+
+        if profile is not None:
+            self._start_profiler()
+
+    @classmethod
+    def from_args(cls, args: Any, script: Optional[str] = None) -> "Instrumentation":
+        """Build from arguments added by add_arguments()"""
+        return cls(
+            script=script or sys.argv[0],
+            timings=getattr(args, 'timings', None),
+            profile=getattr(args, 'profile', None),
+            profiler=getattr(args, 'profiler', 'cprofile')
+        )
+
+    @staticmethod
+    def add_arguments(parser: Any):
+        """Register --profile, --profiler and --timings on an argparse parser"""
+        parser.add_argument('--profile', nargs='?', const='-', default=None, metavar='PATH',
+                            help='Profile the run; writes stats to PATH (default: summary on stderr)')
+        parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'], default='cprofile',
+                            help='Profiler backend for --profile')
+        parser.add_argument('--timings', nargs='?', const='-', default=None, metavar='PATH',
+                            help='Write per-stage and per-call latency histograms as JSON to PATH (default: stderr)')
+
+    def _start_profiler(self):
+        if self.profiler_name == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+                self._profiler = Profiler()
+                self._profiler.start()
+                return
+            except ImportError:
+                print("pyinstrument is not installed; falling back to cProfile", file=sys.stderr)
+                self.profiler_name = 'cprofile'
+
+        import cProfile
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def _stop_profiler(self):
+        if self._profiler is None:
+            return
+
+        if self.profiler_name == 'pyinstrument':
+            self._profiler.stop()
+            if self.profile_path and self.profile_path != '-':
+                with open(self.profile_path, 'w', encoding='utf-8') as f:
+                    f.write(self._profiler.output_html() if self.profile_path.endswith('.html') else self._profiler.output_text())
+            else:
+                print(self._profiler.output_text(), file=sys.stderr)
+        else:
+            import pstats
+            self._profiler.disable()
+            if self.profile_path and self.profile_path != '-':
+                self._profiler.dump_stats(self.profile_path)
+            stats = pstats.Stats(self._profiler, stream=sys.stderr)
+            stats.sort_stats('cumulative').print_stats(25)
+        self._profiler = None
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a named stage of the script"""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.stages.setdefault(name, LatencyHistogram()).observe(elapsed)
+
+    def increment(self, name: str, amount: int = 1):
+        """Bump a named counter included in the timings output"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record_call(self, method: str, seconds: float, notebook_id: Optional[str] = None, error: Optional[str] = None):
+        """Record one remote call"""
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.calls.setdefault(method, LatencyHistogram()).observe(seconds)
+            if error:
+                key = f"{method}:{error}"
+                self.errors[key] = self.errors.get(key, 0) + 1
+            if notebook_id:
+                self.per_notebook[notebook_id] = self.per_notebook.get(notebook_id, 0.0) + seconds
+            if len(self.slowest) < SLOWEST_CALLS or seconds > self.slowest[-1]['seconds']:
+                self.slowest.append({"method": method, "notebook_id": notebook_id, "seconds": seconds, "error": error})
+                self.slowest.sort(key=lambda c: c['seconds'], reverse=True)
+                del self.slowest[SLOWEST_CALLS:]
+
+    def wrap_client(self, client: Any) -> Any:
+        """Time every call made through a NotebookLMClient (no-op unless --timings is set)"""
+        if not self.enabled or client is None:
+            return client
+        return InstrumentedClient(client, self)
+
+    def report(self) -> Dict[str, Any]:
+        """Timings as a JSON-serializable dict"""
+        with self.lock:
+            slowest_notebooks = sorted(self.per_notebook.items(), key=lambda kv: kv[1], reverse=True)[:SLOWEST_CALLS]
+            return {
+                "status": "timings",
+                "script": self.script,
+                "wall_time_ms": round((time.perf_counter() - self.started) * 1000, 3),
+                "stages": {name: hist.to_dict() for name, hist in self.stages.items()},
+                "remote_calls": {name: hist.to_dict() for name, hist in self.calls.items()},
+                "remote_errors": dict(self.errors),
+                "counters": dict(self.counters),
+                "slowest_calls": [{**c, "seconds": round(c['seconds'], 6)} for c in self.slowest],
+                "slowest_notebooks": [{"notebook_id": nb, "total_ms": round(s * 1000, 3)} for nb, s in slowest_notebooks]
+            }
+
+    def finish(self):
+        """Stop the profiler and emit timings; safe to call more than once"""
+        self._stop_profiler()
+
+        if not self.enabled:
+            return
+
+        report = self.report()
+        if self.timings_path and self.timings_path != '-':
+            with open(self.timings_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        else:
+            print(json.dumps(report, ensure_ascii=False), file=sys.stderr)
+        self.enabled = False
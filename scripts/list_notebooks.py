@@ -13,7 +13,23 @@ except ImportError as e:
     print(json.dumps({"status": "error", "error": f"Failed to import NotebookLM modules: {str(e)}"}))
     sys.exit(1)
 
+from instrumentation import Instrumentation
+from records import notebook_record
+
 def main():
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='List NotebookLM notebooks')
+    Instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    
+    instrumentation = Instrumentation.from_args(args, script="list_notebooks")
+    try:
+        run(instrumentation)
+    finally:
+        instrumentation.finish()
+
+def run(instrumentation: Instrumentation):
     try:
         cached = load_cached_tokens()
         if not cached:
@@ -26,32 +42,16 @@ def main():
 
         print(json.dumps({"status": "info", "message": "Authentication tokens found", "authenticated": True}))
 
-        client = NotebookLMClient(
+        client = instrumentation.wrap_client(NotebookLMClient(
             cookies=cached.cookies,
             csrf_token=cached.csrf_token,
             session_id=cached.session_id,
-        )
+        ))
 
-        notebooks = client.list_notebooks()
+        with instrumentation.stage("list_notebooks"):
+            notebooks = client.list_notebooks()
         
-        # Convert notebook objects to dictionaries
-        notebook_list = []
-        for nb in notebooks:
-            if hasattr(nb, '__dict__'):
-                # It's an object, convert to dict
-                nb_dict = {
-                    "title": getattr(nb, 'title', 'Untitled'),
-                    "notebook_id": getattr(nb, 'id', None),
-                    "source_count": len(getattr(nb, 'sources', []))
-                }
-            else:
-                # It's already a dict
-                nb_dict = {
-                    "title": nb.get("title", "Untitled"),
-                    "notebook_id": nb.get("notebook_id"),
-                    "source_count": len(nb.get("sources", []))
-                }
-            notebook_list.append(nb_dict)
+        notebook_list = [notebook_record(nb, sources=False) for nb in notebooks]
         
         print(json.dumps({
             "status": "success",
@@ -2,6 +2,12 @@ import sys
 import os
 import json
 import asyncio
+import time
+import queue
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Iterator, Optional
 
 # Add the notebooklm-mcp src directory to path
 mcp_path = os.path.join(os.getcwd(), 'notebooklm-mcp', 'src')
@@ -14,43 +20,544 @@ except ImportError as e:
     print(json.dumps({"status": "error", "error": f"Failed to import NotebookLM modules: {str(e)}"}))
     sys.exit(1)
 
-async def main():
-    if len(sys.argv) < 3:
-        print(json.dumps({"status": "error", "error": "Usage: python bridge.py <notebook_id> <query>"}))
-        return
+from instrumentation import Instrumentation
+from single_flight import SingleFlight, query_key
+from session_pool import SessionPool, build_client
+from resilient_client import ResilientClient
+from priority_scheduler import LANES, PriorityScheduler
+from rate_limiter import RateLimiter
+from deadlines import DeadlineExceeded, RequestCancelled, RequestContext
+from answer_cache import DEFAULT_CACHE_PATH, DEFAULT_TTL_S, AnswerCache
+from rag_router import DEFAULT_COLLECTION, MIN_SIMILARITY, LocalRegulationIndex, QueryRouter
+from quantized_store import DEFAULT_QUANTIZED_DIR
+from exact_search import DEFAULT_EXACT_THRESHOLD
+from diversify import DEFAULT_FETCH_FACTOR, DEFAULT_LAMBDA, DEFAULT_MAX_PER_SOURCE
 
-    notebook_id = sys.argv[1]
-    query = sys.argv[2]
-    
-    try:
-        cached = load_cached_tokens()
-        if not cached:
-            print(json.dumps({"status": "error", "error": "No cached tokens found. Run 'notebooklm-mcp-auth' first."}))
-            return
+# Upstream clients that can stream answers expose query_stream(); others answer in one piece
+STREAMING_UPSTREAM = hasattr(NotebookLMClient, 'query_stream')
+# How often a streaming response re-checks its deadline and cancel flag
+STREAM_POLL_S = 0.1
+_STREAM_END = object()
 
-        client = NotebookLMClient(
-            cookies=cached.cookies,
-            csrf_token=cached.csrf_token,
-            session_id=cached.session_id,
-        )
+def parse_args():
+    import argparse
 
-        result = client.query(
-            notebook_id=notebook_id,
-            query_text=query
-        )
+    parser = argparse.ArgumentParser(description='Query a NotebookLM notebook and print the answer as JSON')
+    parser.add_argument('notebook_id', nargs='?')
+    parser.add_argument('query', nargs='?')
+    parser.add_argument('--serve', action='store_true', help='Run as a long-lived HTTP bridge instead of answering one query')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Host for --serve')
+    parser.add_argument('--port', type=int, default=8766, help='Port for --serve')
+    parser.add_argument('--sessions-dir', type=str, help='Directory of cached credential sets to pool (default: $NOTEBOOKLM_SESSIONS_DIR)')
+    parser.add_argument('--dispatch', choices=['least_loaded', 'round_robin'], default='least_loaded', help='Session pool dispatch strategy')
+    parser.add_argument('--capacity', type=int, default=4, help='Concurrent upstream calls allowed in --serve mode')
+    parser.add_argument('--batch-floor', type=int, default=1, help='Upstream slots always available to batch work when it is queued')
+    parser.add_argument('--interactive-reserve', type=int, default=1, help='Upstream slots batch work may never take')
+    parser.add_argument('--stream', action='store_true', help='Print the answer as newline-delimited JSON chunk events')
+    parser.add_argument('--deadline-ms', type=float, help='Give up and report a timeout if no answer arrives within this budget')
+    parser.add_argument('--upstream-rps', type=float, default=0.0, help='Cap on upstream calls per second across both lanes (0 = unlimited)')
+    parser.add_argument('--local-rag', action='store_true', help='Answer from the local ChromaDB regulation index first, escalating to NotebookLM')
+    parser.add_argument('--chroma-url', type=str, help='ChromaDB server for --local-rag (default: $CHROMADB_PATH or http://localhost:8000)')
+    parser.add_argument('--rag-collection', type=str, default=DEFAULT_COLLECTION, help='Collection holding the indexed regulations')
+    parser.add_argument('--rag-threshold', type=float, default=MIN_SIMILARITY, help='Retrieval confidence below which questions go to NotebookLM')
+    parser.add_argument('--rag-top-k', type=int, default=5, help='Passages retrieved per question')
+    parser.add_argument('--rag-quantized', nargs='?', const=str(DEFAULT_QUANTIZED_DIR), default=None, metavar='DIR',
+                        help=f'Search the quantized copy of the collection written by quantize_collections.py (default dir: {DEFAULT_QUANTIZED_DIR})')
+    parser.add_argument('--rag-rescore', type=int, default=4, help='Quantized candidates re-scored at full precision, as a multiple of --rag-top-k')
+    parser.add_argument('--rag-mmr', type=float, nargs='?', const=DEFAULT_LAMBDA, default=None, metavar='LAMBDA',
+                        help=f'Diversify retrieved passages with maximal marginal relevance (default lambda: {DEFAULT_LAMBDA}; 1 = relevance only)')
+    parser.add_argument('--rag-fetch-factor', type=int, default=DEFAULT_FETCH_FACTOR,
+                        help='With --rag-mmr, candidates retrieved as a multiple of --rag-top-k')
+    parser.add_argument('--rag-max-per-source', type=int, default=DEFAULT_MAX_PER_SOURCE,
+                        help='With --rag-mmr, passages kept per source document (0 = no limit)')
+    parser.add_argument('--rag-exact-threshold', type=int, default=DEFAULT_EXACT_THRESHOLD,
+                        help='Search collections of up to this many vectors exactly in memory instead of through HNSW (0 = never)')
+    parser.add_argument('--answer-cache', nargs='?', const=str(DEFAULT_CACHE_PATH), default=None, metavar='PATH',
+                        help=f'Serve and store answers in a SQLite cache (default path: {DEFAULT_CACHE_PATH})')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL_S, help='Seconds a cached answer stays fresh')
+    parser.add_argument('--request-log', type=str, help='Append one JSON line per answered request (input for warm_answer_cache.py --from-log)')
+    ResilientClient.add_arguments(parser)
+    Instrumentation.add_arguments(parser)
+    return parser.parse_args()
+
+def create_client(args):
+    """Build an authenticated client (a SessionPool when several sessions are provisioned) behind a circuit breaker, or None"""
+    client = build_client(
+        NotebookLMClient,
+        load_cached_tokens,
+        sessions_dir=args.sessions_dir,
+        strategy=args.dispatch
+    )
+    return ResilientClient.from_args(client, args)
+
+def create_scheduler(args) -> PriorityScheduler:
+    """Upstream scheduler with an interactive lane ahead of the batch lane"""
+    rate_limiter = RateLimiter(args.upstream_rps, burst=args.capacity) if args.upstream_rps > 0 else None
+    return PriorityScheduler(
+        capacity=args.capacity,
+        batch_floor=args.batch_floor,
+        interactive_reserve=args.interactive_reserve,
+        rate_limiter=rate_limiter
+    )
+
+def create_router(args) -> Optional[QueryRouter]:
+    """Local-RAG-first router when --local-rag is set"""
+    if not getattr(args, 'local_rag', False):
+        return None
+    index = LocalRegulationIndex(url=args.chroma_url, collection=args.rag_collection,
+                                 quantized_dir=args.rag_quantized, rescore_factor=args.rag_rescore,
+                                 exact_threshold=args.rag_exact_threshold, mmr_lambda=args.rag_mmr,
+                                 fetch_factor=args.rag_fetch_factor, max_per_source=args.rag_max_per_source)
+    return QueryRouter(index, threshold=args.rag_threshold, top_k=args.rag_top_k)
+
+def create_cache(args) -> Optional[AnswerCache]:
+    """Answer cache when --answer-cache is set"""
+    if not getattr(args, 'answer_cache', None):
+        return None
+    return AnswerCache(args.answer_cache, ttl=args.cache_ttl)
+
+class BridgeService:
+    """Answers notebook queries; identical concurrent queries share one upstream call"""
+
+    def __init__(self, client, instrumentation: Instrumentation, scheduler: Optional[PriorityScheduler] = None,
+                 router: Optional[QueryRouter] = None, cache: Optional[AnswerCache] = None,
+                 request_log: Optional[str] = None):
+        self.resilient = client if isinstance(client, ResilientClient) else None
+        upstream = self.resilient.wrapped if self.resilient else client
+        self.pool = upstream if isinstance(upstream, SessionPool) else None
+        self.client = instrumentation.wrap_client(client)
+        self.instrumentation = instrumentation
+        # One-shot mode still runs the call on a worker so the deadline can abandon it
+        self.scheduler = scheduler or PriorityScheduler(capacity=1, batch_floor=0, interactive_reserve=0)
+        self.router = router
+        self.cache = cache
+        self.request_log = request_log
+        self.single_flight = SingleFlight()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.timeouts = 0
+        self.cancelled = 0
+        self.active: Dict[str, RequestContext] = {}
+
+    def _upstream_query(self, notebook_id: str, query: str) -> Dict[str, Any]:
+        with self.instrumentation.stage("query"):
+            result = self.client.query(
+                notebook_id=notebook_id,
+                query_text=query
+            )
 
         if result:
-            print(json.dumps({
+            return {
                 "status": "success",
                 "answer": result.get("answer", ""),
                 "conversation_id": result.get("conversation_id"),
                 "sources": [] # NotebookLM doesn't expose raw source names easily in query result yet
-            }))
+            }
+        return {"status": "error", "error": "Query returned no result."}
+
+    def query(self, notebook_id: str, query: str, priority: str = "interactive",
+              deadline_ms: Optional[float] = None, request_id: Optional[str] = None) -> Dict[str, Any]:
+        """Answer one query from the answer cache, the local index when the router is confident, or NotebookLM"""
+        payload = self._from_cache(notebook_id, query)
+        if payload is None:
+            payload = self._answer(notebook_id, query, priority, deadline_ms, request_id)
+            self._remember(notebook_id, query, payload)
+        self._log_request(notebook_id, query, priority, payload)
+        return payload
+
+    def _from_cache(self, notebook_id: str, query: str) -> Optional[Dict[str, Any]]:
+        cached = self.cache.get(notebook_id, query) if self.cache is not None else None
+        if cached is None:
+            return None
+        return {
+            "status": "success",
+            "answer": cached["answer"],
+            "conversation_id": None,
+            "sources": cached["sources"],
+            "cached": {"origin": cached["origin"], "age_s": cached["age_s"]}
+        }
+
+    def _remember(self, notebook_id: str, query: str, payload: Dict[str, Any]):
+        if self.cache is not None and payload.get("status") == "success" and payload.get("answer"):
+            self.cache.put(notebook_id, query, payload["answer"], payload.get("sources"), origin="bridge")
+
+    def _log_request(self, notebook_id: str, query: str, priority: str, payload: Dict[str, Any]):
+        if not self.request_log:
+            return
+        record = {
+            "ts": datetime.now().isoformat(),
+            "notebook_id": notebook_id,
+            "query": query,
+            "priority": priority,
+            "status": payload.get("status"),
+            "path": "cache" if payload.get("cached") else payload.get("route", {}).get("path", "notebooklm")
+        }
+        with self.lock:
+            with open(self.request_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _answer(self, notebook_id: str, query: str, priority: str,
+                deadline_ms: Optional[float], request_id: Optional[str]) -> Dict[str, Any]:
+        if self.router is None:
+            return self._notebooklm_query(notebook_id, query, priority, deadline_ms, request_id)
+
+        # One deadline and cancel flag across the local attempt and the escalation
+        context = self._open(deadline_ms, request_id)
+        try:
+            start = time.perf_counter()
+            payload, route = self.router.try_local(notebook_id, query, context)
+            if payload is None:
+                payload = self._escalate(notebook_id, query, priority, context)
+            self.router.record(route, time.perf_counter() - start)
+        finally:
+            self._close(context)
+        return {**payload, "route": route}
+
+    def _escalate(self, notebook_id: str, query: str, priority: str, context: RequestContext) -> Dict[str, Any]:
+        """NotebookLM's answer with what is left of the budget, or a timeout if nothing is"""
+        try:
+            context.check()
+        except Exception as e:
+            return self._failure(e)
+        return self._notebooklm_query(notebook_id, query, priority, context=context)
+
+    def _notebooklm_query(self, notebook_id: str, query: str, priority: str = "interactive",
+                          deadline_ms: Optional[float] = None, request_id: Optional[str] = None,
+                          context: Optional[RequestContext] = None) -> Dict[str, Any]:
+        """Answer one query from NotebookLM, joining an identical in-flight upstream call if there is one
+
+        Past deadline_ms (or after cancel(request_id)) the caller stops waiting and gets a
+        "timeout" (or "cancelled") status; the upstream call is dropped if nobody else is
+        waiting on it and it has not started yet.
+        """
+        if priority not in LANES:
+            return {"status": "error", "error": f"Unknown priority '{priority}'; expected one of {', '.join(LANES)}"}
+
+        # A context passed in belongs to the caller, which closes it
+        owned = context is None
+        context = context or self._open(deadline_ms, request_id)
+
+        # Lanes coalesce separately so chat never waits on a queued batch leader
+        key = (priority, *query_key(notebook_id, query))
+        future, shared = self.single_flight.join(
+            key,
+            lambda: self.scheduler.submit(priority, lambda: self._upstream_query(notebook_id, query))
+        )
+        try:
+            payload = context.result(future)
+        except Exception as e:
+            return self._failure(e)
+        finally:
+            self.single_flight.leave(key, future)
+            if owned:
+                self._close(context)
+
+        if shared:
+            self.instrumentation.increment("coalesced_queries")
+            return {**payload, "coalesced": True}
+        return payload
+
+    def stream(self, notebook_id: str, query: str, priority: str = "interactive",
+               deadline_ms: Optional[float] = None, request_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Answer as "chunk" events followed by one "done" event carrying status and metadata
+
+        Cached and local answers, and answers from a non-streaming upstream, arrive as one
+        chunk, sent as soon as they are ready (coalescing still applies). Streamed answers
+        are not coalesced.
+        """
+        cached = self._from_cache(notebook_id, query)
+        events = self._payload_events(cached) if cached else self._answer_stream(notebook_id, query, priority, deadline_ms, request_id)
+        answer = []
+        for event in events:
+            if event["event"] == "chunk":
+                answer.append(event["text"])
+            elif cached is None:
+                self._remember(notebook_id, query, {**event, "answer": ''.join(answer)})
+            if event["event"] == "done":
+                self._log_request(notebook_id, query, priority, cached or event)
+            yield event
+
+    def _answer_stream(self, notebook_id: str, query: str, priority: str,
+                       deadline_ms: Optional[float], request_id: Optional[str]) -> Iterator[Dict[str, Any]]:
+        if self.router is None:
+            yield from self._notebooklm_stream(notebook_id, query, priority, deadline_ms, request_id)
+            return
+
+        context = self._open(deadline_ms, request_id)
+        try:
+            start = time.perf_counter()
+            payload, route = self.router.try_local(notebook_id, query, context)
+            if payload is not None:
+                events = self._payload_events(payload)
+            else:
+                try:
+                    context.check()
+                except Exception as e:
+                    events = self._payload_events(self._failure(e))
+                else:
+                    events = self._notebooklm_stream(notebook_id, query, priority, context=context)
+            for event in events:
+                if event["event"] == "done":
+                    self.router.record(route, time.perf_counter() - start)
+                    event = {**event, "route": route}
+                yield event
+        finally:
+            self._close(context)
+
+    @staticmethod
+    def _payload_events(payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        if payload.get("answer"):
+            yield {"event": "chunk", "text": payload["answer"]}
+        yield {"event": "done", **{k: v for k, v in payload.items() if k != "answer"}}
+
+    def _notebooklm_stream(self, notebook_id: str, query: str, priority: str,
+                           deadline_ms: Optional[float] = None, request_id: Optional[str] = None,
+                           context: Optional[RequestContext] = None) -> Iterator[Dict[str, Any]]:
+        if not STREAMING_UPSTREAM or priority not in LANES:
+            yield from self._payload_events(self._notebooklm_query(notebook_id, query, priority, deadline_ms, request_id, context))
+            return
+
+        owned = context is None
+        context = context or self._open(deadline_ms, request_id)
+        chunks: "queue.Queue[Any]" = queue.Queue()
+
+        def produce():
+            with self.instrumentation.stage("query_stream"):
+                for text in self.client.query_stream(notebook_id=notebook_id, query_text=query):
+                    # Raising, not returning, so a cut-short answer never ends as a success
+                    context.check()
+                    chunks.put(text)
+
+        future = self.scheduler.submit(priority, produce)
+        future.add_done_callback(lambda _: chunks.put(_STREAM_END))
+        try:
+            while True:
+                try:
+                    item = chunks.get(timeout=min(STREAM_POLL_S, context.remaining() or STREAM_POLL_S))
+                except queue.Empty:
+                    context.check()
+                    continue
+                if item is _STREAM_END:
+                    future.result()
+                    break
+                yield {"event": "chunk", "text": item}
+        except GeneratorExit:
+            # The reader went away mid-stream
+            context.cancel()
+            future.cancel()
+            raise
+        except Exception as e:
+            # Still queued: drop it; already streaming: produce() stops at its next chunk
+            future.cancel()
+            yield {"event": "done", **self._failure(e)}
+            return
+        finally:
+            if owned:
+                self._close(context)
+
+        yield {"event": "done", "status": "success", "conversation_id": None, "sources": []}
+
+    def _open(self, deadline_ms: Optional[float], request_id: Optional[str]) -> RequestContext:
+        context = RequestContext(deadline_ms, request_id)
+        with self.lock:
+            self.requests += 1
+            if request_id:
+                self.active[request_id] = context
+        return context
+
+    def _close(self, context: RequestContext):
+        if context.request_id:
+            with self.lock:
+                self.active.pop(context.request_id, None)
+
+    def _failure(self, error: Exception) -> Dict[str, Any]:
+        """Response payload for a request that did not get an answer"""
+        if isinstance(error, DeadlineExceeded):
+            with self.lock:
+                self.timeouts += 1
+            return {"status": "timeout", "error": str(error)}
+        if isinstance(error, RequestCancelled):
+            with self.lock:
+                self.cancelled += 1
+            return {"status": "cancelled", "error": str(error)}
+        return {"status": "error", "error": str(error)}
+
+    def cancel(self, request_id: str) -> bool:
+        """Cancel an outstanding request by id; False if it is unknown or already finished"""
+        with self.lock:
+            context = self.active.get(request_id)
+        if context is None:
+            return False
+        context.cancel()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            requests, timeouts, cancelled = self.requests, self.timeouts, self.cancelled
+        stats = {
+            "status": "success",
+            "requests": requests,
+            "timeouts": timeouts,
+            "cancelled": cancelled,
+            "single_flight": self.single_flight.snapshot()
+        }
+        if self.pool is not None:
+            stats["session_pool"] = self.pool.stats()
+        if self.resilient is not None:
+            stats["resilience"] = self.resilient.stats()
+        if self.router is not None:
+            stats["router"] = self.router.stats()
+        if self.cache is not None:
+            stats["answer_cache"] = self.cache.stats()
+        stats["scheduler"] = self.scheduler.stats()
+        return stats
+
+class BridgeHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Batch jobs open many connections at once; the default backlog of 5 resets them
+    request_queue_size = 128
+
+def make_handler(service: BridgeService):
+    """HTTP handler bound to one bridge service"""
+
+    class BridgeHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload: Dict[str, Any]):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_stream(self, events: Iterator[Dict[str, Any]]):
+            """Write events as newline-delimited JSON using chunked transfer encoding"""
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for event in events:
+                    line = (json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8')
+                    self.wfile.write(f"{len(line):x}\r\n".encode('ascii') + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                events.close()
+                self.close_connection = True
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._send(200, service.stats())
+            elif self.path == '/health':
+                self._send(200, {"status": "success"})
+            else:
+                self._send(404, {"status": "error", "error": f"Unknown path: {self.path}"})
+
+        def do_POST(self):
+            if self.path not in ('/query', '/cancel'):
+                self._send(404, {"status": "error", "error": f"Unknown path: {self.path}"})
+                return
+
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError as e:
+                self._send(400, {"status": "error", "error": f"Invalid JSON body: {str(e)}"})
+                return
+
+            if self.path == '/cancel':
+                request_id = body.get('request_id')
+                if not request_id:
+                    self._send(400, {"status": "error", "error": "request_id is required"})
+                    return
+                self._send(200, {"status": "success", "cancelled": service.cancel(request_id)})
+                return
+
+            notebook_id = body.get('notebook_id') or body.get('notebookId')
+            query = body.get('query')
+            if not notebook_id or not query:
+                self._send(400, {"status": "error", "error": "notebook_id and query are required"})
+                return
+
+            try:
+                deadline_ms = float(body.get('deadline_ms') or self.headers.get('X-Deadline-Ms') or 0) or None
+            except ValueError:
+                self._send(400, {"status": "error", "error": "deadline_ms must be a number"})
+                return
+
+            request = dict(
+                notebook_id=notebook_id,
+                query=query,
+                priority=body.get('priority') or 'interactive',
+                deadline_ms=deadline_ms,
+                request_id=body.get('request_id')
+            )
+            if body.get('stream'):
+                self._send_stream(service.stream(**request))
+                return
+
+            payload = service.query(**request)
+            self._send(504 if payload['status'] == 'timeout' else 200, payload)
+
+    return BridgeHandler
+
+def serve(args, instrumentation: Instrumentation):
+    """Run the bridge as a threaded HTTP server"""
+    client = create_client(args)
+    if client is None:
+        print(json.dumps({"status": "error", "error": "No cached tokens found. Run 'notebooklm-mcp-auth' first."}))
+        sys.exit(1)
+
+    service = BridgeService(client, instrumentation, scheduler=create_scheduler(args), router=create_router(args),
+                            cache=create_cache(args), request_log=args.request_log)
+    server = BridgeHTTPServer((args.host, args.port), make_handler(service))
+    print(json.dumps({"status": "info", "message": f"NotebookLM bridge listening on http://{args.host}:{args.port}"}))
+    sys.stdout.flush()
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.scheduler.stop()
+
+async def main(args, instrumentation: Instrumentation):
+    if not args.notebook_id or not args.query:
+        print(json.dumps({"status": "error", "error": "Usage: python bridge.py <notebook_id> <query>"}))
+        return
+
+    try:
+        client = create_client(args)
+        if client is None:
+            print(json.dumps({"status": "error", "error": "No cached tokens found. Run 'notebooklm-mcp-auth' first."}))
+            return
+
+        service = BridgeService(client, instrumentation, router=create_router(args),
+                                cache=create_cache(args), request_log=args.request_log)
+        if args.stream:
+            for event in service.stream(args.notebook_id, args.query, deadline_ms=args.deadline_ms):
+                print(json.dumps(event))
+                sys.stdout.flush()
         else:
-            print(json.dumps({"status": "error", "error": "Query returned no result."}))
+            print(json.dumps(service.query(args.notebook_id, args.query, deadline_ms=args.deadline_ms)))
 
     except Exception as e:
         print(json.dumps({"status": "error", "error": str(e)}))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    instrumentation = Instrumentation.from_args(args, script="notebooklm_bridge")
+    try:
+        if args.serve:
+            serve(args, instrumentation)
+        else:
+            asyncio.run(main(args, instrumentation))
+    finally:
+        instrumentation.finish()
@@ -0,0 +1,151 @@
+"""
+Local PDF ingestion for the IA regulation index
+Parses a directory holding the notebooks' source PDFs in a process pool and
+returns documents shaped like index_ia_regulations.extract_regulatory_content
+output, so indexing the full corpus is bound by local CPU instead of one
+NotebookLM query per source. Files are matched to notebook sources by title
+("Capital Requirements.pdf"), which keeps document ids identical across modes.
+
+Requires pypdf (pip install pypdf); scanned PDFs without a text layer are skipped.
+"""
+
+import os
+import re
+import hashlib
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+
+def require_pypdf():
+    """Fail early, in the parent process, when pypdf is missing"""
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        raise ImportError("Local PDF ingestion needs pypdf: pip install pypdf")
+
+
+def clean_page_text(text: str) -> str:
+    """Strip layout noise while keeping blank lines as paragraph breaks"""
+    text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)  # Words hyphenated across lines
+    lines = [re.sub(r'[ \t]+', ' ', line).strip() for line in text.splitlines()]
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(lines)).strip()
+
+
+def _outline(reader, items=None, depth: int = 0) -> List[Dict[str, Any]]:
+    """Flattened bookmark tree as {title, page, level}"""
+    sections = []
+    for item in reader.outline if items is None else items:
+        if isinstance(item, list):
+            sections.extend(_outline(reader, item, depth + 1))
+            continue
+        try:
+            sections.append({"title": item.title, "page": reader.get_destination_page_number(item) + 1, "level": depth})
+        except Exception:
+            continue
+    return sections
+
+
+def parse_pdf(path: str) -> Dict[str, Any]:
+    """Page texts, bookmarks and title of one PDF (runs in a worker process)"""
+    try:
+        from pypdf import PdfReader
+
+        reader = PdfReader(path)
+        pages = [clean_page_text(page.extract_text() or '') for page in reader.pages]
+        try:
+            sections = _outline(reader)
+        except Exception:
+            sections = []
+        metadata_title = reader.metadata.title if reader.metadata else None
+        return {"path": path, "pages": pages, "sections": sections, "title": metadata_title}
+    except Exception as e:
+        return {"path": path, "error": str(e)}
+
+
+def _source_key(title: str) -> str:
+    name = Path(title).name.lower()
+    return name[:-4] if name.endswith('.pdf') else name
+
+
+def source_index(notebooks: List[Dict[str, Any]]) -> Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Map normalized source titles to their (notebook, source)"""
+    index = {}
+    for notebook in notebooks:
+        for source in notebook.get('sources') or []:
+            if isinstance(source, dict) and source.get('title'):
+                index.setdefault(_source_key(source['title']), (notebook, source))
+    return index
+
+
+def build_document(parsed: Dict[str, Any], relative_path: str,
+                   match: Optional[Tuple[Dict[str, Any], Dict[str, Any]]]) -> Dict[str, Any]:
+    """Document record for one parsed PDF; pages are joined by blank lines so chunking never spans a page"""
+    page_offsets = []
+    offset = 0
+    for text in parsed['pages']:
+        page_offsets.append(offset)
+        offset += len(text) + 2
+    content = '\n\n'.join(parsed['pages'])
+
+    metadata = {}
+    doc_id = f"local_{hashlib.sha1(relative_path.encode('utf-8')).hexdigest()[:16]}"
+    title = Path(relative_path).name
+    if match:
+        notebook, source = match
+        source_id = source.get('source_id') or source.get('id')
+        title = source['title']
+        metadata = {
+            'notebook_id': notebook.get('notebook_id'),
+            'notebook_title': notebook.get('title'),
+            'source_id': source_id,
+            'date_added': source.get('created_at'),
+        }
+        if notebook.get('notebook_id') and source_id:
+            doc_id = f"{notebook['notebook_id']}_{source_id}"
+        metadata = {k: v for k, v in metadata.items() if v is not None}
+
+    metadata.update({
+        'source_type': 'IA Regulation',
+        'file': relative_path,
+        'page_count': len(parsed['pages']),
+    })
+    if parsed.get('title'):
+        metadata['pdf_title'] = parsed['title']
+    return {
+        'id': doc_id,
+        'title': title,
+        'content': content,
+        'metadata': metadata,
+        'structure': {'page_offsets': page_offsets, 'sections': parsed['sections']}
+    }
+
+
+def load_pdf_documents(pdf_dir: str, notebooks: List[Dict[str, Any]],
+                       workers: Optional[int] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, str]]]:
+    """Parse every PDF under pdf_dir; returns (documents, failures) in path order"""
+    require_pypdf()
+    root = Path(pdf_dir)
+    paths = sorted(str(p) for p in root.rglob('*') if p.suffix.lower() == '.pdf')
+    sources = source_index(notebooks)
+
+    documents, failures = [], []
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for parsed in executor.map(parse_pdf, paths, chunksize=max(1, len(paths) // (workers * 4))):
+            relative_path = str(Path(parsed['path']).relative_to(root))
+            if 'error' in parsed:
+                failures.append({'file': relative_path, 'error': parsed['error']})
+                print(f"✗ Failed to parse {relative_path}: {parsed['error']}")
+                continue
+            if not any(parsed['pages']):
+                failures.append({'file': relative_path, 'error': 'no text layer'})
+                print(f"✗ No extractable text in {relative_path} (scanned PDF?)")
+                continue
+
+            document = build_document(parsed, relative_path, sources.get(_source_key(relative_path)))
+            documents.append(document)
+            matched = '' if 'source_id' in document['metadata'] else ' (no matching notebook source)'
+            print(f"✓ Parsed: {relative_path} ({document['metadata']['page_count']} pages){matched}")
+
+    return documents, failures
@@ -0,0 +1,117 @@
+"""
+Priority lanes for upstream NotebookLM calls
+Interactive work is always dispatched ahead of queued batch work; batch work
+only uses leftover capacity, except for a guaranteed floor of slots so nightly
+jobs still make progress under sustained chat traffic.
+"""
+
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from instrumentation import LatencyHistogram
+from rate_limiter import RateLimiter
+
+LANES = ('interactive', 'batch')
+
+
+class PriorityScheduler:
+    """Fixed pool of upstream slots shared by an interactive and a batch lane"""
+
+    def __init__(self, capacity: int = 4, batch_floor: int = 1, interactive_reserve: int = 1,
+                 rate_limiter: Optional[RateLimiter] = None):
+        self.capacity = max(1, capacity)
+        self.batch_floor = min(max(0, batch_floor), self.capacity)
+        # Batch may fill every slot but the reserved ones, and never fewer than its floor
+        self.batch_ceiling = max(self.batch_floor, self.capacity - max(0, interactive_reserve))
+        self.rate_limiter = rate_limiter
+        self.cond = threading.Condition()
+        self.queues: Dict[str, Deque[Tuple[Future, Callable[[], Any], float]]] = {lane: deque() for lane in LANES}
+        self.running: Dict[str, int] = {lane: 0 for lane in LANES}
+        self.completed: Dict[str, int] = {lane: 0 for lane in LANES}
+        self.dropped: Dict[str, int] = {lane: 0 for lane in LANES}
+        self.queue_wait: Dict[str, LatencyHistogram] = {lane: LatencyHistogram() for lane in LANES}
+        self._stopped = False
+        self.workers = [threading.Thread(target=self._work, name=f"upstream-{i}", daemon=True) for i in range(self.capacity)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, lane: str, fn: Callable[[], Any]) -> Future:
+        """Queue fn on a lane; the returned future resolves with its result"""
+        if lane not in self.queues:
+            raise ValueError(f"Unknown lane '{lane}'; expected one of {', '.join(LANES)}")
+
+        future: Future = Future()
+        with self.cond:
+            self.queues[lane].append((future, fn, time.monotonic()))
+            self.cond.notify()
+        return future
+
+    def _pick(self) -> Optional[str]:
+        """Lane to dispatch from next, or None if nothing may run now (called with cond held)"""
+        batch_waiting = bool(self.queues['batch'])
+        if batch_waiting and self.running['batch'] < self.batch_floor:
+            return 'batch'
+        if self.queues['interactive']:
+            return 'interactive'
+        if batch_waiting and self.running['batch'] < self.batch_ceiling:
+            return 'batch'
+        return None
+
+    def _work(self):
+        while True:
+            with self.cond:
+                lane = self._pick()
+                while lane is None and not self._stopped:
+                    self.cond.wait()
+                    lane = self._pick()
+                if self._stopped:
+                    return
+                future, fn, queued_at = self.queues[lane].popleft()
+                self.running[lane] += 1
+                self.queue_wait[lane].observe(time.monotonic() - queued_at)
+
+            dropped = False
+            try:
+                # Cancelled while queued (every waiter gave up): drop without spending upstream quota
+                dropped = not future.set_running_or_notify_cancel()
+                if not dropped:
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.acquire()
+                    try:
+                        future.set_result(fn())
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self.cond:
+                    self.running[lane] -= 1
+                    if dropped:
+                        self.dropped[lane] += 1
+                    else:
+                        self.completed[lane] += 1
+                    self.cond.notify_all()
+
+    def stop(self):
+        with self.cond:
+            self._stopped = True
+            self.cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.cond:
+            return {
+                "capacity": self.capacity,
+                "batch_floor": self.batch_floor,
+                "batch_ceiling": self.batch_ceiling,
+                "lanes": {
+                    lane: {
+                        "queued": len(self.queues[lane]),
+                        "running": self.running[lane],
+                        "completed": self.completed[lane],
+                        "dropped": self.dropped[lane],
+                        "queue_wait": self.queue_wait[lane].to_dict()
+                    }
+                    for lane in LANES
+                }
+            }
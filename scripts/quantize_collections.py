@@ -0,0 +1,174 @@
+"""
+Build quantized copies of selected ChromaDB collections and report their recall
+Exports each collection's embeddings from the running ChromaDB server, encodes
+them (see quantized_store.py) and saves them under chromadb_data/quantized/,
+where the bridge's --rag-quantized search picks them up. --report measures,
+on the collection's own vectors, how much of the exact top-k (exact_search.py)
+each setting recovers with and without full-precision re-scoring, its search
+latency, and the size of its codes. The codes are held in addition to
+ChromaDB's float32 index, not instead of it. The collection's live HNSW index is
+measured the same way.
+
+    python scripts/quantize_collections.py --collections ia_regulations --mode int8
+    python scripts/quantize_collections.py --collections ia_regulations --report --k 10 --rescore 4
+"""
+
+import sys
+import json
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+from datetime import datetime
+from typing import List, Dict, Any, Tuple
+
+from quantized_store import DEFAULT_QUANTIZED_DIR, MODES, QuantizedCollection, require_numpy
+from exact_search import ExactIndex, collection_space, fetch_all, recall_at_k
+from rag_router import DEFAULT_CHROMA_URL, DEFAULT_COLLECTION
+
+FETCH_PAGE = 5000
+REPORT_PQ_M = (8, 16, 32, 64)
+
+
+def fetch_collection(url: str, name: str) -> Tuple[Any, List[str], Any, List[Dict[str, Any]]]:
+    """The collection and all its ids, embeddings and metadatas, paged"""
+    import chromadb
+    import numpy as np
+
+    parsed = urlparse(url)
+    client = chromadb.HttpClient(host=parsed.hostname or 'localhost', port=parsed.port or 8000)
+    collection = client.get_collection(name)
+    records = fetch_all(collection, FETCH_PAGE)
+    return (collection, records['ids'], np.asarray(records['embeddings'], dtype=np.float32),
+            [m or {} for m in records['metadatas']])
+
+
+def _sample(n: int, queries: int, seed: int):
+    import numpy as np
+    return np.random.default_rng(seed).choice(n, min(queries, n), replace=False)
+
+
+def exact_neighbours(oracle: ExactIndex, sample, k: int) -> Dict[int, List[int]]:
+    """True top-k rows for each sampled row, the row itself excluded"""
+    positions, _ = oracle.top_k(oracle.matrix[sample], k + 1)
+    return {int(q): [int(p) for p in rows if p != q][:k] for q, rows in zip(sample, positions)}
+
+
+def evaluate_hnsw(collection, ids: List[str], embeddings, k: int, queries: int, seed: int = 0) -> Dict[str, Any]:
+    """Recall@k of the collection's HNSW index against exact search in the collection's own space"""
+    oracle = ExactIndex(ids, embeddings, space=collection_space(collection))
+    sample = _sample(len(ids), queries, seed)
+    k = min(k, len(ids) - 1)
+    truth = exact_neighbours(oracle, sample, k)
+
+    start = time.perf_counter()
+    results = collection.query(query_embeddings=embeddings[sample], n_results=k + 1, include=['distances'])
+    search_s = time.perf_counter() - start
+    found = [[i for i in row if i != ids[q]][:k] for q, row in zip(sample, results['ids'])]
+    return {
+        "mode": f"hnsw ({oracle.space})",
+        f"recall@{k}": round(recall_at_k([[ids[p] for p in truth[int(q)]] for q in sample], found), 4),
+        "search_ms": round(search_s / len(sample) * 1000, 3),
+        "float32_bytes": oracle.nbytes
+    }
+
+
+def evaluate(name: str, ids: List[str], embeddings, k: int, rescore: int, queries: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Recall@k of each quantization setting against exact cosine search, using stored vectors as queries"""
+    import numpy as np
+
+    oracle = ExactIndex(ids, embeddings, space='cosine')
+    vectors = oracle.matrix
+    sample = _sample(len(vectors), queries, seed)
+    k = min(k, len(vectors) - 1)
+
+    def top(scores, limit, exclude):
+        scores = scores.copy()
+        scores[exclude] = -np.inf  # The query's own vector is not a result
+        return np.argpartition(-scores, limit - 1)[:limit]
+
+    exact = {q: set(rows) for q, rows in exact_neighbours(oracle, sample, k).items()}
+    settings = [('int8', None)] + [('pq', m) for m in REPORT_PQ_M if vectors.shape[1] % m == 0]
+
+    rows = []
+    for mode, pq_m in settings:
+        start = time.perf_counter()
+        quantized = QuantizedCollection.build(name, ids, vectors, mode=mode, pq_m=pq_m or 16)
+        build_s = time.perf_counter() - start
+        approx_hits = rescored_hits = 0
+        search_s = 0.0
+        for q in sample:
+            q = int(q)
+            start = time.perf_counter()
+            scores = quantized.quantizer.scores(vectors[q], quantized.codes)
+            candidates = top(scores, min(k * rescore, len(vectors) - 1), q)
+            refined = candidates[np.argsort(-(vectors[candidates] @ vectors[q]))[:k]]
+            search_s += time.perf_counter() - start
+            approx_hits += len(exact[q] & set(candidates[np.argsort(-scores[candidates])[:k]].tolist()))
+            rescored_hits += len(exact[q] & set(refined.tolist()))
+
+        total = k * len(sample)
+        rows.append({
+            "mode": mode if pq_m is None else f"pq{pq_m}",
+            f"recall@{k}": round(approx_hits / total, 4),
+            f"recall@{k}_rescored": round(rescored_hits / total, 4),
+            "build_s": round(build_s, 3),
+            "search_ms": round(search_s / len(sample) * 1000, 3),
+            **quantized.memory()
+        })
+    return rows
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Quantize ChromaDB collections and report their recall')
+    parser.add_argument('--chroma-url', type=str, default=DEFAULT_CHROMA_URL, help='ChromaDB server')
+    parser.add_argument('--collections', nargs='+', default=[DEFAULT_COLLECTION], help='Collections to quantize')
+    parser.add_argument('--mode', choices=MODES, default='int8', help='int8 scalar codes or product quantization')
+    parser.add_argument('--pq-m', type=int, default=16, help='Sub-vectors per embedding for --mode pq (bytes per vector)')
+    parser.add_argument('--out-dir', type=str, default=str(DEFAULT_QUANTIZED_DIR), help='Where quantized copies are written')
+    parser.add_argument('--report', action='store_true', help='Measure recall, latency and code size of every setting instead of building')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours compared for recall')
+    parser.add_argument('--rescore', type=int, default=4, help='Candidates re-scored at full precision, as a multiple of k')
+    parser.add_argument('--queries', type=int, default=200, help='Stored vectors used as queries for --report')
+    parser.add_argument('--output', type=str, help='Also write the report JSON to this file')
+    args = parser.parse_args()
+
+    try:
+        require_numpy()
+        import chromadb  # noqa: F401
+    except ImportError as e:
+        print(json.dumps({"status": "error", "error": f"{str(e)} (quantization needs numpy and chromadb)"}))
+        sys.exit(1)
+
+    report = {"generated_at": datetime.now().isoformat(), "k": args.k, "rescore": args.rescore, "collections": {}}
+    for name in args.collections:
+        try:
+            collection, ids, embeddings, metadatas = fetch_collection(args.chroma_url, name)
+        except Exception as e:
+            print(json.dumps({"status": "error", "error": f"Failed to read collection {name}: {str(e)}"}))
+            continue
+        if len(ids) < 2:
+            print(json.dumps({"status": "info", "message": f"Skipping {name}: {len(ids)} vectors"}))
+            continue
+
+        if args.report:
+            report["collections"][name] = ([evaluate_hnsw(collection, ids, embeddings, args.k, args.queries)] +
+                                           evaluate(name, ids, embeddings, args.k, args.rescore, args.queries))
+            print(json.dumps({"status": "success", "collection": name, "settings": report["collections"][name]}))
+            continue
+
+        quantized = QuantizedCollection.build(name, ids, embeddings, metadatas, mode=args.mode, pq_m=args.pq_m)
+        path = quantized.save(args.out_dir)
+        report["collections"][name] = {"path": str(path), **quantized.memory()}
+        print(json.dumps({"status": "success", "message": f"Saved quantized {name} to {path}", **quantized.memory()}))
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps({"status": "complete", "message": "Quantization complete", "collections": list(report["collections"])}))
+
+
+if __name__ == "__main__":
+    main()
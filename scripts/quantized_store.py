@@ -0,0 +1,247 @@
+"""
+Quantized copies of ChromaDB collections
+For the collections built with quantize_collections.py, a compact copy of the
+embeddings is written next to the ChromaDB store. It holds int8 scalar codes
+(4x smaller than float32) or product-quantized codes (4*d/m times smaller), plus
+each vector's notebook_id. Searches scan the codes, then re-score the best
+candidates with their full-precision embeddings fetched by id.
+
+The copy does not save memory. run-chroma.py keeps each collection's float32
+HNSW index resident either way, and the codes are loaded on top of it. Use it
+as an alternative search path, tuned for recall and latency with the re-score
+factor, not to shrink the server.
+
+Requires numpy.
+"""
+
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_QUANTIZED_DIR = Path("chromadb_data/quantized")
+MODES = ('int8', 'pq')
+# Rows scored per step, so temporary float32 buffers stay small next to the codes
+BLOCK_ROWS = 65536
+PQ_CENTROIDS = 256
+PQ_TRAIN_SAMPLE = 50000
+
+
+def require_numpy():
+    if np is None:
+        raise ImportError("Quantized collections need numpy: pip install numpy")
+
+
+def normalize(vectors):
+    """Unit-length rows, so inner products are cosine similarities (the collections use hnsw:space=cosine)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _nearest(vectors, centroids):
+    """Index of the closest centroid for each row"""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    out = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        block = vectors[start:start + BLOCK_ROWS]
+        out[start:start + BLOCK_ROWS] = np.argmin(centroid_norms - 2 * block @ centroids.T, axis=1)
+    return out
+
+
+def _kmeans(vectors, k: int, iterations: int, rng):
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(vectors, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        filled = counts > 0
+        # Empty clusters keep their previous centroid
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+class ScalarQuantizer:
+    """Per-dimension symmetric int8 codes"""
+
+    kind = 'int8'
+
+    def __init__(self, scale=None):
+        self.scale = scale
+
+    def fit(self, vectors) -> "ScalarQuantizer":
+        self.scale = (np.maximum(np.abs(vectors).max(axis=0), 1e-12) / 127.0).astype(np.float32)
+        return self
+
+    def encode(self, vectors):
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def scores(self, query, codes):
+        """Approximate inner products of a unit query with every encoded row"""
+        weighted = (query * self.scale).astype(np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            out[start:start + BLOCK_ROWS] = codes[start:start + BLOCK_ROWS].astype(np.float32) @ weighted
+        return out
+
+    def state(self) -> Dict[str, Any]:
+        return {"scale": self.scale}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "ScalarQuantizer":
+        return cls(scale=state["scale"])
+
+    def nbytes(self) -> int:
+        return int(self.scale.nbytes)
+
+
+class ProductQuantizer:
+    """Vectors split into m sub-vectors, each stored as the index of its nearest k-means centroid"""
+
+    kind = 'pq'
+
+    def __init__(self, m: int = 16, iterations: int = 20, seed: int = 0, centroids=None):
+        self.m = m
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = centroids  # (m, centroids, dim / m)
+
+    def fit(self, vectors) -> "ProductQuantizer":
+        n, dim = vectors.shape
+        if dim % self.m:
+            raise ValueError(f"Dimension {dim} is not divisible into {self.m} sub-vectors")
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[rng.choice(n, min(n, PQ_TRAIN_SAMPLE), replace=False)]
+        k = min(PQ_CENTROIDS, len(sample))
+        width = dim // self.m
+        self.centroids = np.stack([
+            _kmeans(sample[:, i * width:(i + 1) * width], k, self.iterations, rng) for i in range(self.m)
+        ]).astype(np.float32)
+        return self
+
+    def encode(self, vectors):
+        width = self.centroids.shape[2]
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for i in range(self.m):
+            codes[:, i] = _nearest(vectors[:, i * width:(i + 1) * width], self.centroids[i])
+        return codes
+
+    def scores(self, query, codes):
+        """Asymmetric distance computation: per-sub-vector lookup tables summed over the codes"""
+        table = np.einsum('mkw,mw->mk', self.centroids, query.reshape(self.m, -1).astype(np.float32))
+        columns = np.arange(self.m)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_ROWS):
+            out[start:start + BLOCK_ROWS] = table[columns, codes[start:start + BLOCK_ROWS]].sum(axis=1)
+        return out
+
+    def state(self) -> Dict[str, Any]:
+        return {"centroids": self.centroids}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "ProductQuantizer":
+        return cls(m=state["centroids"].shape[0], centroids=state["centroids"])
+
+    def nbytes(self) -> int:
+        return int(self.centroids.nbytes)
+
+
+def make_quantizer(mode: str, pq_m: int = 16):
+    require_numpy()
+    if mode == 'int8':
+        return ScalarQuantizer()
+    if mode == 'pq':
+        return ProductQuantizer(m=pq_m)
+    raise ValueError(f"Unknown quantization mode: {mode} (expected one of {', '.join(MODES)})")
+
+
+def rescore(query, ids: Sequence[str], embeddings, limit: int) -> List[Tuple[str, float]]:
+    """Exact cosine similarity of candidates, best `limit` first"""
+    if not len(ids):
+        return []
+    similarities = normalize(embeddings) @ normalize(query)
+    order = np.argsort(-similarities, kind='stable')[:limit]
+    return [(ids[i], float(similarities[i])) for i in order]
+
+
+class QuantizedCollection:
+    """Codes, ids and notebook ids of one collection, searchable without the float32 embeddings"""
+
+    def __init__(self, name: str, quantizer, ids: List[str], notebook_ids, codes, dimension: int,
+                 built_at: Optional[float] = None):
+        self.name = name
+        self.quantizer = quantizer
+        self.ids = ids
+        self.notebook_ids = notebook_ids
+        self.codes = codes
+        self.dimension = dimension
+        self.built_at = built_at or time.time()
+
+    @classmethod
+    def build(cls, name: str, ids: List[str], embeddings, metadatas: Optional[List[Dict[str, Any]]] = None,
+              mode: str = 'int8', pq_m: int = 16) -> "QuantizedCollection":
+        quantizer = make_quantizer(mode, pq_m)
+        vectors = normalize(embeddings)
+        quantizer.fit(vectors)
+        notebook_ids = np.array([(m or {}).get('notebook_id') or '' for m in (metadatas or [{}] * len(ids))])
+        return cls(name, quantizer, list(ids), notebook_ids, quantizer.encode(vectors), vectors.shape[1])
+
+    @staticmethod
+    def path_for(directory, name: str) -> Path:
+        return Path(directory) / f"{name}.npz"
+
+    def save(self, directory) -> Path:
+        path = self.path_for(directory, self.name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        state = {f"q_{key}": value for key, value in self.quantizer.state().items()}
+        np.savez(path, kind=np.array(self.quantizer.kind), ids=np.array(self.ids), notebook_ids=self.notebook_ids,
+                 codes=self.codes, dimension=np.array(self.dimension), built_at=np.array(self.built_at), **state)
+        return path
+
+    @classmethod
+    def load(cls, directory, name: str) -> Optional["QuantizedCollection"]:
+        """The saved copy of a collection, or None if there is none"""
+        require_numpy()
+        path = cls.path_for(directory, name)
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            state = {key[2:]: data[key] for key in data.files if key.startswith('q_')}
+            kind = str(data['kind'])
+            quantizer = (ScalarQuantizer if kind == 'int8' else ProductQuantizer).from_state(state)
+            return cls(name, quantizer, data['ids'].tolist(), data['notebook_ids'], data['codes'],
+                       int(data['dimension']), float(data['built_at']))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def candidates(self, query, limit: int, notebook_id: Optional[str] = None) -> List[str]:
+        """Ids of the `limit` best rows by approximate score, optionally within one notebook"""
+        scores = self.quantizer.scores(normalize(query), self.codes)
+        if notebook_id is not None:
+            scores = np.where(self.notebook_ids == notebook_id, scores, -np.inf)
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [self.ids[i] for i in top if np.isfinite(scores[i])]
+
+    def memory(self) -> Dict[str, Any]:
+        """Bytes held by the codes, next to the float32 size of the same embeddings (which ChromaDB still holds)"""
+        float32_bytes = len(self.ids) * self.dimension * 4
+        code_bytes = int(self.codes.nbytes) + self.quantizer.nbytes()
+        return {
+            "kind": self.quantizer.kind,
+            "vectors": len(self.ids),
+            "dimension": self.dimension,
+            "code_bytes_per_vector": int(self.codes.shape[1]),
+            "code_bytes": code_bytes,
+            "float32_bytes": float32_bytes,
+            "compression": round(float32_bytes / code_bytes, 2) if code_bytes else None
+        }
@@ -0,0 +1,393 @@
+"""
+Local-RAG-first routing for notebook questions
+Questions about notebooks whose content index_ia_regulations.py has loaded into
+the local ChromaDB collection are answered from the retrieved passages. Only
+questions whose retrieval confidence falls below the threshold, or whose notebook
+has no local index, are escalated to NotebookLM.
+
+Query embeddings use the same Gemini model as the app's vector store
+(text-embedding-004). chromadb and google-generativeai are optional; without
+them, or without GOOGLE_GEMINI_API_KEY, every question is escalated.
+
+Collections of up to --rag-exact-threshold vectors are loaded into memory and
+searched exactly (exact_search.py) instead of through HNSW. For larger ones with
+a quantized copy (quantize_collections.py), candidates are found by scanning its
+codes, and only those are fetched from ChromaDB and re-scored at full precision.
+With MMR enabled, fetch_factor x top-k passages are retrieved and diversify.py
+picks the final top-k, skipping near-duplicates and over-represented sources.
+
+Given the bridge's RequestContext, the local attempt runs on a worker thread
+that the request stops waiting for as soon as it is cancelled or out of time.
+The attempt checks the context between steps, and the Gemini embedding and
+generation calls time out with the remaining budget.
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlparse
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from instrumentation import LatencyHistogram
+from deadlines import DeadlineExceeded, RequestCancelled, RequestContext
+from quantized_store import QuantizedCollection, rescore
+from exact_search import DEFAULT_EXACT_THRESHOLD, ExactIndex
+from diversify import DEFAULT_FETCH_FACTOR, DEFAULT_MAX_PER_SOURCE, diversify
+
+DEFAULT_COLLECTION = 'ia_regulations'
+DEFAULT_CHROMA_URL = 'http://localhost:8000'
+EMBEDDING_MODEL = 'models/text-embedding-004'
+GENERATION_MODEL = 'gemini-1.5-flash'
+# Same cut-off as the app's RAGService.MIN_SIMILARITY
+MIN_SIMILARITY = 0.7
+# After a failed connection, skip the local index for this long instead of retrying per request
+UNAVAILABLE_BACKOFF_S = 30.0
+
+SYSTEM_PROMPT = """You are an expert Insurance Authority (IA) assistant for Saudi Arabia. Your role is to provide accurate, compliant information based on official IA regulations.
+
+Guidelines:
+- Only use information from the provided regulatory context
+- Always cite the source regulation when providing information
+- If the context doesn't contain enough information, say so clearly
+- Be precise and professional
+- Focus on factual regulatory requirements"""
+
+
+class LocalIndexUnavailable(Exception):
+    """ChromaDB, the collection or the embedding model cannot be reached"""
+
+
+def confidence(similarities: List[float]) -> float:
+    """Mean of the top three similarities, boosted for several strong matches (as RAGService does)"""
+    if not similarities:
+        return 0.0
+    top = similarities[:3]
+    boost = min(sum(1 for s in similarities if s > 0.85) * 0.05, 0.15)
+    return min(sum(top) / len(top) + boost, 1.0)
+
+
+class LocalRegulationIndex:
+    """Read-only view of the IA regulation collection in ChromaDB"""
+
+    def __init__(self, url: Optional[str] = None, collection: str = DEFAULT_COLLECTION,
+                 refresh_interval: float = 300.0, quantized_dir: Optional[str] = None, rescore_factor: int = 4,
+                 exact_threshold: int = DEFAULT_EXACT_THRESHOLD, mmr_lambda: Optional[float] = None,
+                 fetch_factor: int = DEFAULT_FETCH_FACTOR, max_per_source: int = DEFAULT_MAX_PER_SOURCE):
+        self.url = url or os.environ.get('CHROMADB_PATH') or DEFAULT_CHROMA_URL
+        self.collection_name = collection
+        self.refresh_interval = refresh_interval
+        self.quantized_dir = quantized_dir
+        self.rescore_factor = rescore_factor
+        self.lock = threading.Lock()
+        self._collection = None
+        self._quantized: Optional[QuantizedCollection] = None
+        self._quantized_checked = False
+        self.quantized_status = "disabled" if quantized_dir is None else "not_loaded"
+        self.exact_threshold = exact_threshold
+        self._exact: Optional[ExactIndex] = None
+        self._exact_count: Optional[int] = None
+        self.exact_status = "disabled" if exact_threshold <= 0 else "not_loaded"
+        self.mmr_lambda = mmr_lambda
+        self.fetch_factor = fetch_factor
+        self.max_per_source = max_per_source
+        self.mmr_latency = LatencyHistogram()
+        self._unavailable_until = 0.0
+        self._genai = None
+        self._notebooks: Set[str] = set()
+        self._notebooks_loaded_at = 0.0
+
+    def _get_collection(self):
+        if self._collection is not None:
+            return self._collection
+        if time.monotonic() < self._unavailable_until:
+            raise LocalIndexUnavailable(f"Collection {self.collection_name} recently unreachable at {self.url}")
+        try:
+            import chromadb
+        except ImportError:
+            raise LocalIndexUnavailable("chromadb is not installed")
+
+        parsed = urlparse(self.url)
+        try:
+            client = chromadb.HttpClient(host=parsed.hostname or 'localhost', port=parsed.port or 8000)
+            self._collection = client.get_collection(self.collection_name)
+        except Exception as e:
+            self._unavailable_until = time.monotonic() + UNAVAILABLE_BACKOFF_S
+            raise LocalIndexUnavailable(f"Collection {self.collection_name} unavailable at {self.url}: {str(e)}")
+        return self._collection
+
+    def _get_genai(self):
+        if self._genai is not None:
+            return self._genai
+        api_key = os.environ.get('GOOGLE_GEMINI_API_KEY') or os.environ.get('NEXT_PUBLIC_GEMINI_API_KEY')
+        if not api_key:
+            raise LocalIndexUnavailable("GOOGLE_GEMINI_API_KEY is not set")
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            raise LocalIndexUnavailable("google-generativeai is not installed")
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        return genai
+
+    def indexed_notebooks(self) -> Set[str]:
+        """Notebook ids with at least one document in the collection (cached for refresh_interval)"""
+        with self.lock:
+            if time.monotonic() - self._notebooks_loaded_at < self.refresh_interval:
+                return self._notebooks
+            records = self._get_collection().get(include=['metadatas'])
+            self._notebooks = {m.get('notebook_id') for m in records.get('metadatas') or [] if m and m.get('notebook_id')}
+            self._notebooks_loaded_at = time.monotonic()
+            if self._quantized is not None and len(self._quantized) != len(records['ids']):
+                self._quantized, self.quantized_status = None, "stale"
+            if self._exact_count is not None and self._exact_count != len(records['ids']):
+                # Reloaded (or found too large) on the next search
+                self._exact, self._exact_count = None, None
+            return self._notebooks
+
+    def _get_exact(self) -> Optional[ExactIndex]:
+        """The whole collection in memory, if it is small enough to search exactly"""
+        if self.exact_threshold <= 0 or self._exact_count is not None:
+            return self._exact
+        collection = self._get_collection()
+        with self.lock:
+            if self._exact_count is not None:
+                return self._exact
+            count = collection.count()
+            if count > self.exact_threshold:
+                self._exact, self.exact_status = None, "too_large"
+            else:
+                try:
+                    self._exact, self.exact_status = ExactIndex.from_collection(collection), "active"
+                except ImportError:
+                    self._exact, self.exact_status = None, "numpy_missing"
+            self._exact_count = count
+            return self._exact
+
+    def _get_quantized(self) -> Optional[QuantizedCollection]:
+        """The quantized copy, if one exists and still covers every vector in the collection"""
+        if self.quantized_dir is None or self._quantized_checked:
+            return self._quantized
+        collection = self._get_collection()
+        with self.lock:
+            if self._quantized_checked:
+                return self._quantized
+            self._quantized_checked = True
+            try:
+                quantized = QuantizedCollection.load(self.quantized_dir, self.collection_name)
+            except ImportError:
+                self.quantized_status = "numpy_missing"
+                return None
+            if quantized is None:
+                self.quantized_status = "missing"
+            elif len(quantized) != collection.count():
+                # Built before the last indexing run; rebuild with quantize_collections.py
+                self.quantized_status = "stale"
+            else:
+                self.quantized_status = "active"
+                self._quantized = quantized
+            return self._quantized
+
+    def exact_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"status": self.exact_status, "threshold": self.exact_threshold}
+        if self._exact is not None:
+            stats.update({"vectors": len(self._exact), "bytes": self._exact.nbytes, "space": self._exact.space})
+        return stats
+
+    def mmr_stats(self) -> Dict[str, Any]:
+        if self.mmr_lambda is None:
+            return {"status": "disabled"}
+        return {"status": "active", "lambda": self.mmr_lambda, "fetch_factor": self.fetch_factor,
+                "max_per_source": self.max_per_source, "latency": self.mmr_latency.to_dict()}
+
+    def quantized_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"status": self.quantized_status}
+        if self._quantized is not None:
+            stats.update(self._quantized.memory())
+        return stats
+
+    @staticmethod
+    def _request_options(context: Optional[RequestContext]) -> Dict[str, Any]:
+        """Gemini call options bounding the call by what is left of the request's deadline"""
+        if context is None:
+            return {}
+        context.check()
+        remaining = context.remaining()
+        return {"request_options": {"timeout": remaining}} if remaining is not None else {}
+
+    def embed(self, text: str, context: Optional[RequestContext] = None) -> List[float]:
+        result = self._get_genai().embed_content(model=EMBEDDING_MODEL, content=text, task_type="retrieval_query",
+                                                 **self._request_options(context))
+        return result['embedding']
+
+    def search(self, notebook_id: str, question: str, limit: int = 5,
+               context: Optional[RequestContext] = None) -> List[Dict[str, Any]]:
+        """Passages from one notebook, most similar first"""
+        embedding = self.embed(question, context)
+        if context is not None:
+            context.check()
+        if self.mmr_lambda is None:
+            hits, _, _ = self._candidates(notebook_id, embedding, limit)
+            return hits
+
+        hits, embeddings, metadatas = self._candidates(notebook_id, embedding, limit * self.fetch_factor, embeddings=True)
+        start = time.perf_counter()
+        picked = diversify(embedding, embeddings, metadatas, limit, self.mmr_lambda, self.max_per_source)
+        self.mmr_latency.observe(time.perf_counter() - start)
+        return sorted((hits[i] for i in picked), key=lambda hit: hit['similarity'], reverse=True)
+
+    def _candidates(self, notebook_id: str, embedding: List[float], limit: int,
+                    embeddings: bool = False) -> Tuple[List[Dict[str, Any]], List[Any], List[Dict[str, Any]]]:
+        """Best `limit` passages with, when asked, their embeddings; plus their metadatas"""
+        exact = self._get_exact()
+        quantized = self._get_quantized() if exact is None else None
+        if quantized is not None:
+            return self._search_quantized(quantized, notebook_id, embedding, limit)
+
+        include = ['documents', 'metadatas', 'distances'] + (['embeddings'] if embeddings else [])
+        try:
+            results = (exact or self._get_collection()).query(
+                query_embeddings=[embedding],
+                n_results=limit,
+                where={"notebook_id": notebook_id},
+                include=include
+            )
+        except LocalIndexUnavailable:
+            raise
+        except Exception:
+            # The collection may have been rebuilt under a new id (chroma_maintenance.py); look it up again next time
+            self._collection = None
+            raise
+        hits, metadatas = [], []
+        for i, doc_id in enumerate(results['ids'][0]):
+            metadata = results['metadatas'][0][i] or {}
+            metadatas.append(metadata)
+            hits.append({
+                "id": doc_id,
+                "content": results['documents'][0][i],
+                "title": metadata.get('title') or metadata.get('source') or 'IA Document',
+                "similarity": 1 - results['distances'][0][i]
+            })
+        vectors = results['embeddings'][0] if embeddings else []
+        return hits, vectors, metadatas
+
+    def _search_quantized(self, quantized: QuantizedCollection, notebook_id: str, embedding: List[float],
+                          limit: int) -> Tuple[List[Dict[str, Any]], List[Any], List[Dict[str, Any]]]:
+        candidates = quantized.candidates(embedding, limit * self.rescore_factor, notebook_id)
+        if not candidates:
+            return [], [], []
+        records = self._get_collection().get(ids=candidates, include=['embeddings', 'documents', 'metadatas'])
+        by_id = {doc_id: i for i, doc_id in enumerate(records['ids'])}
+        hits, vectors, metadatas = [], [], []
+        for doc_id, similarity in rescore(embedding, records['ids'], records['embeddings'], limit):
+            metadata = records['metadatas'][by_id[doc_id]] or {}
+            metadatas.append(metadata)
+            vectors.append(records['embeddings'][by_id[doc_id]])
+            hits.append({
+                "id": doc_id,
+                "content": records['documents'][by_id[doc_id]],
+                "title": metadata.get('title') or metadata.get('source') or 'IA Document',
+                "similarity": similarity
+            })
+        return hits, vectors, metadatas
+
+    def answer(self, question: str, hits: List[Dict[str, Any]], context: Optional[RequestContext] = None) -> str:
+        """Answer grounded in the retrieved passages"""
+        passages = '\n---\n\n'.join(f"[{i + 1}] Source: {hit['title']}\n{hit['content']}\n" for i, hit in enumerate(hits))
+        model = self._get_genai().GenerativeModel(GENERATION_MODEL, system_instruction=SYSTEM_PROMPT)
+        response = model.generate_content(
+            f"Based on the following Insurance Authority regulations:\n\n{passages}\n\n"
+            f"Question: {question}\n\nPlease provide a comprehensive answer citing the relevant regulations.",
+            generation_config={"temperature": 0.3},
+            **self._request_options(context)
+        )
+        return response.text
+
+
+class QueryRouter:
+    """Decides per question whether the local index can answer it, and keeps per-path latency"""
+
+    def __init__(self, index: LocalRegulationIndex, threshold: float = MIN_SIMILARITY, top_k: int = 5):
+        self.index = index
+        self.threshold = threshold
+        self.top_k = top_k
+        self.lock = threading.Lock()
+        self.paths: Dict[str, LatencyHistogram] = {"local": LatencyHistogram(), "notebooklm": LatencyHistogram()}
+        self.reasons: Dict[str, int] = {}
+
+    def try_local(self, notebook_id: str, question: str,
+                  context: Optional[RequestContext] = None) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        """(payload, route) when answered locally, or (None, route) with the escalation reason"""
+        start = time.perf_counter()
+        if context is None:
+            payload, route = self._attempt(notebook_id, question, None)
+        else:
+            # On a worker, so a cancel or the deadline gives up on a hung embedding or Gemini call at once
+            future: Future = Future()
+
+            def attempt():
+                try:
+                    future.set_result(self._attempt(notebook_id, question, context))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            threading.Thread(target=attempt, name="local-rag", daemon=True).start()
+            try:
+                payload, route = context.result(future)
+            except DeadlineExceeded as e:
+                payload, route = None, {"path": "notebooklm", "reason": "deadline_exceeded", "detail": str(e)}
+            except RequestCancelled as e:
+                payload, route = None, {"path": "notebooklm", "reason": "cancelled", "detail": str(e)}
+
+        route["local_latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return payload, route
+
+    def _attempt(self, notebook_id: str, question: str,
+                 context: Optional[RequestContext]) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        route: Dict[str, Any] = {"path": "notebooklm"}
+        try:
+            if notebook_id not in self.index.indexed_notebooks():
+                route["reason"] = "notebook_not_indexed"
+            else:
+                hits = self.index.search(notebook_id, question, self.top_k, context)
+                score = confidence([h['similarity'] for h in hits])
+                route["confidence"] = round(score, 4)
+                if score < self.threshold:
+                    route["reason"] = "low_confidence"
+                else:
+                    hits = [h for h in hits if h['similarity'] >= self.threshold] or hits[:1]
+                    answer = self.index.answer(question, hits, context)
+                    route.update(path="local", reason="confident_retrieval")
+                    return {
+                        "status": "success",
+                        "answer": answer,
+                        "conversation_id": None,
+                        "sources": [{"id": h['id'], "title": h['title'], "similarity": round(h['similarity'], 4)} for h in hits]
+                    }, route
+        except DeadlineExceeded as e:
+            route.update(reason="deadline_exceeded", detail=str(e))
+        except RequestCancelled as e:
+            route.update(reason="cancelled", detail=str(e))
+        except LocalIndexUnavailable as e:
+            route.update(reason="local_index_unavailable", detail=str(e))
+        except Exception as e:
+            route.update(reason="local_error", detail=str(e))
+        return None, route
+
+    def record(self, route: Dict[str, Any], seconds: float):
+        """Finish a route record with the total time taken to answer"""
+        route["latency_ms"] = round(seconds * 1000, 3)
+        with self.lock:
+            self.paths[route["path"]].observe(seconds)
+            self.reasons[route["reason"]] = self.reasons.get(route["reason"], 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "threshold": self.threshold,
+                "exact": self.index.exact_stats(),
+                "mmr": self.index.mmr_stats(),
+                "quantized": self.index.quantized_stats(),
+                "paths": {path: hist.to_dict() for path, hist in self.paths.items()},
+                "reasons": dict(self.reasons)
+            }
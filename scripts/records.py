@@ -0,0 +1,298 @@
+"""
+Typed records for notebook data and reports, and their JSON encoding
+Notebooks, sources, query results and the analyzers' reports are declared here
+as TypedDicts, so callers keep using plain dicts. load() validates a file
+against its record type at the boundary. Wrong types, missing required keys and
+invalid JSON raise RecordError, naming the offending path (e.g.
+`$[3].sources[0].title`). Keys that the schema does not declare are dropped.
+With msgspec installed (`pip install msgspec`), decoding, validation and
+encoding run in C. Otherwise the stdlib json module and a small checker below
+do the same work, more slowly. Files people read are written pretty
+(indented); files only read by other scripts are written compact.
+
+notebook_record() and source_record() turn the NotebookLM client's objects, or
+dicts with the same fields, into records.
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TypedDict, Union, get_args, get_origin, get_type_hints
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+BACKEND = "msgspec" if msgspec is not None else "json"
+
+
+class RecordError(ValueError):
+    """Data that is not valid JSON or does not match its record type"""
+
+
+# Records
+
+class Source(TypedDict, total=False):
+    id: str
+    source_id: Optional[str]
+    title: str
+    type: str
+    url: Optional[str]
+    created_at: Optional[str]
+
+
+SOURCE_FIELDS = tuple(Source.__annotations__)
+
+
+class QueryResult(TypedDict, total=False):
+    # Empty when the query failed
+    notebook_id: Optional[str]
+    query: str
+    response: Any
+    queried_at: str
+
+
+class _NotebookKeys(TypedDict):
+    title: str
+    notebook_id: Optional[str]
+
+
+class Notebook(_NotebookKeys, total=False):
+    sources: List[Source]
+    source_count: int
+    extracted_at: str
+    query_result: QueryResult
+
+
+class MatrixTable(TypedDict):
+    generated_at: str
+    questions: List[Dict[str, str]]
+    notebooks: List[Dict[str, Optional[str]]]
+    # answers[i][j] is notebook i's response to question j (null when the query failed)
+    answers: List[List[Any]]
+    failed: int
+
+
+class IAReport(TypedDict):
+    analysis_date: str
+    total_ia_notebooks: int
+    regulatory_insights: Dict[str, int]
+    detailed_insights: Dict[str, List[Dict[str, Any]]]
+    timeline: List[Dict[str, Any]]
+
+
+class CompetitorReport(TypedDict):
+    analysis_date: str
+    total_competitor_notebooks: int
+    insights: Dict[str, int]
+    detailed_insights: Dict[str, Any]
+    competitor_notebooks: List[str]
+
+
+class InsightsReport(TypedDict):
+    report_date: str
+    report_title: str
+    executive_summary: Dict[str, Any]
+    recommendations: List[Dict[str, Any]]
+    implementation_priority: List[Any]
+
+
+class RegulationInterval(TypedDict):
+    regulation: str
+    notebook_id: str
+    version: int
+    effective_from: str
+    superseded_on: Optional[str]
+
+
+class IntervalTreeNode(TypedDict):
+    center: str
+    by_start: List[int]
+    by_end: List[int]
+    left: int
+    right: int
+
+
+class IntervalIndexFile(TypedDict):
+    generated_at: str
+    intervals: List[RegulationInterval]
+    nodes: List[IntervalTreeNode]
+
+
+Notebooks = List[Notebook]
+
+
+# Building records from client objects
+
+def read_field(obj: Any, name: str, default: Any = None) -> Any:
+    """A field of a client object or of a dict"""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def source_record(source: Any) -> Source:
+    """The schema's fields that a source object or dict has"""
+    if isinstance(source, dict):
+        return {name: source[name] for name in SOURCE_FIELDS if name in source}
+    return {name: getattr(source, name) for name in SOURCE_FIELDS if getattr(source, name, None) is not None}
+
+
+def notebook_record(notebook: Any, sources: bool = True) -> Notebook:
+    """title, notebook_id (client objects may call it id), source_count and optionally sources"""
+    raw_sources = read_field(notebook, 'sources') or []
+    record: Notebook = {
+        "title": read_field(notebook, 'title') or 'Untitled',
+        "notebook_id": read_field(notebook, 'notebook_id') or read_field(notebook, 'id'),
+    }
+    if sources:
+        record["sources"] = [source_record(s) for s in raw_sources]
+    record["source_count"] = len(raw_sources)
+    return record
+
+
+# Encoding
+
+def _default(value: Any) -> Any:
+    return str(value)
+
+
+def encode(data: Any, pretty: bool = True) -> bytes:
+    """UTF-8 JSON, indented by two spaces when pretty"""
+    if msgspec is not None:
+        raw = msgspec.json.encode(data, enc_hook=_default)
+        return msgspec.json.format(raw, indent=2) if pretty else raw
+    if pretty:
+        return json.dumps(data, indent=2, ensure_ascii=False, default=_default).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def dump(path: Union[str, Path], data: Any, pretty: bool = True) -> Path:
+    path = Path(path)
+    with open(path, 'wb') as f:
+        f.write(encode(data, pretty))
+    return path
+
+
+# Decoding and validation
+
+_decoders: Dict[Any, Any] = {}
+
+
+def decode(raw: Union[bytes, str], record_type: Any = Any) -> Any:
+    """Parse JSON and check it against record_type (Any skips the check)"""
+    if msgspec is not None:
+        decoder = _decoders.get(record_type)
+        if decoder is None:
+            decoder = _decoders[record_type] = msgspec.json.Decoder(record_type)
+        try:
+            return decoder.decode(raw)
+        except (msgspec.ValidationError, msgspec.DecodeError) as e:
+            raise RecordError(str(e))
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        raise RecordError(f"Invalid JSON: {str(e)}")
+    return _check(data, record_type, "$")
+
+
+def load(path: Union[str, Path], record_type: Any = Any) -> Any:
+    with open(path, 'rb') as f:
+        raw = f.read()
+    try:
+        return decode(raw, record_type)
+    except RecordError as e:
+        raise RecordError(f"{path}: {str(e)}")
+
+
+def _type_name(value: Any) -> str:
+    return {dict: 'object', list: 'array', str: 'str', bool: 'bool', int: 'int', float: 'float',
+            type(None): 'null'}.get(type(value), type(value).__name__)
+
+
+def _check(value: Any, expected: Any, path: str) -> Any:
+    """value if it matches expected, with undeclared TypedDict keys dropped; raises RecordError otherwise"""
+    return _checker(expected)(value, path)
+
+
+_checkers: Dict[Any, Callable[[Any, str], Any]] = {}
+
+
+def _mismatch(expected: str, value: Any, path: str) -> RecordError:
+    return RecordError(f"Expected `{expected}`, got `{_type_name(value)}` - at `{path}`")
+
+
+def _checker(expected: Any) -> Callable[[Any, str], Any]:
+    """Validation function for a type, built once per type"""
+    if expected not in _checkers:
+        _checkers[expected] = _build_checker(expected)
+    return _checkers[expected]
+
+
+def _build_checker(expected: Any) -> Callable[[Any, str], Any]:
+    if expected is Any:
+        return lambda value, path: value
+    if expected is None or expected is type(None):
+        def check_null(value, path):
+            if value is not None:
+                raise _mismatch('null', value, path)
+            return value
+        return check_null
+
+    origin = get_origin(expected)
+    if origin is Union:
+        options = get_args(expected)
+        checkers = [_checker(option) for option in options]
+        names = ' | '.join('null' if o is type(None) else getattr(o, '__name__', str(o)) for o in options)
+
+        def check_union(value, path):
+            for check in checkers:
+                try:
+                    return check(value, path)
+                except RecordError:
+                    continue
+            raise _mismatch(names, value, path)
+        return check_union
+    if origin is list:
+        (item,) = get_args(expected) or (Any,)
+        check_item = _checker(item)
+
+        def check_list(value, path):
+            if not isinstance(value, list):
+                raise _mismatch('array', value, path)
+            if item is Any:
+                return value
+            return [check_item(v, f"{path}[{i}]") for i, v in enumerate(value)]
+        return check_list
+    if origin is dict or expected is dict:
+        _, item = get_args(expected) or (str, Any)
+        check_item = _checker(item)
+
+        def check_dict(value, path):
+            if not isinstance(value, dict):
+                raise _mismatch('object', value, path)
+            if item is Any:
+                return value
+            return {k: check_item(v, f"{path}[{k!r}]") for k, v in value.items()}
+        return check_dict
+    if getattr(expected, '__required_keys__', None) is not None:
+        required = sorted(expected.__required_keys__)
+        fields = {name: _checker(hint) for name, hint in get_type_hints(expected).items()}
+
+        def check_record(value, path):
+            if not isinstance(value, dict):
+                raise _mismatch('object', value, path)
+            for key in required:
+                if key not in value:
+                    raise RecordError(f"Object missing required field `{key}` - at `{path}`")
+            return {k: fields[k](v, f"{path}.{k}") for k, v in value.items() if k in fields}
+        return check_record
+
+    # Scalars; bool is not accepted as a number, as in msgspec
+    accepted = (int, float) if expected is float else expected
+
+    def check_scalar(value, path):
+        if not isinstance(value, accepted) or (isinstance(value, bool) and expected is not bool):
+            raise _mismatch(expected.__name__, value, path)
+        return value
+    return check_scalar
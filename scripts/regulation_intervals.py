@@ -0,0 +1,226 @@
+"""
+Which IA regulations were in force on a given date
+analyze_ia_notebooks.py collects the dates each IA notebook mentions. Here, each
+regulation's dates become consecutive versions: a version takes effect on one
+date and is superseded on the regulation's next date. The newest version stays
+open-ended. The intervals go into a centered interval tree. Each node holds the
+intervals that contain its center date, sorted by start and by end, so every
+interval is stored once. A lookup walks one root-to-leaf path and reads only
+the intervals it returns, O(log n + k). A batch of dates, such as the incident
+dates of many claims, is looked up date by date. The index is saved next to the
+IA report as ia_regulation_intervals.json.
+
+    python scripts/regulation_intervals.py --date 2024-03-01
+    python scripts/regulation_intervals.py --claims claims.json --output reports/claims_in_force.json
+"""
+
+import re
+import sys
+import json
+from pathlib import Path
+from datetime import date, datetime
+from typing import List, Dict, Any, Iterable, Optional, Sequence
+
+import records
+from records import IntervalIndexFile
+
+DEFAULT_INTERVALS_FILE = "ia_regulation_intervals.json"
+# IA circulars write numeric dates day first
+NUMERIC_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y')
+# Sorts after every ISO date, standing in for the open end of a regulation's latest version
+OPEN_END = '9999-12-31'
+MONTHS = {m: i + 1 for i, m in enumerate(('jan', 'feb', 'mar', 'apr', 'may', 'jun',
+                                          'jul', 'aug', 'sep', 'oct', 'nov', 'dec'))}
+
+
+def parse_date(text: Any) -> Optional[date]:
+    """Date from any of the formats extract_date_patterns finds, or None"""
+    if isinstance(text, datetime):
+        return text.date()
+    if isinstance(text, date):
+        return text
+    text = str(text).strip()
+    for fmt in NUMERIC_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    match = (re.fullmatch(r'(\d{1,2})\s+([a-z]{3})[a-z]*\s+(\d{4})', text, re.IGNORECASE) or
+             re.fullmatch(r'([a-z]{3})[a-z]*\s+(\d{1,2}),?\s+(\d{4})', text, re.IGNORECASE))
+    if not match:
+        return None
+    first, second, year = match.groups()
+    day, month = (first, second) if first.isdigit() else (second, first)
+    try:
+        return date(int(year), MONTHS[month.lower()], int(day))
+    except (KeyError, ValueError):
+        return None
+
+
+def build_intervals(changes: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Effective-from / superseded-on intervals per regulation from dated historical changes"""
+    dates: Dict[str, set] = {}
+    names: Dict[str, str] = {}
+    for change in changes:
+        parsed = parse_date(change.get('date', ''))
+        if parsed is None:
+            continue
+        key = change.get('notebook_id') or change.get('context') or 'unknown'
+        dates.setdefault(key, set()).add(parsed)
+        names.setdefault(key, change.get('context') or key)
+
+    intervals = []
+    for key in sorted(dates):
+        versions = sorted(dates[key])
+        for version, effective in enumerate(versions):
+            superseded = versions[version + 1] if version + 1 < len(versions) else None
+            intervals.append({
+                "regulation": names[key],
+                "notebook_id": key,
+                "version": version + 1,
+                "effective_from": effective.isoformat(),
+                "superseded_on": superseded.isoformat() if superseded else None
+            })
+    return intervals
+
+
+class IntervalIndex:
+    """Half-open [effective_from, superseded_on) intervals in a centered interval tree"""
+
+    def __init__(self, intervals: Sequence[Dict[str, Any]]):
+        self.intervals = list(intervals)
+        # Node 0 is the root; children are node positions, -1 for none
+        self.nodes: List[Dict[str, Any]] = []
+        self._build(list(range(len(self.intervals))))
+
+    def __len__(self) -> int:
+        return len(self.intervals)
+
+    def _start(self, n: int) -> str:
+        return self.intervals[n]['effective_from']
+
+    def _end(self, n: int) -> str:
+        return self.intervals[n].get('superseded_on') or OPEN_END
+
+    def _build(self, members: List[int]) -> int:
+        if not members:
+            return -1
+        # The median start leaves at most half the intervals entirely on either side
+        center = sorted(self._start(n) for n in members)[len(members) // 2]
+        here = [n for n in members if self._start(n) <= center < self._end(n)]
+        node = {
+            "center": center,
+            "by_start": sorted(here, key=self._start),
+            "by_end": sorted(here, key=self._end, reverse=True),
+            "left": -1,
+            "right": -1
+        }
+        position = len(self.nodes)
+        self.nodes.append(node)
+        node["left"] = self._build([n for n in members if self._end(n) <= center])
+        node["right"] = self._build([n for n in members if self._start(n) > center])
+        return position
+
+    def _stab(self, day: str) -> List[int]:
+        """Positions of the intervals containing an ISO date, in interval order"""
+        found = []
+        position = 0 if self.nodes else -1
+        while position >= 0:
+            node = self.nodes[position]
+            # Every interval at this node contains the center, so only one of its ends needs checking
+            if day < node['center']:
+                for n in node['by_start']:
+                    if self._start(n) > day:
+                        break
+                    found.append(n)
+                position = node['left']
+            else:
+                for n in node['by_end']:
+                    if self._end(n) <= day:
+                        break
+                    found.append(n)
+                position = node['right']
+        return sorted(found)
+
+    def in_force(self, when: Any) -> List[Dict[str, Any]]:
+        """Regulation versions in force on a date"""
+        parsed = parse_date(when)
+        if parsed is None:
+            raise ValueError(f"Unrecognized date: {when}")
+        return [self.intervals[n] for n in self._stab(parsed.isoformat())]
+
+    def in_force_many(self, dates: Sequence[Any]) -> List[List[Dict[str, Any]]]:
+        """in_force for each date, in input order"""
+        return [self.in_force(when) for when in dates]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"generated_at": datetime.now().isoformat(), "intervals": self.intervals, "nodes": self.nodes}
+
+    def save(self, path: Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return records.dump(path, self.to_dict(), pretty=False)
+
+    @classmethod
+    def readable(cls, path: Path) -> bool:
+        """Whether an index file exists in the current format"""
+        try:
+            cls.load(path)
+        except (FileNotFoundError, records.RecordError):
+            return False
+        return True
+
+    @classmethod
+    def load(cls, path: Path) -> "IntervalIndex":
+        data = records.load(path, IntervalIndexFile)
+        index = cls.__new__(cls)
+        index.intervals = data['intervals']
+        index.nodes = data['nodes']
+        return index
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Look up the IA regulations in force on given dates')
+    parser.add_argument('--index', type=str, default=f"reports/notebook_data/{DEFAULT_INTERVALS_FILE}",
+                        help='Interval index written by analyze_ia_notebooks.py')
+    parser.add_argument('--date', action='append', default=[], help='Date to look up (repeatable)')
+    parser.add_argument('--claims', type=str,
+                        help='JSON list of claims, each with an incident_date (and optionally a claim_id)')
+    parser.add_argument('--output', type=str, help='Also write the results JSON to this file')
+    args = parser.parse_args()
+
+    try:
+        index = IntervalIndex.load(Path(args.index))
+    except FileNotFoundError:
+        print(json.dumps({"status": "error", "error": f"No interval index at {args.index}; run analyze_ia_notebooks.py first"}))
+        sys.exit(1)
+    except records.RecordError as e:
+        print(json.dumps({"status": "error", "error": f"{str(e)}; rebuild it with analyze_ia_notebooks.py --full"}))
+        sys.exit(1)
+
+    queries = [{"date": d} for d in args.date]
+    if args.claims:
+        with open(args.claims, 'r', encoding='utf-8') as f:
+            queries.extend({"claim_id": claim.get('claim_id'), "date": claim['incident_date']} for claim in json.load(f))
+    if not queries:
+        print(json.dumps({"status": "error", "error": "Nothing to look up: pass --date or --claims"}))
+        sys.exit(1)
+
+    try:
+        matches = index.in_force_many([q['date'] for q in queries])
+    except ValueError as e:
+        print(json.dumps({"status": "error", "error": str(e)}))
+        sys.exit(1)
+
+    results = [{**query, "in_force": in_force} for query, in_force in zip(queries, matches)]
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    print(json.dumps({"status": "success", "results": results}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
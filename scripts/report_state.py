@@ -0,0 +1,206 @@
+"""
+Incremental report state shared by the notebook analyzers
+Keeps each notebook's previous contribution to a report so a re-run only
+re-analyzes added or modified notebooks, and writes a compact delta file.
+The state records a version of the analyzer code (a hash of its module
+source). When the version changes, every notebook is re-analyzed so that
+changed keywords or logic reach the report. Report inputs that are not
+per-notebook records, such as a notebook count taken from another file, go in
+`inputs`; the report is rewritten whenever they differ from the previous run.
+With workers > 1, the notebooks that need analysis are split into contiguous
+shards and analyzed in a process pool. The shard results are concatenated in
+shard order, so the contributions match a serial run exactly.
+"""
+
+import sys
+import json
+import math
+import hashlib
+import inspect
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Optional
+from datetime import datetime
+
+import records
+
+
+def notebook_keys(notebooks: List[Dict[str, Any]]) -> List[str]:
+    """Stable keys for a notebook list (notebook_id, else title, de-duplicated)"""
+    keys = []
+    seen: Dict[str, int] = {}
+    for nb in notebooks:
+        base = nb.get('notebook_id') or nb.get('title', 'Untitled')
+        seen[base] = seen.get(base, 0) + 1
+        keys.append(base if seen[base] == 1 else f"{base}#{seen[base]}")
+    return keys
+
+
+def analyzer_version(analyzer_type: type) -> str:
+    """Hash of the source of the module defining an analyzer, keywords and rules included"""
+    source = inspect.getsource(sys.modules[analyzer_type.__module__])
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+def notebook_fingerprint(notebook: Dict[str, Any]) -> str:
+    """Content hash of a notebook record, ignoring extraction timestamps"""
+    content = {k: v for k, v in notebook.items() if k != 'extracted_at'}
+    if isinstance(content.get('query_result'), dict):
+        content['query_result'] = {k: v for k, v in content['query_result'].items() if k != 'queried_at'}
+    encoded = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+# Shards per worker, so a slow shard does not leave the other workers idle
+SHARDS_PER_WORKER = 4
+
+_worker_analyze: Optional[Callable[[Dict[str, Any]], Any]] = None
+
+
+def _init_worker(analyzer_type: type, method: str):
+    # Each worker builds its own empty analyzer rather than receiving the parent's loaded one
+    global _worker_analyze
+    _worker_analyze = getattr(analyzer_type(), method)
+
+
+def _analyze_shard(shard: List[Dict[str, Any]]) -> List[Any]:
+    return [_worker_analyze(notebook) for notebook in shard]
+
+
+def analyze_notebooks(notebooks: List[Dict[str, Any]], analyze: Callable[[Dict[str, Any]], Any],
+                      workers: int = 1) -> List[Any]:
+    """analyze(notebook) for each notebook, in notebook order
+
+    With workers > 1, analyze must be a method of an analyzer class that can be
+    constructed without arguments; each worker process constructs its own.
+    """
+    if workers <= 1 or len(notebooks) < 2:
+        return [analyze(notebook) for notebook in notebooks]
+
+    size = math.ceil(len(notebooks) / (workers * SHARDS_PER_WORKER))
+    shards = [notebooks[i:i + size] for i in range(0, len(notebooks), size)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards)), initializer=_init_worker,
+                             initargs=(type(analyze.__self__), analyze.__name__)) as executor:
+        return [contribution for part in executor.map(_analyze_shard, shards) for contribution in part]
+
+
+def _flatten(contribution: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """Flatten nested category dicts (e.g. competitors.Floatbot) into dotted keys"""
+    flat: Dict[str, List[Any]] = {}
+    for category, items in contribution.items():
+        if isinstance(items, dict):
+            for sub, sub_items in items.items():
+                flat[f"{category}.{sub}"] = list(sub_items)
+        else:
+            flat[category] = list(items)
+    return flat
+
+
+class ReportState:
+    """Per-notebook contributions of one report, persisted between runs"""
+
+    def __init__(self, report_path: Path, version: Optional[str] = None):
+        self.report_path = Path(report_path)
+        self.version = version
+        # Previous contributions came from different analyzer code and are not reused
+        self.stale = False
+        self.state_path = self.report_path.with_name(f".{self.report_path.stem}.state.json")
+        self.delta_path = self.report_path.with_name(f"{self.report_path.stem}.delta.json")
+        self.previous: Dict[str, Dict[str, Any]] = {}
+        self.previous_generated_at: Optional[str] = None
+        self.inputs: Dict[str, Any] = {}
+        self.previous_inputs: Dict[str, Any] = {}
+        self.current: Dict[str, Dict[str, Any]] = {}
+        self.changes: Dict[str, List[str]] = {"added": [], "removed": [], "modified": []}
+
+    def load(self) -> bool:
+        """Load the previous run's state; returns False when starting fresh"""
+        if not self.state_path.exists() or not self.report_path.exists():
+            return False
+
+        try:
+            data = records.load(self.state_path)
+            self.previous = data.get('notebooks', {})
+            self.previous_generated_at = data.get('generated_at')
+            self.previous_inputs = data.get('inputs', {})
+            self.stale = data.get('version') != self.version
+            if self.stale:
+                print("Analyzer changed since the previous run; re-analyzing every notebook")
+            return True
+        except Exception as e:
+            print(f"Ignoring unreadable report state {self.state_path}: {str(e)}")
+            self.previous = {}
+            return False
+
+    @property
+    def has_changes(self) -> bool:
+        return self.stale or self.inputs != self.previous_inputs or any(self.changes.values())
+
+    def apply(self, notebooks: List[Dict[str, Any]],
+              analyze: Callable[[Dict[str, Any]], Dict[str, Any]], workers: int = 1) -> List[Dict[str, Any]]:
+        """Return contributions in notebook order, analyzing only added or modified notebooks"""
+        self.current = {}
+        self.changes = {"added": [], "removed": [], "modified": []}
+
+        keys = notebook_keys(notebooks)
+        fingerprints = [notebook_fingerprint(notebook) for notebook in notebooks]
+        pending = []
+        for i, (key, fingerprint) in enumerate(zip(keys, fingerprints)):
+            previous = self.previous.get(key)
+            if not previous or self.stale or previous['fingerprint'] != fingerprint:
+                pending.append(i)
+                self.changes["modified" if previous else "added"].append(key)
+
+        analyzed = dict(zip(pending, analyze_notebooks([notebooks[i] for i in pending], analyze, workers)))
+        contributions = []
+        for i, (key, fingerprint) in enumerate(zip(keys, fingerprints)):
+            contribution = analyzed[i] if i in analyzed else self.previous[key]['contribution']
+            self.current[key] = {"fingerprint": fingerprint, "contribution": contribution}
+            contributions.append(contribution)
+
+        self.changes["removed"] = [key for key in self.previous if key not in self.current]
+        return contributions
+
+    def build_delta(self) -> Dict[str, Any]:
+        """Insight items added and removed since the previous run, by category"""
+        insights: Dict[str, Dict[str, List[Any]]] = {}
+
+        def record(key: str, source: Dict[str, Dict[str, Any]], direction: str):
+            for category, items in _flatten(source[key]['contribution']).items():
+                if items:
+                    insights.setdefault(category, {"added": [], "removed": []})[direction].extend(items)
+
+        for key in self.changes["removed"] + self.changes["modified"]:
+            record(key, self.previous, "removed")
+        for key in self.changes["added"] + self.changes["modified"]:
+            record(key, self.current, "added")
+
+        # A modified notebook that re-emits an identical item is not a change
+        for category, diff in insights.items():
+            added = [item for item in diff["added"] if item not in diff["removed"]]
+            removed = [item for item in diff["removed"] if item not in diff["added"]]
+            diff["added"], diff["removed"] = added, removed
+
+        return {
+            "report": self.report_path.name,
+            "generated_at": datetime.now().isoformat(),
+            "previous_generated_at": self.previous_generated_at,
+            "notebooks": self.changes,
+            "insights": {k: v for k, v in insights.items() if v["added"] or v["removed"]}
+        }
+
+    def save(self, generated_at: str):
+        """Persist state and write the delta file"""
+        delta = self.build_delta()
+
+        records.dump(self.delta_path, delta, pretty=False)
+        records.dump(self.state_path, {"generated_at": generated_at, "version": self.version, "inputs": self.inputs,
+                                       "notebooks": self.current}, pretty=False)
+
+        self.previous = self.current
+        self.previous_inputs = self.inputs
+        self.previous_generated_at = generated_at
+        self.stale = False
+        print(f"Report delta saved to {self.delta_path} "
+              f"(+{len(self.changes['added'])} ~{len(self.changes['modified'])} -{len(self.changes['removed'])} notebooks)")
+        return self.delta_path
@@ -0,0 +1,299 @@
+"""
+Circuit breaker and hedged requests around a NotebookLMClient
+The breaker opens after consecutive failures (or calls slower than a latency
+threshold), fails fast while open, and lets a few probe calls through once
+the reset timeout passes (half-open). Hedging sends a duplicate of a slow read
+after the method's observed p95 latency and returns whichever answer comes
+first, within a budget so a degraded upstream does not see double load.
+Streaming methods (query_stream) count toward the breaker when the stream
+ends, fails or is dropped, not when the generator is returned.
+
+    client = ResilientClient.from_args(NotebookLMClient(...), args)
+    client.query(notebook_id=..., query_text=...)
+    client.stats()
+"""
+
+import time
+import inspect
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+HEDGED_METHODS = ('query', 'query_notebook', 'get_notebook')
+LATENCY_WINDOW = 200
+MIN_HEDGE_SAMPLES = 20
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while the breaker is open"""
+
+
+class CircuitBreaker:
+    """Closed -> open after failures or slow calls -> half-open probes -> closed"""
+
+    def __init__(self, failure_threshold: int = 5, slow_call_s: Optional[float] = None,
+                 reset_timeout: float = 30.0, half_open_probes: int = 1):
+        self.failure_threshold = failure_threshold
+        self.slow_call_s = slow_call_s
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.rejected = 0
+        self.transitions: Dict[str, int] = {"open": 0, "half_open": 0, "closed": 0}
+
+    def _transition(self, state: str):
+        self.state = state
+        self.transitions[state] += 1
+        if state == "open":
+            self.opened_at = time.monotonic()
+        if state != "half_open":
+            self.probes_in_flight = 0
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError"""
+        with self.lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"NotebookLM circuit open; retry in {self.retry_after():.1f}s")
+                self._transition("half_open")
+            if self.state == "half_open":
+                if self.probes_in_flight >= self.half_open_probes:
+                    self.rejected += 1
+                    raise CircuitOpenError("NotebookLM circuit half-open; probe already in flight")
+                self.probes_in_flight += 1
+
+    def after_call(self, seconds: float, error: Optional[BaseException]):
+        """Record one admitted call's outcome"""
+        failed = error is not None or (self.slow_call_s is not None and seconds > self.slow_call_s)
+        with self.lock:
+            if self.state == "half_open":
+                self.probes_in_flight = max(0, self.probes_in_flight - 1)
+                self._transition("open" if failed else "closed")
+                self.consecutive_failures = 1 if failed else 0
+                return
+
+            if not failed:
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            if self.state == "closed" and self.consecutive_failures >= self.failure_threshold:
+                self._transition("open")
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_after_s": round(self.retry_after(), 3) if self.state == "open" else 0.0,
+                "rejected": self.rejected,
+                "transitions": dict(self.transitions)
+            }
+
+
+class HedgePolicy:
+    """Per-method rolling latencies; hedge delay is their quantile"""
+
+    def __init__(self, quantile: float = 0.95, min_delay: float = 0.05, budget: float = 0.1, workers: int = 8):
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.budget = budget
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, Deque[float]] = {}
+        self.counts = {"calls": 0, "hedged": 0, "hedge_wins": 0, "primary_wins": 0, "budget_skipped": 0}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hedge")
+
+    def observe(self, method: str, seconds: float):
+        with self.lock:
+            self.latencies.setdefault(method, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def delay(self, method: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None until enough latencies are known"""
+        with self.lock:
+            samples = self.latencies.get(method)
+            if not samples or len(samples) < MIN_HEDGE_SAMPLES:
+                return None
+            ordered = sorted(samples)
+        return max(self.min_delay, ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))])
+
+    def admit_hedge(self) -> bool:
+        """Whether another duplicate fits in the hedge budget"""
+        with self.lock:
+            if self.counts["hedged"] + 1 > self.budget * max(1, self.counts["calls"]):
+                self.counts["budget_skipped"] += 1
+                return False
+            self.counts["hedged"] += 1
+            return True
+
+    def count(self, name: str):
+        with self.lock:
+            self.counts[name] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            counts = dict(self.counts)
+        hedged = counts["hedged"]
+        return {
+            **counts,
+            "hedge_win_rate": round(counts["hedge_wins"] / hedged, 3) if hedged else None,
+            "delay_ms": {method: round(d * 1000, 3) for method in list(self.latencies)
+                         if (d := self.delay(method)) is not None}
+        }
+
+
+class _MonitoredStream:
+    """Iterator over a streamed response that reports to the breaker once it ends, fails or is dropped"""
+
+    def __init__(self, stream: Iterator[Any], breaker: CircuitBreaker, start: float):
+        self._stream = stream
+        self._breaker = breaker
+        self._start = start
+        self._finished = False
+
+    def _finish(self, error: Optional[BaseException]):
+        if not self._finished:
+            self._finished = True
+            self._breaker.after_call(time.perf_counter() - self._start, error)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Any:
+        try:
+            return next(self._stream)
+        except StopIteration:
+            self._finish(None)
+            raise
+        except Exception as e:
+            self._finish(e)
+            raise
+
+    def close(self):
+        """Stop the stream early; the caller gave up, so this is not an upstream failure"""
+        self._stream.close()
+        self._finish(None)
+
+    def __del__(self):
+        if not self._finished:
+            self.close()
+
+
+class ResilientClient:
+    """Client proxy that applies a circuit breaker to every call and hedges slow reads"""
+
+    def __init__(self, client: Any, breaker: Optional[CircuitBreaker] = None, hedge: Optional[HedgePolicy] = None):
+        self._client = client
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge = hedge
+
+    @property
+    def wrapped(self) -> Any:
+        """The underlying client (or SessionPool)"""
+        return self._client
+
+    @classmethod
+    def from_args(cls, client: Any, args: Any) -> Any:
+        """Wrap a client using arguments added by add_arguments(); None stays None"""
+        if client is None:
+            return None
+        slow_ms = getattr(args, 'breaker_slow_ms', 0)
+        breaker = CircuitBreaker(
+            failure_threshold=getattr(args, 'breaker_failures', 5),
+            slow_call_s=slow_ms / 1000 if slow_ms else None,
+            reset_timeout=getattr(args, 'breaker_reset', 30.0)
+        )
+        hedge = HedgePolicy(
+            quantile=getattr(args, 'hedge_quantile', 0.95),
+            budget=getattr(args, 'hedge_budget', 0.1)
+        ) if getattr(args, 'hedge', False) else None
+        return cls(client, breaker=breaker, hedge=hedge)
+
+    @staticmethod
+    def add_arguments(parser: Any):
+        """Register circuit breaker and hedging options on an argparse parser"""
+        parser.add_argument('--breaker-failures', type=int, default=5,
+                            help='Consecutive failed or slow calls that open the circuit breaker')
+        parser.add_argument('--breaker-slow-ms', type=float, default=0,
+                            help='Count calls slower than this as failures (0 = latency ignored)')
+        parser.add_argument('--breaker-reset', type=float, default=30.0,
+                            help='Seconds the breaker stays open before a half-open probe')
+        parser.add_argument('--hedge', action='store_true',
+                            help='Send a duplicate of slow queries after the observed p95 latency')
+        parser.add_argument('--hedge-quantile', type=float, default=0.95, help='Latency quantile used as the hedge delay')
+        parser.add_argument('--hedge-budget', type=float, default=0.1,
+                            help='Maximum fraction of calls that may be hedged')
+
+    def _timed(self, method: str, args: Tuple, kwargs: Dict[str, Any]) -> Tuple[Any, float]:
+        start = time.perf_counter()
+        result = getattr(self._client, method)(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+    def _hedged(self, method: str, args: Tuple, kwargs: Dict[str, Any]) -> Any:
+        hedge = self.hedge
+        hedge.count("calls")
+        delay = hedge.delay(method)
+        primary = hedge.executor.submit(self._timed, method, args, kwargs)
+        if delay is None:
+            result, seconds = primary.result()
+            hedge.observe(method, seconds)
+            return result
+
+        done, _ = wait([primary], timeout=delay)
+        if done or not hedge.admit_hedge():
+            result, seconds = primary.result()
+            hedge.observe(method, seconds)
+            return result
+
+        backup = hedge.executor.submit(self._timed, method, args, kwargs)
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                result, seconds = future.result()
+                # Record time since the primary started, which is what the caller waited
+                hedge.observe(method, seconds + (delay if future is backup else 0.0))
+                hedge.count("hedge_wins" if future is backup else "primary_wins")
+                return result
+        raise error
+
+    def call(self, method: str, *args, **kwargs) -> Any:
+        """Invoke a client method through the breaker, hedging it when enabled"""
+        self.breaker.before_call()
+        start = time.perf_counter()
+        try:
+            if self.hedge is not None and method in HEDGED_METHODS:
+                result = self._hedged(method, args, kwargs)
+            else:
+                result = getattr(self._client, method)(*args, **kwargs)
+        except Exception as e:
+            self.breaker.after_call(time.perf_counter() - start, e)
+            raise
+        if inspect.isgenerator(result):
+            # A stream succeeds or fails while it is iterated, not when the call returns
+            return _MonitoredStream(result, self.breaker, start)
+        self.breaker.after_call(time.perf_counter() - start, None)
+        return result
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._client, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"breaker": self.breaker.stats()}
+        if self.hedge is not None:
+            stats["hedging"] = self.hedge.stats()
+        return stats
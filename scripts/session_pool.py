@@ -0,0 +1,272 @@
+"""
+Pool of authenticated NotebookLM sessions
+Each cached credential set gets its own client; calls are dispatched
+round-robin or to the least-loaded healthy session, failing sessions are put on
+cooldown, and credential files are re-read in the background so refreshed
+tokens are picked up without a restart.
+
+Credential sets are JSON files ({"cookies": ..., "csrf_token": ..., "session_id": ...})
+in NOTEBOOKLM_SESSIONS_DIR (default ~/.notebooklm-mcp/sessions). Without any, the
+pool falls back to the single set from load_cached_tokens().
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable
+
+DEFAULT_SESSIONS_DIR = Path.home() / ".notebooklm-mcp" / "sessions"
+
+RATE_LIMIT_MARKERS = ('429', 'resource_exhausted', 'rate limit', 'too many requests', 'quota')
+
+
+class CredentialSet:
+    """One cached cookies/csrf_token/session_id triple"""
+
+    def __init__(self, name: str, cookies: Any, csrf_token: Optional[str], session_id: Optional[str],
+                 path: Optional[Path] = None, mtime: float = 0.0):
+        self.name = name
+        self.cookies = cookies
+        self.csrf_token = csrf_token
+        self.session_id = session_id
+        self.path = path
+        self.mtime = mtime
+
+
+def load_credential_sets(sessions_dir: Optional[str] = None,
+                         fallback: Optional[Callable[[], Any]] = None) -> List[CredentialSet]:
+    """Read every credential file in the sessions directory, or the single cached set"""
+    directory = Path(sessions_dir or os.environ.get('NOTEBOOKLM_SESSIONS_DIR') or DEFAULT_SESSIONS_DIR)
+    sets: List[CredentialSet] = []
+
+    if directory.is_dir():
+        for path in sorted(directory.glob('*.json')):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                sets.append(CredentialSet(
+                    name=path.stem,
+                    cookies=data['cookies'],
+                    csrf_token=data.get('csrf_token'),
+                    session_id=data.get('session_id'),
+                    path=path,
+                    mtime=path.stat().st_mtime
+                ))
+            except Exception as e:
+                print(json.dumps({"status": "error", "error": f"Skipping credential file {path}: {str(e)}"}))
+
+    if not sets and fallback is not None:
+        cached = fallback()
+        if cached:
+            sets.append(CredentialSet(
+                name="default",
+                cookies=cached.cookies,
+                csrf_token=cached.csrf_token,
+                session_id=cached.session_id
+            ))
+
+    return sets
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    message = f"{type(error).__name__} {error}".lower()
+    return any(marker in message for marker in RATE_LIMIT_MARKERS)
+
+
+class PooledSession:
+    """A client plus its load and health bookkeeping"""
+
+    def __init__(self, credentials: CredentialSet, client: Any):
+        self.credentials = credentials
+        self.client = client
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    @property
+    def name(self) -> str:
+        return self.credentials.name
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "consecutive_failures": self.consecutive_failures,
+            "cooldown_remaining_s": round(max(0.0, self.cooldown_until - now), 3)
+        }
+
+
+class SessionPool:
+    """Client-compatible facade that spreads calls over several authenticated sessions"""
+
+    def __init__(self, credentials: List[CredentialSet], client_factory: Callable[[CredentialSet], Any],
+                 strategy: str = "least_loaded", cooldown: float = 60.0, max_failures: int = 3,
+                 loader: Optional[Callable[[], List[CredentialSet]]] = None, refresh_interval: float = 300.0):
+        if strategy not in ('least_loaded', 'round_robin'):
+            raise ValueError(f"Unknown dispatch strategy: {strategy}")
+        if not credentials:
+            raise ValueError("SessionPool needs at least one credential set")
+
+        self.client_factory = client_factory
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.max_failures = max_failures
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.sessions: List[PooledSession] = [PooledSession(c, client_factory(c)) for c in credentials]
+        self.next_index = 0
+        self.refreshes = 0
+        self._stop = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def _acquire(self, exclude: Optional[PooledSession] = None) -> PooledSession:
+        """Pick a session and mark it busy"""
+        with self.lock:
+            now = time.monotonic()
+            candidates = [s for s in self.sessions if s is not exclude] or list(self.sessions)
+            healthy = [s for s in candidates if s.healthy(now)]
+
+            if not healthy:
+                # Everything is cooling down; use whichever recovers first
+                session = min(candidates, key=lambda s: s.cooldown_until)
+            elif self.strategy == 'round_robin':
+                session = healthy[self.next_index % len(healthy)]
+                self.next_index += 1
+            else:
+                session = min(healthy, key=lambda s: (s.in_flight, s.calls))
+
+            session.in_flight += 1
+            session.calls += 1
+            return session
+
+    def _release(self, session: PooledSession, error: Optional[BaseException]):
+        with self.lock:
+            session.in_flight -= 1
+            if error is None:
+                session.consecutive_failures = 0
+                return
+
+            session.errors += 1
+            session.consecutive_failures += 1
+            if is_rate_limit_error(error):
+                session.rate_limited += 1
+                session.cooldown_until = time.monotonic() + self.cooldown
+            elif session.consecutive_failures >= self.max_failures:
+                session.cooldown_until = time.monotonic() + self.cooldown
+
+    def call(self, method: str, *args, **kwargs) -> Any:
+        """Invoke a client method on a pooled session, retrying once elsewhere when throttled"""
+        session = self._acquire()
+        try:
+            result = getattr(session.client, method)(*args, **kwargs)
+        except Exception as e:
+            self._release(session, e)
+            if not is_rate_limit_error(e) or len(self.sessions) < 2:
+                raise
+            retry = self._acquire(exclude=session)
+            try:
+                result = getattr(retry.client, method)(*args, **kwargs)
+            except Exception as retry_error:
+                self._release(retry, retry_error)
+                raise
+            self._release(retry, None)
+            return result
+        self._release(session, None)
+        return result
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def refresh(self) -> int:
+        """Reload credential sets; rebuilds clients whose tokens changed. Returns sessions changed"""
+        if self.loader is None:
+            return 0
+
+        fresh = {c.name: c for c in self.loader()}
+        if not fresh:
+            return 0
+
+        changed = 0
+        with self.lock:
+            kept = []
+            for session in self.sessions:
+                updated = fresh.pop(session.name, None)
+                if updated is None:
+                    changed += 1
+                    continue
+                if updated.mtime != session.credentials.mtime:
+                    session.credentials = updated
+                    session.client = self.client_factory(updated)
+                    session.consecutive_failures = 0
+                    session.cooldown_until = 0.0
+                    changed += 1
+                kept.append(session)
+            for credentials in fresh.values():
+                kept.append(PooledSession(credentials, self.client_factory(credentials)))
+                changed += 1
+            if kept:
+                self.sessions = kept
+            self.refreshes += 1
+        return changed
+
+    def start_refresh(self):
+        """Re-read credential files every refresh_interval seconds in a daemon thread"""
+        if self._refresher is not None or self.loader is None or self.refresh_interval <= 0:
+            return
+
+        def loop():
+            while not self._stop.wait(self.refresh_interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(json.dumps({"status": "error", "error": f"Session refresh failed: {str(e)}"}))
+
+        self._refresher = threading.Thread(target=loop, name="session-refresh", daemon=True)
+        self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            now = time.monotonic()
+            return {
+                "strategy": self.strategy,
+                "sessions": [s.to_dict(now) for s in self.sessions],
+                "healthy": sum(1 for s in self.sessions if s.healthy(now)),
+                "refreshes": self.refreshes
+            }
+
+
+def build_client(client_class: Any, load_cached_tokens: Callable[[], Any], sessions_dir: Optional[str] = None,
+                 strategy: str = "least_loaded", refresh_interval: float = 300.0) -> Optional[Any]:
+    """A single client for one credential set, or a SessionPool when several are provisioned"""
+    loader = lambda: load_credential_sets(sessions_dir, fallback=load_cached_tokens)
+    credentials = loader()
+    if not credentials:
+        return None
+
+    factory = lambda c: client_class(cookies=c.cookies, csrf_token=c.csrf_token, session_id=c.session_id)
+    if len(credentials) == 1 and credentials[0].path is None:
+        return factory(credentials[0])
+
+    pool = SessionPool(credentials, factory, strategy=strategy, loader=loader, refresh_interval=refresh_interval)
+    pool.start_refresh()
+    return pool
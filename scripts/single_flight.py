@@ -0,0 +1,77 @@
+"""
+Single-flight coalescing of identical in-flight calls
+Concurrent callers with the same key share one future and all receive its
+result (or its exception). Each caller can stop waiting on its own deadline
+with leave(); the shared call is cancelled once nobody is waiting for it.
+"""
+
+import re
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a question, ignoring trailing punctuation"""
+    return re.sub(r'\s+', ' ', query).strip().rstrip('?.!').strip().casefold()
+
+
+def query_key(notebook_id: str, query: str) -> Tuple[str, str]:
+    """Coalescing key for a notebook question"""
+    return (notebook_id, normalize_query(query))
+
+
+class _Shared:
+    def __init__(self, future: Future):
+        self.future = future
+        self.waiters = 1
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one upstream call"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shared: Dict[Hashable, _Shared] = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "errors": 0, "abandoned": 0}
+
+    def join(self, key: Hashable, submit: Callable[[], Future]) -> Tuple[Future, bool]:
+        """Future of the in-flight call for key, starting one with submit() if needed; pair with leave()"""
+        with self.lock:
+            entry = self.shared.get(key)
+            if entry is not None:
+                entry.waiters += 1
+                self.stats["coalesced"] += 1
+                return entry.future, True
+
+            entry = _Shared(submit())
+            self.shared[key] = entry
+            self.stats["leaders"] += 1
+
+        def finished(future: Future):
+            with self.lock:
+                if self.shared.get(key) is entry:
+                    del self.shared[key]
+                if not future.cancelled() and future.exception() is not None:
+                    self.stats["errors"] += 1
+
+        entry.future.add_done_callback(finished)
+        return entry.future, False
+
+    def leave(self, key: Hashable, future: Future):
+        """Stop waiting on a joined future; the last waiter to leave cancels it if still queued"""
+        with self.lock:
+            entry = self.shared.get(key)
+            if entry is None or entry.future is not future:
+                return
+            entry.waiters -= 1
+            if entry.waiters > 0 or future.done():
+                return
+            del self.shared[key]
+            self.stats["abandoned"] += 1
+        future.cancel()
+
+    def snapshot(self) -> Dict[str, int]:
+        """Counters plus the number of keys currently in flight"""
+        with self.lock:
+            return {**self.stats, "in_flight": len(self.shared)}
@@ -0,0 +1,198 @@
+"""
+Warm the bridge's answer cache with the most frequent questions per notebook
+Questions come from a JSON file ({"<notebook_id>": ["question", ...]} or a list of
+{"notebook_id", "question"} records) and/or are mined from the bridge's
+--request-log. Missing or ageing answers are fetched concurrently through
+NotebookExtractor.query_notebook under a shared rate limit, then coverage and
+freshness of the cache for the question set are reported.
+
+    python scripts/warm_answer_cache.py --questions reports/cache/top_questions.json --workers 4 --rps 2
+    python scripts/warm_answer_cache.py --from-log reports/cache/bridge_requests.jsonl --top 20
+"""
+
+import sys
+import json
+import statistics
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+
+from extract_notebook_data import NotebookExtractor
+from answer_cache import DEFAULT_CACHE_PATH, DEFAULT_TTL_S, AnswerCache
+from instrumentation import Instrumentation
+from rate_limiter import RateLimiter
+from single_flight import normalize_query
+
+Question = Tuple[str, str]
+
+
+def load_questions(path: str) -> List[Question]:
+    """(notebook_id, question) pairs from a questions file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if isinstance(data, dict):
+        return [(notebook_id, q) for notebook_id, questions in data.items() for q in questions]
+    return [(item['notebook_id'], item['question']) for item in data]
+
+
+def mine_request_log(path: str, top: int) -> List[Question]:
+    """The `top` most frequent successful questions per notebook in a bridge request log"""
+    counts: Dict[str, Counter] = defaultdict(Counter)
+    wording: Dict[Tuple[str, str], str] = {}
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('status') != 'success':
+                continue
+            key = normalize_query(record['query'])
+            counts[record['notebook_id']][key] += 1
+            wording.setdefault((record['notebook_id'], key), record['query'])
+
+    return [(notebook_id, wording[(notebook_id, key)])
+            for notebook_id, counter in counts.items()
+            for key, _ in counter.most_common(top)]
+
+
+def dedupe(questions: List[Question]) -> List[Question]:
+    seen = set()
+    unique = []
+    for notebook_id, question in questions:
+        key = (notebook_id, normalize_query(question))
+        if key not in seen:
+            seen.add(key)
+            unique.append((notebook_id, question))
+    return unique
+
+
+def freshness_report(cache: AnswerCache, questions: List[Question]) -> Dict[str, Any]:
+    """Coverage (fresh answers / questions) and age distribution for a question set"""
+    ages = cache.ages(questions)
+    present = [age for age in ages if age is not None]
+    fresh = [age for age in present if age <= cache.ttl]
+    per_notebook: Dict[str, Dict[str, int]] = defaultdict(lambda: {"questions": 0, "fresh": 0})
+    for (notebook_id, _), age in zip(questions, ages):
+        per_notebook[notebook_id]["questions"] += 1
+        if age is not None and age <= cache.ttl:
+            per_notebook[notebook_id]["fresh"] += 1
+
+    return {
+        "questions": len(questions),
+        "cached": len(present),
+        "fresh": len(fresh),
+        "stale": len(present) - len(fresh),
+        "missing": len(questions) - len(present),
+        "coverage": round(len(fresh) / len(questions), 4) if questions else None,
+        "age_s": {
+            "min": round(min(present), 1),
+            "median": round(statistics.median(present), 1),
+            "max": round(max(present), 1)
+        } if present else None,
+        "per_notebook": dict(per_notebook)
+    }
+
+
+def warm(extractor: NotebookExtractor, cache: AnswerCache, questions: List[Question],
+         workers: int, limiter: Optional[RateLimiter]) -> Dict[str, int]:
+    """Fetch each question's answer and store it in the cache"""
+    counts = Counter()
+    lock = threading.Lock()
+
+    def fetch(item: Question):
+        notebook_id, question = item
+        if limiter is not None:
+            limiter.acquire()
+        response = extractor.query_notebook(notebook_id, question).get('response')
+        if isinstance(response, dict):
+            response = response.get('answer')
+        if response:
+            cache.put(notebook_id, question, response, origin="warmup")
+        with lock:
+            counts["warmed" if response else "failed"] += 1
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        list(executor.map(fetch, questions))
+    return dict(counts)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pre-fill the bridge answer cache with frequent questions')
+    parser.add_argument('--questions', type=str, help='JSON file of questions per notebook')
+    parser.add_argument('--from-log', type=str, help='Bridge --request-log file to mine frequent questions from')
+    parser.add_argument('--top', type=int, default=20, help='Questions per notebook to take from --from-log')
+    parser.add_argument('--cache', type=str, default=str(DEFAULT_CACHE_PATH), help='Answer cache database')
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL_S, help='Seconds a cached answer stays fresh (match the bridge)')
+    parser.add_argument('--refresh-after', type=float, help='Re-fetch answers older than this many seconds (default: half the TTL)')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent queries')
+    parser.add_argument('--rps', type=float, default=1.0, help='Maximum queries per second across workers (0 = unlimited)')
+    parser.add_argument('--report-only', action='store_true', help='Only report coverage and freshness')
+    parser.add_argument('--output', type=str, help='Also write the report JSON to this file')
+    parser.add_argument('--sessions-dir', type=str, help='Directory of cached credential sets to pool (default: $NOTEBOOKLM_SESSIONS_DIR)')
+    Instrumentation.add_arguments(parser)
+
+    args = parser.parse_args()
+    if not args.questions and not args.from_log:
+        parser.error('pass --questions and/or --from-log')
+
+    instrumentation = Instrumentation.from_args(args, script="warm_answer_cache")
+    try:
+        run(args, instrumentation)
+    finally:
+        instrumentation.finish()
+
+
+def run(args, instrumentation: Instrumentation):
+    questions: List[Question] = []
+    if args.questions:
+        questions.extend(load_questions(args.questions))
+    if args.from_log:
+        questions.extend(mine_request_log(args.from_log, args.top))
+    questions = dedupe(questions)
+
+    cache = AnswerCache(args.cache, ttl=args.cache_ttl)
+    before = freshness_report(cache, questions)
+    print(json.dumps({"status": "info", "message": f"Loaded {len(questions)} questions",
+                      "coverage": before["coverage"], "missing": before["missing"], "stale": before["stale"]}))
+
+    warmed: Dict[str, int] = {}
+    if not args.report_only:
+        refresh_after = args.refresh_after if args.refresh_after is not None else args.cache_ttl / 2
+        due = [q for q, age in zip(questions, cache.ages(questions)) if age is None or age > refresh_after]
+
+        if due:
+            extractor = NotebookExtractor(instrumentation=instrumentation, sessions_dir=args.sessions_dir)
+            with instrumentation.stage("authenticate"):
+                if not extractor.authenticate():
+                    sys.exit(1)
+            limiter = RateLimiter(args.rps, burst=args.workers) if args.rps > 0 else None
+            with instrumentation.stage("warm"):
+                warmed = warm(extractor, cache, due, args.workers, limiter)
+
+    after = freshness_report(cache, questions)
+    report = {
+        "status": "complete",
+        "message": "Answer cache warm-up complete",
+        "generated_at": datetime.now().isoformat(),
+        "cache": cache.stats(),
+        "warmed": warmed.get("warmed", 0),
+        "failed": warmed.get("failed", 0),
+        "before": {k: v for k, v in before.items() if k != "per_notebook"},
+        "after": after
+    }
+    cache.close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps(report, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,126 @@
 import { NextRequest, NextResponse } from "next/server";
-import { exec } from "child_process";
+import { exec, spawn } from "child_process";
+import { randomUUID } from "crypto";
 import path from "path";
 import { promisify } from "util";
 
 const execPromise = promisify(exec);
 
+// Budget for one NotebookLM answer; the bridge drops the work once it passes
+const DEADLINE_MS = Number(process.env.NOTEBOOKLM_DEADLINE_MS || 30000);
+// Extra time for the bridge to report the timeout itself before we give up on it
+const DEADLINE_GRACE_MS = 2000;
+
+const SSE_HEADERS = {
+    "Content-Type": "text/event-stream",
+    "Cache-Control": "no-cache, no-transform",
+    "Connection": "keep-alive"
+};
+
+/**
+ * Re-emits newline-delimited JSON events from the bridge as server-sent events.
+ */
+function ndjsonToSse(source: ReadableStream<Uint8Array>, onDone: () => void): ReadableStream<Uint8Array> {
+    const decoder = new TextDecoder();
+    const encoder = new TextEncoder();
+    let buffered = "";
+
+    return source.pipeThrough(new TransformStream<Uint8Array, Uint8Array>({
+        transform(chunk, controller) {
+            buffered += decoder.decode(chunk, { stream: true });
+            const lines = buffered.split("\n");
+            buffered = lines.pop() ?? "";
+            for (const line of lines) {
+                if (line.trim()) {
+                    controller.enqueue(encoder.encode(`data: ${line}\n\n`));
+                }
+            }
+        },
+        flush(controller) {
+            if (buffered.trim()) {
+                controller.enqueue(encoder.encode(`data: ${buffered}\n\n`));
+            }
+            onDone();
+        }
+    }));
+}
+
+/**
+ * Streams the answer as server-sent events: "chunk" events with partial text, then a "done" event.
+ */
+async function streamAnswer(req: NextRequest, notebookId: string, query: string): Promise<Response> {
+    const bridgeUrl = process.env.NOTEBOOKLM_BRIDGE_URL;
+    if (bridgeUrl) {
+        const requestId = randomUUID();
+        const cancel = () => {
+            fetch(`${bridgeUrl}/cancel`, {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ request_id: requestId })
+            }).catch(() => undefined);
+        };
+        req.signal.addEventListener("abort", cancel);
+
+        const res = await fetch(`${bridgeUrl}/query`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({
+                notebook_id: notebookId,
+                query,
+                priority: "interactive",
+                deadline_ms: DEADLINE_MS,
+                request_id: requestId,
+                stream: true
+            }),
+            signal: req.signal
+        });
+        if (!res.body) {
+            req.signal.removeEventListener("abort", cancel);
+            return NextResponse.json({ status: "error", error: "Bridge returned an empty stream" }, { status: 502 });
+        }
+        const body = ndjsonToSse(res.body, () => req.signal.removeEventListener("abort", cancel));
+        return new Response(body, { headers: SSE_HEADERS });
+    }
+
+    const scriptPath = path.join(process.cwd(), "scripts", "notebooklm_bridge.py");
+    const child = spawn("python", [scriptPath, notebookId, query, "--stream", "--deadline-ms", String(DEADLINE_MS)], {
+        timeout: DEADLINE_MS + DEADLINE_GRACE_MS,
+        killSignal: "SIGKILL",
+        signal: req.signal
+    });
+    child.on("error", (error) => console.error("[NotebookLM Bridge] Stream process error", error));
+    child.stderr.on("data", (data) => console.error(`[NotebookLM Bridge] Stderr: ${data}`));
+
+    // Once the reader cancels, the controller must not be touched again (Node throws ERR_INVALID_STATE)
+    let closed = false;
+    let stdoutController: ReadableStreamDefaultController<Uint8Array>;
+    const onData = (data: Buffer) => {
+        if (!closed) stdoutController.enqueue(new Uint8Array(data));
+    };
+    const onClose = () => {
+        if (closed) return;
+        closed = true;
+        stdoutController.close();
+    };
+    const stdout = new ReadableStream<Uint8Array>({
+        start(controller) {
+            stdoutController = controller;
+            child.stdout.on("data", onData);
+            child.on("close", onClose);
+        },
+        cancel() {
+            closed = true;
+            child.stdout.off("data", onData);
+            child.off("close", onClose);
+            child.kill("SIGKILL");
+        }
+    });
+    return new Response(ndjsonToSse(stdout, () => undefined), { headers: SSE_HEADERS });
+}
+
 export async function POST(req: NextRequest) {
     try {
-        const { query, notebookId } = await req.json();
+        const { query, notebookId, stream } = await req.json();
 
         if (!query) {
             return NextResponse.json({ error: "Query is required" }, { status: 400 });
@@ -15,17 +128,76 @@ export async function POST(req: NextRequest) {
 
         const targetNotebookId = notebookId || process.env.NEXT_PUBLIC_NOTEBOOK_ID || "default-notebook-id";
 
+        if (stream || req.headers.get("accept")?.includes("text/event-stream")) {
+            return await streamAnswer(req, targetNotebookId, query);
+        }
+
+        // Prefer a long-running bridge (python scripts/notebooklm_bridge.py --serve) when configured,
+        // so identical concurrent questions are coalesced into one NotebookLM call.
+        const bridgeUrl = process.env.NOTEBOOKLM_BRIDGE_URL;
+        if (bridgeUrl) {
+            const requestId = randomUUID();
+            // If the user goes away, tell the bridge to stop waiting on our behalf
+            const cancel = () => {
+                fetch(`${bridgeUrl}/cancel`, {
+                    method: "POST",
+                    headers: { "Content-Type": "application/json" },
+                    body: JSON.stringify({ request_id: requestId })
+                }).catch(() => undefined);
+            };
+            req.signal.addEventListener("abort", cancel);
+
+            try {
+                const res = await fetch(`${bridgeUrl}/query`, {
+                    method: "POST",
+                    headers: { "Content-Type": "application/json" },
+                    body: JSON.stringify({
+                        notebook_id: targetNotebookId,
+                        query,
+                        priority: "interactive",
+                        deadline_ms: DEADLINE_MS,
+                        request_id: requestId
+                    }),
+                    signal: AbortSignal.any([req.signal, AbortSignal.timeout(DEADLINE_MS + DEADLINE_GRACE_MS)])
+                });
+                const result = await res.json();
+                return NextResponse.json(result, { status: res.ok ? 200 : res.status });
+            } catch (error: any) {
+                if (error.name === "TimeoutError") {
+                    cancel();
+                    return NextResponse.json({ status: "timeout", error: "NotebookLM did not answer in time" }, { status: 504 });
+                }
+                throw error;
+            } finally {
+                req.signal.removeEventListener("abort", cancel);
+            }
+        }
+
         // Path to python and script
         const scriptPath = path.join(process.cwd(), "scripts", "notebooklm_bridge.py");
 
         // Execute python script
         // Note: Using 'python' or 'python3' depending on environment. 
         // We'll try to use the venv if available or just system python.
-        const command = `python "${scriptPath}" "${targetNotebookId}" "${query}"`;
+        const command = `python "${scriptPath}" "${targetNotebookId}" "${query}" --deadline-ms ${DEADLINE_MS}`;
 
         console.log(`[NotebookLM Bridge] Executing: ${command}`);
 
-        const { stdout, stderr } = await execPromise(command);
+        let stdout: string;
+        let stderr: string;
+        try {
+            // Kill the process if it overruns its own deadline or the user goes away
+            ({ stdout, stderr } = await execPromise(command, {
+                timeout: DEADLINE_MS + DEADLINE_GRACE_MS,
+                killSignal: "SIGKILL",
+                signal: req.signal
+            }));
+        } catch (error: any) {
+            if (error.killed || error.name === "AbortError") {
+                return NextResponse.json({ status: "timeout", error: "NotebookLM did not answer in time" }, { status: 504 });
+            }
+            throw error;
+        }
 
         if (stderr && !stdout) {
             console.error(`[NotebookLM Bridge] Stderr: ${stderr}`);
@@ -34,7 +206,7 @@ export async function POST(req: NextRequest) {
 
         try {
             const result = JSON.parse(stdout);
-            return NextResponse.json(result);
+            return NextResponse.json(result, { status: result.status === "timeout" ? 504 : 200 });
         } catch (parseError) {
             console.error(`[NotebookLM Bridge] Parse Error: ${parseError}. Stdout: ${stdout}`);
             return NextResponse.json({ error: "Failed to parse Python output", raw: stdout }, { status: 500 });
@@ -20,7 +20,11 @@ export default function PartnerWidgetPage() {
         setTestResult(null);
         try {
             // Real query to the Al Etihad knowledge base via the bridge
-            const response = await NotebookLMService.query("al-etihad-knowledge-base", "What is the annual premium for the Home Shield plan?");
+            const response = await NotebookLMService.queryStream(
+                "al-etihad-knowledge-base",
+                "What is the annual premium for the Home Shield plan?",
+                (answerSoFar) => setTestResult(answerSoFar)
+            );
             setTestResult(response.answer);
         } catch (error: any) {
             setTestResult(`Connection Failed: ${error.message}`);
@@ -41,6 +41,63 @@ export const NotebookLMService = {
                 sources: []
             };
         }
+    },
+
+    /**
+     * Queries a notebook and streams the answer as it is generated.
+     * onChunk receives the answer text so far; resolves with the complete response.
+     */
+    queryStream: async (notebookId: string, query: string, onChunk: (answerSoFar: string) => void): Promise<NotebookLMResponse> => {
+        console.log(`[NotebookLM] Streaming query from bridge: ${query}`);
+
+        try {
+            const res = await fetch("/api/notebooklm/query", {
+                method: "POST",
+                headers: { "Content-Type": "application/json", "Accept": "text/event-stream" },
+                body: JSON.stringify({ query, notebookId, stream: true })
+            });
+
+            if (!res.ok || !res.body) {
+                const data = await res.json().catch(() => ({}));
+                throw new Error(data.error || `Bridge returned ${res.status}`);
+            }
+
+            const reader = res.body.getReader();
+            const decoder = new TextDecoder();
+            let buffered = "";
+            let answer = "";
+
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+
+                buffered += decoder.decode(value, { stream: true });
+                const events = buffered.split("\n\n");
+                buffered = events.pop() ?? "";
+
+                for (const event of events) {
+                    if (!event.startsWith("data: ")) continue;
+                    const data = JSON.parse(event.slice("data: ".length));
+                    if (data.event === "chunk") {
+                        answer += data.text;
+                        onChunk(answer);
+                    } else if (data.event === "done") {
+                        if (data.status !== "success") {
+                            throw new Error(data.error || `NotebookLM query ${data.status}`);
+                        }
+                        return { answer, sources: data.sources || [] };
+                    }
+                }
+            }
+
+            throw new Error("Stream ended before the answer completed");
+        } catch (error: any) {
+            console.error("[NotebookLM Service Error]", error);
+            return {
+                answer: `Integration Error: ${error.message}. Ensure you have authenticated via 'notebooklm-mcp-auth' and the bridge script is functional.`,
+                sources: []
+            };
+        }
     }
 
 };
@@ -28,6 +28,7 @@ export interface VectorStoreConfig {
 class VectorStore {
     private client: ChromaClient;
     private collections: Map<string, Collection>;
+    private ingestUrl?: string;
 
     constructor() {
         // Initialize ChromaDB client
@@ -35,6 +36,29 @@ class VectorStore {
             path: process.env.CHROMADB_PATH || 'http://localhost:8000',
         });
         this.collections = new Map();
+        // Writes go through scripts/ingest_gateway.py when it is running
+        this.ingestUrl = process.env.CHROMA_INGEST_URL;
+    }
+
+    /**
+     * Send a write to the ingest gateway, which batches it with other writes
+     */
+    private async ingest(
+        collectionName: string,
+        operation: 'upsert' | 'delete',
+        body: Record<string, unknown>
+    ): Promise<void> {
+        const response = await fetch(
+            `${this.ingestUrl}/collections/${encodeURIComponent(collectionName)}/${operation}`,
+            {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(body),
+            }
+        );
+        if (!response.ok) {
+            throw new Error(`Ingest gateway returned ${response.status}: ${await response.text()}`);
+        }
     }
 
     /**
@@ -100,6 +124,32 @@ class VectorStore {
         }
     }
 
+    /**
+     * Run an operation on a cached collection handle. If the collection was
+     * rebuilt under a new id (scripts/chroma_maintenance.py), look the name up
+     * again and retry once
+     */
+    private async withCollection<T>(
+        name: string,
+        collection: Collection,
+        operation: (collection: Collection) => Promise<T>
+    ): Promise<T> {
+        try {
+            return await operation(collection);
+        } catch (error) {
+            const message = error instanceof Error ? `${error.name} ${error.message}` : String(error);
+            if (!/not ?found|does not exist/i.test(message)) {
+                throw error;
+            }
+            this.collections.delete(name);
+            const fresh = await this.getCollection(name);
+            if (!fresh) {
+                throw error;
+            }
+            return operation(fresh);
+        }
+    }
+
     /**
      * Add documents to a collection
      */
@@ -108,9 +158,9 @@ class VectorStore {
         documents: Document[]
     ): Promise<void> {
         try {
-            const collection = await this.getCollection(collectionName);
+            const collection = this.ingestUrl ? null : await this.getCollection(collectionName);
 
-            if (!collection) {
+            if (!collection && !this.ingestUrl) {
                 console.warn(`Cannot add documents to ${collectionName}: Vector Store unreachable.`);
                 return;
             }
@@ -123,13 +173,19 @@ class VectorStore {
             const ids = documents.map(doc => doc.id);
             const metadatas = documents.map(doc => doc.metadata);
 
+            if (!collection) {
+                await this.ingest(collectionName, 'upsert', { ids, embeddings, documents: contents, metadatas });
+                console.log(`Queued ${documents.length} documents for collection: ${collectionName}`);
+                return;
+            }
+
             // Add to collection
-            await collection.add({
+            await this.withCollection(collectionName, collection, c => c.add({
                 ids,
                 embeddings,
                 documents: contents,
                 metadatas,
-            });
+            }));
 
             console.log(`Added ${documents.length} documents to collection: ${collectionName}`);
         } catch (error) {
@@ -162,11 +218,11 @@ class VectorStore {
             const queryEmbedding = await llmService.embed(query);
 
             // Perform search
-            const results = await collection.query({
+            const results = await this.withCollection(collectionName, collection, c => c.query({
                 queryEmbeddings: [queryEmbedding],
                 nResults: options.limit || 10,
                 where: options.filter,
-            });
+            }));
 
             // Transform results
             const searchResults: SearchResult[] = [];
@@ -211,9 +267,9 @@ class VectorStore {
                 return null;
             }
 
-            const results = await collection.get({
+            const results = await this.withCollection(collectionName, collection, c => c.get({
                 ids: [id],
-            });
+            }));
 
             if (!results.ids || results.ids.length === 0) {
                 return null;
@@ -238,6 +294,18 @@ class VectorStore {
         document: Document
     ): Promise<void> {
         try {
+            if (this.ingestUrl) {
+                const embedding = await llmService.embed(document.content);
+                await this.ingest(collectionName, 'upsert', {
+                    ids: [document.id],
+                    embeddings: [embedding],
+                    documents: [document.content],
+                    metadatas: [document.metadata],
+                });
+                console.log(`Queued update of document: ${document.id}`);
+                return;
+            }
+
             const collection = await this.getCollection(collectionName);
 
             if (!collection) {
@@ -247,12 +315,12 @@ class VectorStore {
             // Generate new embedding
             const embedding = await llmService.embed(document.content);
 
-            await collection.update({
+            await this.withCollection(collectionName, collection, c => c.update({
                 ids: [document.id],
                 embeddings: [embedding],
                 documents: [document.content],
                 metadatas: [document.metadata],
-            });
+            }));
 
             console.log(`Updated document: ${document.id}`);
         } catch (error) {
@@ -269,15 +337,21 @@ class VectorStore {
         id: string
     ): Promise<void> {
         try {
+            if (this.ingestUrl) {
+                await this.ingest(collectionName, 'delete', { ids: [id] });
+                console.log(`Queued deletion of document: ${id}`);
+                return;
+            }
+
             const collection = await this.getCollection(collectionName);
 
             if (!collection) {
                 return;
             }
 
-            await collection.delete({
+            await this.withCollection(collectionName, collection, c => c.delete({
                 ids: [id],
-            });
+            }));
 
             console.log(`Deleted document: ${id}`);
         } catch (error) {
@@ -332,7 +406,7 @@ class VectorStore {
                 };
             }
 
-            const count = await collection.count();
+            const count = await this.withCollection(name, collection, c => c.count());
 
             return {
                 name,